@@ -0,0 +1,175 @@
+# api-gateway/admission.py
+# Kiểm soát tải (admission control): từ chối sớm request vượt ngân sách thay vì để Back-end quá tải
+#   - token bucket cho mỗi client và cho từng route
+#   - giới hạn số request đồng thời tới mỗi dịch vụ, có phần dành riêng cho request ưu tiên (đặt hàng)
+
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT = 'default'
+PRIORITY = 'priority'
+
+
+def retry_after_header(seconds):
+    """Giá trị header Retry-After (số nguyên giây, tối thiểu 1)."""
+    return str(max(1, math.ceil(seconds)))
+
+
+class TokenBucket:
+    """Nạp rate token mỗi giây, giữ tối đa burst token; mỗi request lấy một token."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Lấy một token; trả về 0 nếu được phép, ngược lại số giây cần chờ đến token tiếp theo."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket theo key; giữ tối đa max_keys bucket, bỏ bucket lâu không dùng nhất (LRU)."""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(time.monotonic())
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """
+    Giới hạn số request đồng thời tới một dịch vụ. reserved slot chỉ dành cho request ưu tiên;
+    request thường bị từ chối ngay khi hết slot, request ưu tiên được chờ tối đa priority_wait giây.
+    """
+
+    def __init__(self, name, limit, reserved=0, priority_wait=0.0):
+        self.name = name
+        self.limit = limit
+        self.reserved = min(reserved, limit - 1)
+        self.priority_wait = priority_wait
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._condition = threading.Condition()
+
+    def _has_slot(self, priority):
+        return self.in_flight < (self.limit if priority else self.limit - self.reserved)
+
+    def acquire(self, priority=False):
+        """Lấy một slot; trả về False nếu dịch vụ đang đầy."""
+        with self._condition:
+            if not self._has_slot(priority) and priority and self.priority_wait > 0:
+                self._condition.wait_for(lambda: self._has_slot(True), timeout=self.priority_wait)
+            if not self._has_slot(priority):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_concurrent": self.limit,
+                "reserved_for_priority": self.reserved,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class AdmissionController:
+    """Quyết định nhận hay từ chối một request tới /<service>/<path> trước khi gọi Back-end."""
+
+    def __init__(self, client_limits, route_limits, priority_routes, max_client_buckets):
+        # client_limits: {"default": {"rate", "burst"}, "priority": {"rate", "burst"}}
+        self.client_limits = client_limits
+        # route_limits: (method, service, regex path, rate, burst); bucket chung cho mọi client
+        self.route_limits = [(method, service, re.compile(pattern), rate, burst)
+                             for method, service, pattern, rate, burst in route_limits]
+        self.priority_routes = [(method, service, re.compile(pattern)) for method, service, pattern in priority_routes]
+        self.clients = RateLimiter(max_client_buckets)
+        self.routes = RateLimiter(max(1, len(self.route_limits)))
+
+        self._lock = threading.Lock()
+        self.counters = {
+            traffic_class: {"admitted": 0, "rate_limited": 0, "route_limited": 0, "shed": 0}
+            for traffic_class in (DEFAULT, PRIORITY)
+        }
+
+    def traffic_class(self, method, service, path):
+        for rule_method, rule_service, pattern in self.priority_routes:
+            if rule_method == method and rule_service == service and pattern.match(path):
+                return PRIORITY
+        return DEFAULT
+
+    def _count(self, traffic_class, outcome):
+        with self._lock:
+            self.counters[traffic_class][outcome] += 1
+
+    def check(self, client, method, service, path):
+        """
+        Trả về (traffic_class, None) nếu request được nhận,
+        hoặc (traffic_class, (status_code, retry_after)) nếu bị từ chối (429 cho client, 503 cho route).
+        """
+        traffic_class = self.traffic_class(method, service, path)
+
+        limits = self.client_limits.get(traffic_class)
+        if limits:
+            wait = self.clients.take((client, traffic_class), limits["rate"], limits["burst"])
+            if wait:
+                self._count(traffic_class, "rate_limited")
+                return traffic_class, (429, wait)
+
+        # Lưu lượng ưu tiên không bị giới hạn bởi ngân sách chung của lưu lượng duyệt xem
+        if traffic_class == DEFAULT:
+            for index, (rule_method, rule_service, pattern, rate, burst) in enumerate(self.route_limits):
+                if rule_method in (method, '*') and rule_service == service and pattern.match(path):
+                    wait = self.routes.take(index, rate, burst)
+                    if wait:
+                        self._count(traffic_class, "route_limited")
+                        return traffic_class, (503, wait)
+                    break
+
+        self._count(traffic_class, "admitted")
+        return traffic_class, None
+
+    def record_shed(self, traffic_class):
+        """Request đã được nhận nhưng bị từ chối vì dịch vụ đích đã đủ số request đồng thời."""
+        self._count(traffic_class, "shed")
+
+    def stats(self):
+        with self._lock:
+            counters = {name: dict(values) for name, values in self.counters.items()}
+        return {"clients_tracked": len(self.clients), "classes": counters}
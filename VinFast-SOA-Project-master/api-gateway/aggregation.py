@@ -0,0 +1,77 @@
+# api-gateway/aggregation.py
+# Ghép dữ liệu từ nhiều dịch vụ tại Gateway để Frontend chỉ cần một request
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config import UPSTREAM_TIMEOUT, AGGREGATION_BATCH_SIZE
+
+EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='aggregation')
+
+
+def chunked(values, size):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_batch(pool, path, ids):
+    """Gọi endpoint tra cứu theo lô (?ids=...) của một dịch vụ; lỗi thì trả về danh sách rỗng."""
+    try:
+        response = pool.request(
+            'GET', path, params={'ids': ','.join(str(i) for i in ids)}, timeout=UPSTREAM_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        print(f"Lỗi Gateway khi tra cứu {pool.name}/{path}: {e}")
+        return []
+    if response.status_code != 200:
+        return []
+    return response.json()
+
+
+def submit_batches(pool, path, ids):
+    """Chia ID thành các lô AGGREGATION_BATCH_SIZE và gửi song song."""
+    # Mỗi lô chạy trong bản sao context hiện tại để lời gọi Back-end vẫn thuộc trace của request
+    return [EXECUTOR.submit(contextvars.copy_context().run, fetch_batch, pool, path, batch)
+            for batch in chunked(ids, AGGREGATION_BATCH_SIZE)]
+
+
+def collect(futures):
+    """Gom kết quả các lô thành dict id -> bản ghi."""
+    records = {}
+    for future in futures:
+        for record in future.result():
+            records[record['id']] = record
+    return records
+
+
+def build_order_dashboard(pools):
+    """
+    Lấy tất cả đơn hàng (T3) rồi gắn tên người dùng (T1) và tên mẫu xe (T2).
+    Trả về (orders, status_code); orders là None nếu Order Service trả lỗi.
+    """
+    # 1. Lấy danh sách đơn hàng
+    response = pools['orders'].request('GET', 'orders', timeout=UPSTREAM_TIMEOUT)
+    if response.status_code != 200:
+        return None, response.status_code
+    orders = response.json()
+
+    # 2. Tra cứu người dùng và mẫu xe theo lô, tất cả các lô được gọi đồng thời
+    user_ids = {order['user_id'] for order in orders}
+    car_ids = {item['car_model_id'] for order in orders for item in order['items']}
+    user_futures = submit_batches(pools['users'], 'users', user_ids)
+    car_futures = submit_batches(pools['catalog'], 'catalog/cars', car_ids)
+    users = collect(user_futures)
+    cars = collect(car_futures)
+
+    # 3. Ghép dữ liệu (giữ cách hiển thị dự phòng như Frontend khi không tra cứu được)
+    for order in orders:
+        user = users.get(order['user_id'])
+        order['user_name'] = user['name'] if user else f"User ID {order['user_id']}"
+        for item in order['items']:
+            car = cars.get(item['car_model_id'])
+            item['car_model_name'] = car['model_name'] if car else f"Car ID {item['car_model_id']}"
+
+    return orders, 200
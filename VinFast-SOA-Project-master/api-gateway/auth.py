@@ -0,0 +1,120 @@
+# api-gateway/auth.py
+# Xác thực JWT một lần tại Gateway: claims đã giải mã được cache theo token cho đến khi token hết hạn (exp),
+# rồi chuyển tiếp định danh đã xác thực cho Back-end qua header X-User-Id / X-User-Role
+
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+from common.auth import USER_ID_HEADER, USER_ROLE_HEADER
+
+
+# Role được gọi các endpoint quản trị của Gateway (thêm/bớt instance, xóa cache)
+ADMIN_ROLE = 'admin'
+
+
+class InvalidToken(Exception):
+    """Token sai định dạng, sai chữ ký hoặc đã hết hạn."""
+
+
+class Forbidden(Exception):
+    """Token hợp lệ nhưng không có role cần thiết."""
+
+
+def bearer_token(authorization):
+    """'Bearer <token>' -> token; None nếu request không gửi header Authorization."""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        raise InvalidToken("Authorization header must be 'Bearer <token>'")
+    return token.strip()
+
+
+def require_role(verifier, authorization, role):
+    """Claims của token có role yêu cầu; ném InvalidToken nếu thiếu/sai token, Forbidden nếu khác role."""
+    token = bearer_token(authorization)
+    if token is None:
+        raise InvalidToken("Authorization header is required")
+    claims = verifier.verify(token)
+    if claims.get('role') != role:
+        raise Forbidden(f"Role '{role}' is required")
+    return claims
+
+
+def identity_headers(claims):
+    """Header định danh chuyển tiếp cho Back-end từ claims đã xác thực."""
+    headers = {USER_ID_HEADER: str(claims['user_id'])}
+    if claims.get('role'):
+        headers[USER_ROLE_HEADER] = str(claims['role'])
+    return headers
+
+
+class TokenVerifier:
+    """
+    Kiểm tra chữ ký và hạn của JWT; giữ tối đa max_entries claims (LRU) theo token.
+    Token đã có trong cache và chưa hết hạn không phải giải mã/kiểm tra chữ ký lại.
+    """
+
+    def __init__(self, secret, algorithm, max_entries):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.hit_seconds = 0.0
+        self.verify_seconds = 0.0
+
+    def verify(self, token):
+        """Trả về claims của token hợp lệ, ném InvalidToken nếu không hợp lệ."""
+        started = time.perf_counter()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                claims, expires_at = cached
+                if expires_at > time.time():
+                    self._cache.move_to_end(token)
+                    self.hits += 1
+                    self.hit_seconds += time.perf_counter() - started
+                    return claims
+                del self._cache[token]
+
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm], options={"require": ["exp"]})
+            if 'user_id' not in claims:
+                raise InvalidToken("Token has no user_id claim")
+        except (jwt.InvalidTokenError, InvalidToken) as e:
+            with self._lock:
+                self.rejected += 1
+                self.verify_seconds += time.perf_counter() - started
+            raise InvalidToken(str(e)) from e
+
+        with self._lock:
+            self.misses += 1
+            self.verify_seconds += time.perf_counter() - started
+            self._cache[token] = (claims, claims['exp'])
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return claims
+
+    def stats(self):
+        with self._lock:
+            verified = self.misses + self.rejected
+            avg_verify = self.verify_seconds / verified if verified else 0.0
+            avg_hit = self.hit_seconds / self.hits if self.hits else 0.0
+            return {
+                "cached_tokens": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "avg_verify_us": round(avg_verify * 1e6, 2),
+                "avg_cache_hit_us": round(avg_hit * 1e6, 2),
+                # Thời gian giải mã/kiểm tra chữ ký ước tính đã tiết kiệm nhờ cache
+                "saved_ms": round(self.hits * max(0.0, avg_verify - avg_hit) * 1000, 2),
+            }
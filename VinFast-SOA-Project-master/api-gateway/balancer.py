@@ -0,0 +1,189 @@
+# api-gateway/balancer.py
+# Cân bằng tải giữa nhiều instance của một dịch vụ Back-end:
+# chọn instance theo power-of-two-choices hoặc least-outstanding-requests,
+# tạm loại (eject) instance lỗi liên tiếp, và thêm/bớt instance khi Gateway đang chạy
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+STRATEGIES = ('p2c', 'least_outstanding')
+
+# Request không có body và không đổi dữ liệu: được gửi lại tới instance khác khi không kết nối được
+RETRYABLE_METHODS = ('GET', 'HEAD')
+
+
+class NoInstanceError(LookupError):
+    """Dịch vụ không còn instance nào để gửi request."""
+
+
+class LastInstanceError(ValueError):
+    """Không cho bỏ instance cuối cùng của dịch vụ."""
+
+
+def normalize_url(url):
+    """Kiểm tra URL gốc của một instance (http/https, có host) và bỏ dấu / ở cuối."""
+    if not isinstance(url, str):
+        raise ValueError("URL của instance phải là chuỗi")
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        raise ValueError(f"URL không hợp lệ: {url}")
+    return url.rstrip('/')
+
+
+class Instance:
+    """Một instance của dịch vụ: số request đang chờ, số lỗi và trạng thái eject."""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.times_ejected = 0
+        self.ejected_until = 0.0
+
+    def stats(self, now):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "total_requests": self.total_requests,
+            "failures": self.failures,
+            "times_ejected": self.times_ejected,
+            "ejected_for": round(self.ejected_until - now, 1) if self.ejected_until > now else 0,
+        }
+
+
+class LoadBalancer:
+    """
+    Danh sách instance của một dịch vụ. acquire() chọn instance cho một request, release() ghi nhận kết quả.
+    Instance lỗi eject_after_failures lần liên tiếp bị loại khỏi vòng chọn trong eject_seconds
+    (tăng dần theo số lần bị loại, tối đa max_eject_seconds). Nếu mọi instance đều bị loại,
+    Gateway vẫn chọn trong toàn bộ danh sách thay vì từ chối tất cả request.
+    """
+
+    def __init__(self, name, urls, strategy='p2c', eject_after_failures=3, eject_seconds=10,
+                 max_eject_seconds=300):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy phải là một trong {STRATEGIES}")
+        self.name = name
+        self.strategy = strategy
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+
+        self._lock = threading.Lock()
+        # Danh sách chỉ được thay thế (copy-on-write) khi thêm/bớt instance;
+        # request đang chạy vẫn giữ tham chiếu tới Instance của nó
+        self._instances = [Instance(normalize_url(url)) for url in urls]
+
+    def _choose(self, candidates):
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == 'p2c':
+            first, second = random.sample(candidates, 2)
+            return first if first.outstanding <= second.outstanding else second
+        # least_outstanding: phá thế hòa ngẫu nhiên để tải thấp không dồn hết vào instance đầu tiên
+        return min(candidates, key=lambda instance: (instance.outstanding, random.random()))
+
+    def acquire(self, exclude=()):
+        """
+        Chọn instance cho một request, bỏ qua các instance trong exclude (đã thử và lỗi).
+        Ném NoInstanceError nếu không còn instance nào để chọn.
+        """
+        with self._lock:
+            remaining = [i for i in self._instances if i not in exclude]
+            if not remaining:
+                raise NoInstanceError(f"Service {self.name} has no instances")
+            now = time.monotonic()
+            candidates = [i for i in remaining if i.ejected_until <= now] or remaining
+            instance = self._choose(candidates)
+            instance.outstanding += 1
+            instance.total_requests += 1
+            return instance
+
+    def acquire_retry(self, tried):
+        """Instance khác để gửi lại request sau lỗi kết nối; None nếu không còn instance nào chưa thử."""
+        try:
+            return self.acquire(exclude=tried)
+        except NoInstanceError:
+            return None
+
+    def release(self, instance, failed):
+        """Ghi nhận kết quả request; failed=None khi request bị hủy giữa chừng (không tính kết quả)."""
+        with self._lock:
+            instance.outstanding -= 1
+            if failed is None:
+                return
+            if not failed:
+                instance.consecutive_failures = 0
+                return
+            instance.failures += 1
+            instance.consecutive_failures += 1
+            if instance.consecutive_failures >= self.eject_after_failures:
+                instance.consecutive_failures = 0
+                instance.times_ejected += 1
+                duration = min(self.eject_seconds * instance.times_ejected, self.max_eject_seconds)
+                instance.ejected_until = time.monotonic() + duration
+                print(f"Gateway tạm loại instance {instance.url} của {self.name} trong {duration}s")
+
+    def add(self, url):
+        """Thêm instance; trả về False nếu URL đã có trong danh sách."""
+        url = normalize_url(url)
+        with self._lock:
+            if any(i.url == url for i in self._instances):
+                return False
+            self._instances = self._instances + [Instance(url)]
+            return True
+
+    def remove(self, url):
+        """
+        Bỏ instance khỏi vòng chọn; request đang chạy tới instance đó vẫn hoàn tất bình thường.
+        Trả về False nếu URL không có trong danh sách, ném LastInstanceError nếu đó là instance cuối cùng.
+        """
+        url = normalize_url(url)
+        with self._lock:
+            remaining = [i for i in self._instances if i.url != url]
+            if len(remaining) == len(self._instances):
+                return False
+            if not remaining:
+                raise LastInstanceError(f"Cannot remove the last instance of {self.name}")
+            self._instances = remaining
+            return True
+
+    def urls(self):
+        with self._lock:
+            return [i.url for i in self._instances]
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "strategy": self.strategy,
+                "instances": [i.stats(now) for i in self._instances],
+            }
+
+
+def change_instances(balancer, method, data):
+    """
+    Xử lý POST (thêm) / DELETE (bớt) instance với body {"url": ...}.
+    Trả về (dữ liệu JSON, status_code); không cho bỏ instance cuối cùng của dịch vụ.
+    """
+    url = data.get('url') if isinstance(data, dict) else None
+    try:
+        url = normalize_url(url)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if method == 'POST':
+        added = balancer.add(url)
+        return {"instances": balancer.urls()}, 201 if added else 200
+
+    try:
+        removed = balancer.remove(url)
+    except LastInstanceError:
+        return {"error": "Không thể bỏ instance cuối cùng của dịch vụ"}, 409
+    if not removed:
+        return {"error": f"Instance {url} không có trong {balancer.name}"}, 404
+    return {"instances": balancer.urls()}, 200
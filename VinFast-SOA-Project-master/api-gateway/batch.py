@@ -0,0 +1,109 @@
+# api-gateway/batch.py
+# Gộp nhiều request con độc lập vào một round trip Frontend -> Gateway
+
+import contextvars
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import BATCH_MAX_SIZE, BATCH_MAX_CONCURRENCY, BATCH_WORKERS
+
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+
+EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+
+class BatchError(ValueError):
+    """Body của POST /batch không hợp lệ."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_batch(data, services):
+    """
+    Kiểm tra body {"requests": [{"method", "service", "path", "body", "id"}, ...]}.
+    Request con sai định dạng không làm hỏng cả batch: nó được đánh dấu lỗi riêng.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise BatchError("Body phải có dạng {\"requests\": [...]}")
+    subrequests = data['requests']
+    if not subrequests:
+        raise BatchError("Danh sách requests rỗng")
+    if len(subrequests) > BATCH_MAX_SIZE:
+        raise BatchError(f"Tối đa {BATCH_MAX_SIZE} request con mỗi batch", 413)
+
+    parsed = []
+    for index, sub in enumerate(subrequests):
+        if not isinstance(sub, dict):
+            sub = {}
+        path, _, query = str(sub.get('path', '')).lstrip('/').partition('?')
+        item = {
+            "id": sub.get('id', index),
+            "method": str(sub.get('method', 'GET')).upper(),
+            "service": sub.get('service'),
+            "path": path,
+            "query": query,
+            "body": sub.get('body'),
+            "error": None,
+        }
+        if item['method'] not in ALLOWED_METHODS:
+            item['error'] = (405, f"Method {item['method']} không được hỗ trợ")
+        elif item['service'] not in services:
+            item['error'] = (404, "Service not found")
+        elif not path:
+            item['error'] = (400, "Thiếu path")
+        parsed.append(item)
+    return parsed
+
+
+def decode_body(content, content_type):
+    """Body JSON được trả về dạng object, còn lại trả về dạng chuỗi."""
+    if 'json' in (content_type or ''):
+        try:
+            return json.loads(content)
+        except ValueError:
+            pass
+    return content.decode('utf-8', errors='replace')
+
+
+def run_subrequest(execute, sub):
+    started = time.perf_counter()
+    if sub['error'] is not None:
+        status_code, message = sub['error']
+        body = {"error": message}
+    else:
+        status_code, content, content_type = execute(sub)
+        body = decode_body(content, content_type)
+    return {
+        "id": sub['id'],
+        "status": status_code,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "body": body,
+    }
+
+
+def run_batch(subrequests, execute, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """
+    Chạy các request con đồng thời, tối đa max_concurrency request con của batch cùng lúc.
+    execute(sub) trả về (status_code, body bytes, content_type). Kết quả giữ đúng thứ tự đầu vào.
+    """
+    results = [None] * len(subrequests)
+    remaining = iter(enumerate(subrequests))
+    pending = {}
+
+    def submit_next():
+        for index, sub in remaining:
+            # Request con chạy trong thread khác nhưng vẫn thuộc trace của request /batch
+            pending[EXECUTOR.submit(contextvars.copy_context().run, run_subrequest, execute, sub)] = index
+            return
+
+    for _ in range(max_concurrency):
+        submit_next()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+            submit_next()
+    return results
@@ -0,0 +1,214 @@
+# api-gateway/compression.py
+# Nén phản hồi tại Gateway theo Accept-Encoding của client: brotli (nếu đã cài) hoặc gzip
+
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn: không có thì Gateway chỉ nén gzip
+    brotli = None
+
+# Thứ tự ưu tiên của Gateway khi client chấp nhận nhiều kiểu nén với cùng trọng số q
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """'gzip, br;q=0.8' -> {'gzip': 1.0, 'br': 0.8}"""
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding, available=SUPPORTED_ENCODINGS):
+    """Kiểu nén có trọng số q cao nhất mà client chấp nhận, hoặc None."""
+    codings = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def weak_etag(etag):
+    """Body đã nén khác từng byte với bản gốc nên ETag mạnh được chuyển thành ETag yếu."""
+    if etag and not etag.startswith('W/'):
+        return 'W/' + etag
+    return etag
+
+
+class StreamCompressor:
+    """Nén một body đi qua theo từng khối; finish() trả về phần còn lại và ghi nhận thống kê."""
+
+    def __init__(self, owner, encoding):
+        self.owner = owner
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu = 0.0
+        self._compressor = owner.new_compressor(encoding)
+
+    def compress(self, chunk):
+        started = time.thread_time()
+        data = self._compressor.process(chunk) if self.encoding == 'br' else self._compressor.compress(chunk)
+        self.cpu += time.thread_time() - started
+        self.bytes_in += len(chunk)
+        self.bytes_out += len(data)
+        return data
+
+    def finish(self):
+        started = time.thread_time()
+        data = self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+        self.cpu += time.thread_time() - started
+        self.bytes_out += len(data)
+        self.owner.record_stream(self)
+        return data
+
+
+class ResponseCompressor:
+    """
+    Chọn và thực hiện việc nén phản hồi. Chỉ nén Content-Type trong content_types (so theo tiền tố)
+    và body từ min_size byte. Body đã nén được giữ trong cache LRU (theo hash của body gốc)
+    để các phản hồi lặp lại (danh mục xe) không phải nén lại.
+    """
+
+    def __init__(self, min_size, content_types, gzip_level, brotli_quality, cache_max_bytes):
+        self.min_size = min_size
+        self.content_types = tuple(t.lower() for t in content_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_max_bytes = cache_max_bytes
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+        self.responses_compressed = 0
+        self.streams_compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def is_compressible(self, content_type):
+        media_type = (content_type or '').split(';')[0].strip().lower()
+        # Server-Sent Events: bộ nén giữ byte lại trong buffer, client sẽ không nhận được từng sự kiện ngay
+        if media_type == 'text/event-stream':
+            return False
+        return bool(media_type) and media_type.startswith(self.content_types)
+
+    def select(self, accept_encoding, status_code, content_type, content_encoding, length):
+        """Kiểu nén cho một phản hồi (length=None nếu chưa biết độ dài), hoặc None nếu không nén."""
+        if not 200 <= status_code < 300 or status_code in (204, 206):
+            return None
+        if content_encoding and content_encoding.lower() != 'identity':
+            return None  # Back-end đã nén sẵn
+        if not self.is_compressible(content_type):
+            return None
+        if length is not None and length < self.min_size:
+            return None
+        return choose_encoding(accept_encoding)
+
+    def new_compressor(self, encoding):
+        if encoding == 'br':
+            return brotli.Compressor(quality=self.brotli_quality)
+        # wbits=31: định dạng gzip (header + CRC) thay vì zlib
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, body, encoding):
+        """Nén toàn bộ body; body giống hệt đã nén trước đó được lấy lại từ cache."""
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                self.responses_compressed += 1
+                self.bytes_in += len(body)
+                self.bytes_out += len(compressed)
+                return compressed
+
+        started = time.thread_time()
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressor = self.new_compressor(encoding)
+            compressed = compressor.compress(body) + compressor.flush()
+        cpu = time.thread_time() - started
+
+        with self._lock:
+            self.cache_misses += 1
+            self.responses_compressed += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+            self.cpu_seconds += cpu
+            if len(compressed) <= self.cache_max_bytes and key not in self._cache:
+                self._cache[key] = compressed
+                self._cache_bytes += len(compressed)
+                while self._cache_bytes > self.cache_max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_bytes -= len(evicted)
+        return compressed
+
+    def open_stream(self, encoding):
+        return StreamCompressor(self, encoding)
+
+    def compress_iter(self, chunks, encoding):
+        """Nén một body dạng iterator (phản hồi streaming của Gateway Flask)."""
+        stream = self.open_stream(encoding)
+        try:
+            for chunk in chunks:
+                data = stream.compress(chunk)
+                if data:
+                    yield data
+            yield stream.finish()
+        finally:
+            # Client ngắt kết nối giữa chừng: đóng iterator gốc để trả kết nối Back-end về pool
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def record_stream(self, stream):
+        with self._lock:
+            self.streams_compressed += 1
+            self.bytes_in += stream.bytes_in
+            self.bytes_out += stream.bytes_out
+            self.cpu_seconds += stream.cpu
+
+    def stats(self):
+        with self._lock:
+            return {
+                "encodings": list(SUPPORTED_ENCODINGS),
+                "min_size": self.min_size,
+                "responses_compressed": self.responses_compressed,
+                "streams_compressed": self.streams_compressed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+                "cpu_ms": round(self.cpu_seconds * 1000, 2),
+                "cache": {
+                    "entries": len(self._cache),
+                    "bytes": self._cache_bytes,
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses,
+                },
+            }
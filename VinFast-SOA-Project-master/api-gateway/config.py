@@ -0,0 +1,113 @@
+# api-gateway/config.py
+# Cấu hình dùng chung cho Gateway Flask (gateway_app.py) và Gateway ASGI (gateway_asgi.py)
+
+# Định nghĩa URL của các dịch vụ Back-end (Luôn dùng cổng 500x)
+# instances: URL gốc của từng instance; Gateway chia tải giữa các instance (xem LOAD_BALANCING)
+#            và có thể thêm/bớt instance khi đang chạy qua /gateway/services/<service>/instances (token admin)
+# pool_size: số kết nối keep-alive tối đa Gateway Flask giữ sẵn tới mỗi instance
+# max_connections: số kết nối đồng thời tối đa của Gateway ASGI tới mỗi dịch vụ
+# max_concurrent: số request đồng thời tối đa Gateway Flask gửi tới mỗi dịch vụ; vượt quá thì trả 503 ngay
+SERVICES = {
+    "users": {"instances": ["http://127.0.0.1:5001/api/v1"], "pool_size": 10, "max_connections": 500,
+              "max_concurrent": 64},
+    "catalog": {"instances": ["http://127.0.0.1:5002/api/v1"], "pool_size": 20, "max_connections": 1000,
+                "max_concurrent": 128},
+    "orders": {"instances": ["http://127.0.0.1:5003/api/v1"], "pool_size": 10, "max_connections": 500,
+               "max_concurrent": 32}
+}
+
+# Thời gian chờ tối đa (giây) cho mỗi lần gọi Back-end
+UPSTREAM_TIMEOUT = 10
+
+# Cache phản hồi GET tại Gateway: (service, regex của path, TTL giây)
+# Hết TTL, Gateway hỏi lại Back-end bằng If-None-Match thay vì tải lại toàn bộ
+CACHE_RULES = [
+    ("catalog", r"^catalog/cars$", 60),
+    ("catalog", r"^catalog/cars/\d+$", 300),
+]
+# Dung lượng tối đa của cache (byte); vượt quá thì loại mục ít dùng nhất (LRU)
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Chuyển tiếp body request/response theo từng khối thay vì đọc toàn bộ vào RAM
+# (các route trong CACHE_RULES vẫn được đọc toàn bộ để lưu cache)
+STREAMING_PROXY = True
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Số ID tối đa trong một lần tra cứu theo lô (?ids=...) khi ghép dữ liệu Dashboard
+AGGREGATION_BATCH_SIZE = 100
+
+# POST /batch: số request con tối đa mỗi batch, số request con của một batch chạy đồng thời,
+# và tổng số thread thực hiện request con của toàn Gateway
+BATCH_MAX_SIZE = 20
+BATCH_MAX_CONCURRENCY = 8
+BATCH_WORKERS = 32
+
+# Gộp các GET giống hệt nhau đang cùng chờ Back-end (single-flight): (service, regex của path)
+# Lời gọi Back-end khi cache (CACHE_RULES) hết hạn hoặc chưa có cũng luôn được gộp.
+# Phản hồi gộp được đọc toàn bộ trước khi trả về: luồng thay đổi (long-poll catalog/changes,
+# SSE catalog/changes/stream) không được gộp mà đi qua đường streaming
+COALESCE_RULES = [
+    ("catalog", r"^catalog/(?!changes(/|$))"),
+]
+
+# Circuit breaker mặc định cho mỗi dịch vụ; ghi đè từng dịch vụ bằng khóa "breaker" trong SERVICES.
+# Mạch mở khi >= 50% (hoặc >= 80% chậm hơn 3s) trong 20 lời gọi gần nhất, thử lại sau 15s.
+BREAKER_DEFAULTS = {
+    "window_size": 20,
+    "min_calls": 5,
+    "failure_rate_threshold": 0.5,
+    "slow_call_seconds": 3.0,
+    "slow_call_rate_threshold": 0.8,
+    "open_seconds": 15,
+    "half_open_max_calls": 1,
+}
+
+# Cân bằng tải mặc định giữa các instance; ghi đè từng dịch vụ bằng khóa "balancer" trong SERVICES.
+# strategy: "p2c" (chọn ngẫu nhiên 2 instance, lấy instance ít request đang chờ hơn)
+#           hoặc "least_outstanding" (instance ít request đang chờ nhất)
+# Instance lỗi (kết nối, timeout, 5xx) 3 lần liên tiếp bị tạm loại 10s, lần sau lâu hơn (tối đa 300s)
+LOAD_BALANCING = {
+    "strategy": "p2c",
+    "eject_after_failures": 3,
+    "eject_seconds": 10,
+    "max_eject_seconds": 300,
+}
+
+# Nén phản hồi theo Accept-Encoding của client: brotli (nếu đã cài gói Brotli) hoặc gzip.
+# Chỉ nén Content-Type trong COMPRESSIBLE_TYPES (so theo tiền tố) và body từ COMPRESSION_MIN_SIZE byte;
+# body đã nén được cache (tối đa COMPRESSION_CACHE_MAX_BYTES) để không nén lại các phản hồi lặp lại.
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSION_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+# Kiểm soát tải (admission control) của Gateway Flask: request vượt ngân sách bị từ chối ngay
+# (429/503 kèm Retry-After) thay vì xếp hàng làm tăng độ trễ của mọi người.
+# CLIENT_RATE_LIMITS: token bucket cho mỗi client (địa chỉ IP) theo loại lưu lượng;
+#   rate: số request/giây được nạp lại, burst: số request tối đa dồn một lúc. Vượt quá -> 429
+CLIENT_RATE_LIMITS = {
+    "default": {"rate": 20, "burst": 40},
+    "priority": {"rate": 5, "burst": 10},
+}
+# ROUTE_RATE_LIMITS: token bucket chung (mọi client) cho route tốn kém: (method, service, regex path, rate, burst).
+# Vượt quá -> 503. Lưu lượng ưu tiên không bị giới hạn bởi các bucket này.
+ROUTE_RATE_LIMITS = [
+    ("GET", "orders", r"^orders$", 20, 40),
+    ("GET", "catalog", r"^catalog/", 500, 1000),
+]
+# Lưu lượng ưu tiên (đặt hàng): có token bucket riêng, được dùng PRIORITY_RESERVED_RATIO số slot
+# max_concurrent dành riêng và chờ tối đa PRIORITY_WAIT_SECONDS khi dịch vụ đầy thay vì bị từ chối ngay
+PRIORITY_ROUTES = [
+    ("POST", "orders", r"^orders$"),
+]
+PRIORITY_RESERVED_RATIO = 0.25
+PRIORITY_WAIT_SECONDS = 2.0
+# Số client tối đa được theo dõi token bucket (bỏ client lâu không gửi request nhất)
+MAX_CLIENT_BUCKETS = 10000
+
+# Xác thực JWT tại Gateway: token sai/hết hạn bị từ chối (401); token hợp lệ được chuyển thành
+# header X-User-Id / X-User-Role cho Back-end. Claims đã giải mã được cache (tối đa số token dưới đây)
+# cho đến khi token hết hạn. Khóa bí mật dùng chung với User Service (common/auth.py).
+AUTH_CLAIMS_CACHE_SIZE = 10000
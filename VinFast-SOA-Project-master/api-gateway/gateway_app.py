@@ -1,19 +1,302 @@
 # gateway_app.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import requests
 from flask_cors import CORS
 import os
+import sys
+import time
+
+# Thư mục gốc của dự án (chứa package common/ dùng chung giữa các dịch vụ)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import (SERVICES, UPSTREAM_TIMEOUT, CACHE_RULES, CACHE_MAX_BYTES, STREAMING_PROXY, STREAM_CHUNK_SIZE,
+                    COALESCE_RULES, BREAKER_DEFAULTS, LOAD_BALANCING, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE,
+                    COMPRESSIBLE_TYPES, GZIP_LEVEL, BROTLI_QUALITY, COMPRESSION_CACHE_MAX_BYTES,
+                    CLIENT_RATE_LIMITS, ROUTE_RATE_LIMITS, PRIORITY_ROUTES, PRIORITY_RESERVED_RATIO,
+                    PRIORITY_WAIT_SECONDS, MAX_CLIENT_BUCKETS, AUTH_CLAIMS_CACHE_SIZE)
+from headers import end_to_end_headers
+from response_cache import ResponseCache, CacheEntry
+from streaming import request_body, iter_upstream
+from aggregation import build_order_dashboard
+from batch import BatchError, parse_batch, run_batch
+from singleflight import SingleFlight, compile_rules, matches
+from upstream import BackendOverloaded, UpstreamRejected, build_pools
+from admission import PRIORITY, AdmissionController, retry_after_header
+from auth import ADMIN_ROLE, Forbidden, InvalidToken, TokenVerifier, bearer_token, identity_headers, require_role
+from common.auth import JWT_SECRET, JWT_ALGORITHM, USER_ID_HEADER
+from common.metrics import instrument, url_rule_label
+from common.tracing import trace_requests
+from balancer import change_instances
+from compression import ResponseCompressor, weak_etag
 
 app = Flask(__name__)
 CORS(app) # Cho phép Frontend truy cập Gateway
 
-# Định nghĩa URL của các dịch vụ Back-end (Luôn dùng cổng 500x)
-SERVICES = {
-    "users": "http://127.0.0.1:5001/api/v1",
-    "catalog": "http://127.0.0.1:5002/api/v1",
-    "orders": "http://127.0.0.1:5003/api/v1"
-}
+def metrics_route():
+    """Nhãn route cho /metrics: request qua router được tách theo dịch vụ đích đã khai báo."""
+    service = (request.view_args or {}).get('service')
+    if request.endpoint == 'gateway_router' and service in SERVICES:
+        return f"/{service}/<path:path>"
+    return url_rule_label()
+
+# Số request, độ trễ theo route, thời gian chờ từng dịch vụ Back-end (upstream.py) và endpoint /metrics
+instrument(app, route_label=metrics_route)
+# Mỗi request nhận một trace id (trả về Frontend qua X-Trace-Id), truyền tới Back-end qua header traceparent
+trace_requests(app, 'gateway', expose_trace_id=True)
+
+# Danh sách dịch vụ Back-end (SERVICES) được khai báo trong config.py
+# Mỗi dịch vụ có một client HTTP riêng, tái sử dụng kết nối thay vì mở TCP mới mỗi lần
+# Mỗi pool có một circuit breaker: dịch vụ lỗi/treo thì Gateway trả 503 ngay thay vì chờ timeout
+# và chia tải giữa các instance của dịch vụ (LOAD_BALANCING)
+# Số request đồng thời tới mỗi dịch vụ bị giới hạn bởi max_concurrent, một phần dành cho request ưu tiên
+POOLS = build_pools(SERVICES, BREAKER_DEFAULTS, LOAD_BALANCING, PRIORITY_RESERVED_RATIO, PRIORITY_WAIT_SECONDS)
+
+# Token bucket theo client và theo route (xem CLIENT_RATE_LIMITS, ROUTE_RATE_LIMITS trong config.py)
+ADMISSION = AdmissionController(CLIENT_RATE_LIMITS, ROUTE_RATE_LIMITS, PRIORITY_ROUTES, MAX_CLIENT_BUCKETS)
+
+# Cache phản hồi GET cho các route đọc nhiều (danh mục xe), cấu hình trong CACHE_RULES
+CACHE = ResponseCache(CACHE_RULES, CACHE_MAX_BYTES)
+
+# Các GET giống hệt nhau đang chạy đồng thời chỉ tạo một lời gọi Back-end
+FLIGHTS = SingleFlight()
+COALESCE = compile_rules(COALESCE_RULES)
+
+# Xác thực JWT ở biên: mỗi token chỉ được giải mã một lần cho đến khi hết hạn
+VERIFIER = TokenVerifier(JWT_SECRET, JWT_ALGORITHM, AUTH_CLAIMS_CACHE_SIZE)
+
+# Nén phản hồi gửi về Frontend theo Accept-Encoding
+COMPRESSOR = ResponseCompressor(COMPRESSION_MIN_SIZE, COMPRESSIBLE_TYPES, GZIP_LEVEL, BROTLI_QUALITY,
+                                COMPRESSION_CACHE_MAX_BYTES)
+
+# Header của Back-end không lưu vào cache: requests đã giải nén body và Flask tự tính lại độ dài
+UNCACHED_HEADERS = ('content-length', 'content-encoding', 'set-cookie', 'date', 'server')
+
+# Date/Server do chính máy chủ của Gateway thêm vào
+BUFFERED_EXCLUDED_HEADERS = ('content-length', 'content-encoding', 'date', 'server')
+STREAMED_EXCLUDED_HEADERS = ('date', 'server')
+
+@app.route('/gateway/stats', methods=['GET'])
+def gateway_stats():
+    """Thống kê nội bộ của Gateway (pool kết nối, cache, request GET đã gộp, nén, kiểm soát tải, xác thực)."""
+    return jsonify({
+        "pools": {name: pool.stats() for name, pool in POOLS.items()},
+        "cache": CACHE.stats(),
+        "singleflight": FLIGHTS.stats(),
+        "compression": COMPRESSOR.stats(),
+        "admission": ADMISSION.stats(),
+        "auth": VERIFIER.stats()
+    }), 200
+
+@app.route('/gateway/health', methods=['GET'])
+def gateway_health():
+    """Trạng thái circuit breaker của từng dịch vụ Back-end."""
+    services = {name: pool.breaker.stats() for name, pool in POOLS.items()}
+    healthy = all(stats["state"] == "closed" for stats in services.values())
+    return jsonify({"status": "ok" if healthy else "degraded", "services": services}), 200
+
+@app.route('/gateway/services', methods=['GET'])
+def list_services():
+    """Danh sách instance của từng dịch vụ và trạng thái cân bằng tải."""
+    return jsonify({name: pool.balancer.stats() for name, pool in POOLS.items()}), 200
+
+@app.route('/gateway/services/<service>/instances', methods=['POST', 'DELETE'])
+def update_instances(service):
+    """Thêm (POST) hoặc bớt (DELETE) một instance của dịch vụ khi Gateway đang chạy (chỉ quản trị viên)."""
+    rejected = require_admin()
+    if rejected:
+        return rejected
+    if service not in POOLS:
+        return jsonify({"error": "Service not found"}), 404
+    data, status_code = change_instances(POOLS[service].balancer, request.method, request.get_json(silent=True))
+    return jsonify(data), status_code
+
+def upstream_unavailable(service, error):
+    """Phản hồi 503 khi không gọi được dịch vụ; kèm Retry-After nếu Gateway chủ động từ chối (mạch mở, quá tải)."""
+    body = jsonify({"error": f"Gateway failed to connect to {service}"})
+    if isinstance(error, UpstreamRejected):
+        return body, 503, {"Retry-After": retry_after_header(error.retry_after)}
+    print(f"Lỗi Gateway khi kết nối đến {service}: {error}")
+    return body, 503
+
+def authenticate():
+    """
+    Xác thực Bearer token (nếu có) của request hiện tại.
+    Trả về (header định danh chuyển tiếp cho Back-end, phản hồi 401 nếu token không hợp lệ hoặc None).
+    Request không gửi token vẫn được chuyển tiếp nhưng không kèm định danh.
+    """
+    try:
+        token = bearer_token(request.headers.get('Authorization'))
+        if token is None:
+            return {}, None
+        return identity_headers(VERIFIER.verify(token)), None
+    except InvalidToken:
+        return {}, (jsonify({"error": "Invalid or expired token"}), 401,
+                    {"WWW-Authenticate": 'Bearer error="invalid_token"'})
+
+def require_admin():
+    """
+    Endpoint quản trị của Gateway (đổi instance nhận lưu lượng thật, xóa cache) cần token có role admin:
+    trả về phản hồi 401/403 nếu không đủ quyền, hoặc None.
+    """
+    try:
+        require_role(VERIFIER, request.headers.get('Authorization'), ADMIN_ROLE)
+        return None
+    except InvalidToken:
+        return jsonify({"error": "Admin token required"}), 401, {"WWW-Authenticate": 'Bearer'}
+    except Forbidden:
+        return jsonify({"error": "Admin role required"}), 403
+
+def admit(service, path, identity):
+    """
+    Kiểm tra ngân sách của client và route trước khi gọi Back-end.
+    Client đã đăng nhập được tính theo user_id, client chưa đăng nhập theo địa chỉ IP.
+    Trả về (loại lưu lượng, phản hồi 429/503 nếu request bị từ chối hoặc None).
+    """
+    client = f"user:{identity[USER_ID_HEADER]}" if identity else request.remote_addr
+    traffic_class, rejection = ADMISSION.check(client, request.method, service, path)
+    if rejection is None:
+        return traffic_class, None
+    status_code, retry_after = rejection
+    message = "Too many requests" if status_code == 429 else "Gateway is over capacity for this route"
+    return traffic_class, (jsonify({"error": message}), status_code, {"Retry-After": retry_after_header(retry_after)})
+
+@app.route('/gateway/cache/purge', methods=['POST'])
+def purge_cache():
+    """Xóa cache phản hồi: toàn bộ, hoặc theo tiền tố key (ví dụ "catalog/catalog/cars/1"); chỉ quản trị viên."""
+    rejected = require_admin()
+    if rejected:
+        return rejected
+    data = request.get_json(silent=True) or {}
+    removed = CACHE.purge(data.get('prefix'))
+    return jsonify({"purged": removed}), 200
+
+def cached_response(entry, cache_status):
+    """Trả phản hồi từ cache; trả 304 nếu Frontend đã có đúng phiên bản (If-None-Match)."""
+    headers = list(entry.headers) + [('X-Cache', cache_status)]
+    # So sánh yếu: phản hồi đã nén được gửi đi với ETag yếu (W/"...")
+    if entry.etag and request.if_none_match.contains_raw(weak_etag(entry.etag)):
+        return b'', 304, headers
+    return entry.body, entry.status_code, headers
+
+def coalesced_get(service, path, query_string, headers):
+    """GET đọc toàn bộ body; các request giống hệt đang chạy đồng thời dùng chung một lời gọi Back-end."""
+    key = (service, path, query_string, tuple(sorted(headers.items())))
+
+    def fetch():
+        response = POOLS[service].request(
+            'GET', path, params=query_string or None, headers=headers, timeout=UPSTREAM_TIMEOUT
+        )
+        response.content  # Đọc hết body trước khi chia sẻ cho các thread đang chờ
+        return response
+
+    response, _ = FLIGHTS.do(key, fetch)
+    return response
+
+def cached_get(service, path, query_string, ttl):
+    """
+    Đọc GET qua cache: còn hạn thì trả ngay, hết hạn thì xác thực lại bằng ETag.
+    Trả về (entry, trạng thái cache: HIT / REVALIDATED / MISS).
+    """
+    key = CACHE.make_key(service, path, query_string)
+    entry = CACHE.get(key)
+    if entry is not None and entry.is_fresh():
+        CACHE.record_hit()
+        return entry, 'HIT'
+
+    headers = {"Accept": "application/json"}
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+
+    response = coalesced_get(service, path, query_string, headers)
+
+    # Back-end xác nhận dữ liệu không đổi: dùng lại body trong cache
+    if response.status_code == 304 and entry is not None:
+        entry.refresh()
+        CACHE.record_revalidation()
+        return entry, 'REVALIDATED'
+
+    CACHE.record_miss()
+    entry = CacheEntry(
+        response.status_code,
+        end_to_end_headers(response.headers.items(), exclude=UNCACHED_HEADERS),
+        response.content,
+        response.headers.get('ETag'),
+        ttl
+    )
+    cache_control = response.headers.get('Cache-Control', '')
+    if response.status_code == 200 and 'no-store' not in cache_control and 'private' not in cache_control:
+        CACHE.put(key, entry)
+    return entry, 'MISS'
+
+def fetch_cached(service, path, ttl):
+    """Phục vụ request GET hiện tại của Frontend qua cache."""
+    entry, cache_status = cached_get(service, path, request.query_string.decode('latin-1'), ttl)
+    return cached_response(entry, cache_status)
+
+@app.route('/dashboard/orders', methods=['GET'])
+def dashboard_orders():
+    """Đơn hàng đã kèm tên người dùng và tên mẫu xe (thay cho vòng lặp N+1 ở Frontend)."""
+    identity, rejected = authenticate()
+    if rejected:
+        return rejected
+    _, rejected = admit('dashboard', 'orders', identity)
+    if rejected:
+        return rejected
+    try:
+        orders, status_code = build_order_dashboard(POOLS)
+    except requests.exceptions.RequestException as e:
+        return upstream_unavailable('orders', e)
+
+    if orders is None:
+        return jsonify({"error": f"Order Service trả về {status_code}"}), status_code
+    return jsonify(orders), 200
+
+def execute_subrequest(sub, identity):
+    """
+    Thực hiện một request con của /batch (kèm định danh đã xác thực của request /batch);
+    GET trong CACHE_RULES được phục vụ qua cache.
+    """
+    try:
+        ttl = CACHE.ttl_for(sub['service'], sub['path']) if sub['method'] == 'GET' else None
+        if ttl is not None:
+            entry, _ = cached_get(sub['service'], sub['path'], sub['query'], ttl)
+            content_type = next((v for k, v in entry.headers if k.lower() == 'content-type'), '')
+            return entry.status_code, entry.body, content_type
+
+        response = POOLS[sub['service']].request(
+            sub['method'],
+            sub['path'],
+            params=sub['query'] or None,
+            json=sub['body'],
+            headers=identity,
+            timeout=UPSTREAM_TIMEOUT
+        )
+        return response.status_code, response.content, response.headers.get('Content-Type', '')
+    except requests.exceptions.RequestException as e:
+        print(f"Lỗi Gateway khi kết nối đến {sub['service']}: {e}")
+        return 503, f'{{"error": "Gateway failed to connect to {sub["service"]}"}}'.encode(), 'application/json'
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Thực hiện nhiều request con độc lập (có thể khác dịch vụ) đồng thời trong một round trip."""
+    identity, rejected = authenticate()
+    if rejected:
+        return rejected
+    _, rejected = admit('batch', '', identity)
+    if rejected:
+        return rejected
+    try:
+        subrequests = parse_batch(request.get_json(silent=True), SERVICES)
+    except BatchError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    started = time.perf_counter()
+    responses = run_batch(subrequests, lambda sub: execute_subrequest(sub, identity))
+    return jsonify({
+        "responses": responses,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }), 200
 
 @app.route('/<service>/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def gateway_router(service, path):
@@ -22,28 +305,114 @@ def gateway_router(service, path):
     if service not in SERVICES:
         return jsonify({"error": "Service not found"}), 404
     
-    # 1. Xây dựng URL đích
+    # Xác thực token ở biên: Back-end nhận định danh qua header thay vì tự giải mã token
+    identity, rejected = authenticate()
+    if rejected:
+        return rejected
+
+    # Kiểm soát tải: request vượt ngân sách của client/route bị từ chối trước khi tới Back-end
+    traffic_class, rejected = admit(service, path, identity)
+    if rejected:
+        return rejected
+    priority = traffic_class == PRIORITY
+
+    # 1. Lấy pool kết nối của dịch vụ đích
     # Ví dụ: /catalog/cars/1 -> http://127.0.0.1:5002/api/v1/catalog/cars/1
-    target_url = f"{SERVICES[service]}/{path}"
+    pool = POOLS[service]
     
     # 2. Chuyển tiếp yêu cầu (Forward the request)
     try:
-        response = requests.request(
-            method=request.method,
-            url=target_url,
-            # Giữ nguyên Content-Type và Body từ Frontend
-            headers={"Content-Type": request.headers.get("Content-Type", "application/json")},
+        # Các route đọc trong CACHE_RULES được phục vụ qua cache
+        ttl = CACHE.ttl_for(service, path) if request.method == 'GET' else None
+        if ttl is not None:
+            return fetch_cached(service, path, ttl)
+
+        # Giữ nguyên Content-Type và Body từ Frontend, kèm định danh đã xác thực
+        headers = {"Content-Type": request.headers.get("Content-Type", "application/json"), **identity}
+        # Chuỗi query gốc thay vì request.args: MultiDict chỉ chuyển giá trị đầu của khóa lặp lại (?ids=1&ids=2)
+        query_string = request.query_string.decode('latin-1')
+
+        # GET giống hệt nhau đang chạy đồng thời (ví dụ ngày ra mắt mẫu xe mới) được gộp lại
+        if request.method == 'GET' and matches(COALESCE, service, path):
+            response = coalesced_get(service, path, query_string, headers)
+            return (response.content, response.status_code,
+                    end_to_end_headers(response.headers.items(), exclude=BUFFERED_EXCLUDED_HEADERS))
+
+        if STREAMING_PROXY:
+            # Body đi qua Gateway theo từng khối, byte từ Back-end được giữ nguyên (kể cả nén)
+            response = pool.request(
+                request.method,
+                path,
+                priority=priority,
+                params=query_string or None,
+                headers=headers,
+                data=request_body(request, STREAM_CHUNK_SIZE),
+                stream=True,
+                timeout=UPSTREAM_TIMEOUT
+            )
+            proxied = Response(
+                iter_upstream(response, STREAM_CHUNK_SIZE),
+                status=response.status_code,
+                headers=end_to_end_headers(response.headers.items(), exclude=STREAMED_EXCLUDED_HEADERS),
+                direct_passthrough=True
+            )
+            # Đóng phản hồi Back-end (trả kết nối và slot max_concurrent) cả khi client ngắt trước khi đọc body
+            proxied.call_on_close(response.close)
+            return proxied
+
+        response = pool.request(
+            request.method,
+            path,
+            priority=priority,
+            params=query_string or None,
+            headers=headers,
             data=request.get_data(),
-            timeout=10
+            timeout=UPSTREAM_TIMEOUT
         )
         
         # 3. Trả về phản hồi từ Back-end
         # Sử dụng Response thay vì jsonify để tránh lỗi encoding
-        return response.content, response.status_code, response.headers.items()
+        return (response.content, response.status_code,
+                end_to_end_headers(response.headers.items(), exclude=BUFFERED_EXCLUDED_HEADERS))
 
+    except BackendOverloaded as e:
+        # Dịch vụ đã đủ số request đồng thời: trả 503 ngay thay vì xếp hàng
+        ADMISSION.record_shed(traffic_class)
+        return upstream_unavailable(service, e)
     except requests.exceptions.RequestException as e:
-        print(f"Lỗi Gateway khi kết nối đến {service}: {e}")
-        return jsonify({"error": f"Gateway failed to connect to {service}"}), 503
+        return upstream_unavailable(service, e)
+
+@app.after_request
+def compress_response(response):
+    """Nén phản hồi (kể cả phản hồi streaming) nếu Frontend chấp nhận gzip/brotli."""
+    if not COMPRESSION_ENABLED or request.method == 'HEAD':
+        return response
+    content_type = response.headers.get('Content-Type', '')
+    content_encoding = response.headers.get('Content-Encoding')
+    if content_encoding or not COMPRESSOR.is_compressible(content_type):
+        return response
+    # Nội dung trả về phụ thuộc Accept-Encoding của từng client
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        length = response.headers.get('Content-Length', type=int)
+    else:
+        length = len(response.get_data())
+    encoding = COMPRESSOR.select(request.headers.get('Accept-Encoding'), response.status_code,
+                                 content_type, content_encoding, length)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = COMPRESSOR.compress_iter(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(COMPRESSOR.compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag = response.headers.get('ETag')
+    if etag:
+        response.headers['ETag'] = weak_etag(etag)
+    return response
 
 if __name__ == '__main__':
     # Chạy trên cổng độc lập 8000
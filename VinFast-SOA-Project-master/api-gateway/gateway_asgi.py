@@ -0,0 +1,546 @@
+# gateway_asgi.py
+# Gateway bất đồng bộ (ASGI): cùng hợp đồng định tuyến /<service>/<path> và bảng SERVICES
+# với gateway_app.py, nhưng mọi request chờ Back-end đều dùng chung một event loop.
+#
+# Chạy: uvicorn gateway_asgi:app --port 8000
+
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+import aiohttp
+
+# Thư mục gốc của dự án (chứa package common/ dùng chung giữa các dịch vụ)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import (SERVICES, UPSTREAM_TIMEOUT, STREAMING_PROXY, STREAM_CHUNK_SIZE, COALESCE_RULES,
+                    BREAKER_DEFAULTS, LOAD_BALANCING, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, COMPRESSIBLE_TYPES,
+                    GZIP_LEVEL, BROTLI_QUALITY, COMPRESSION_CACHE_MAX_BYTES, AUTH_CLAIMS_CACHE_SIZE)
+from auth import ADMIN_ROLE, Forbidden, InvalidToken, TokenVerifier, bearer_token, identity_headers, require_role
+from common.auth import JWT_SECRET, JWT_ALGORITHM
+from balancer import RETRYABLE_METHODS, LoadBalancer, NoInstanceError, change_instances
+from compression import ResponseCompressor, weak_etag
+from headers import end_to_end_headers
+from singleflight import AsyncSingleFlight, compile_rules, matches
+
+# Như route /<service>/<path> của gateway_app.py: Flask tự thêm HEAD (đi cùng GET) và OPTIONS
+ALLOWED_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'DELETE'}
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+class UpstreamResponse:
+    """Phản hồi đã đọc xong từ Back-end."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+class AsyncServicePool:
+    """Client HTTP không chặn (aiohttp) cho một dịch vụ Back-end (một hoặc nhiều instance)."""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.balancer = LoadBalancer(name, config["instances"], **{**LOAD_BALANCING, **config.get("balancer", {})})
+        # limit: số kết nối đồng thời tối đa; kết nối rảnh được giữ lại (keep-alive) để tái sử dụng
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=config.get("max_connections", 1000)),
+            timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+        )
+        # Lỗi kết nối, timeout và HTTP 5xx được tính là lỗi của dịch vụ
+        self.breaker = CircuitBreaker(name, **{**BREAKER_DEFAULTS, **config.get("breaker", {})})
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.errors = 0
+
+    def _begin(self):
+        """
+        Kiểm tra circuit breaker (ném CircuitOpenError nếu mạch đang mở), chọn instance và cập nhật bộ đếm.
+        Trả về (instance, thời điểm bắt đầu).
+        """
+        self.breaker.before_call()
+        try:
+            instance = self.balancer.acquire()
+        except NoInstanceError as e:
+            self.breaker.cancel()
+            raise aiohttp.ClientConnectionError(str(e)) from e
+        # Chỉ chạy trong một event loop nên không cần khóa khi cập nhật bộ đếm
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return instance, time.monotonic()
+
+    def _finish(self, instance, started, failed):
+        """Ghi nhận kết quả vào circuit breaker và bộ cân bằng tải; failed=None khi request bị hủy."""
+        if failed is None:
+            self.breaker.cancel()
+        else:
+            self.breaker.record(failed, time.monotonic() - started)
+        self.balancer.release(instance, failed)
+
+    async def _send(self, method, path, instance, **kwargs):
+        """
+        Gửi request, trả về (instance đã trả lời, phản hồi) khi vừa nhận header.
+        GET/HEAD không kết nối được tới một instance được gửi lại một lần tới instance khác.
+        """
+        retries = 1 if method.upper() in RETRYABLE_METHODS else 0
+        tried = []
+        while True:
+            tried.append(instance)
+            try:
+                return instance, await self.session.request(method, f"{instance.url}/{path}", **kwargs)
+            except aiohttp.ClientConnectionError:
+                self.balancer.release(instance, True)
+                instance = self.balancer.acquire_retry(tried) if len(tried) <= retries else None
+                if instance is None:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.balancer.release(instance, True)
+                raise
+            except asyncio.CancelledError:
+                self.balancer.release(instance, None)
+                raise
+
+    async def request(self, method, path, **kwargs):
+        """Gửi request đến một instance của dịch vụ mà không chặn event loop."""
+        instance, started = self._begin()
+        try:
+            instance, response = await self._send(method, path, instance, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            self.in_flight -= 1
+            # Circuit breaker chỉ ghi nhận kết quả cuối cùng của request (sau khi đã thử instance khác)
+            self.breaker.record(True, time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            self.in_flight -= 1
+            self.breaker.cancel()
+            raise
+        try:
+            async with response:
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            self._finish(instance, started, True)
+            raise
+        except asyncio.CancelledError:
+            self._finish(instance, started, None)
+            raise
+        finally:
+            self.in_flight -= 1
+        self._finish(instance, started, response.status >= 500)
+        return UpstreamResponse(response.status, response.headers, content)
+
+    async def open_stream(self, method, path, **kwargs):
+        """Gửi request và trả về phản hồi khi vừa nhận header; người gọi đọc body rồi release()."""
+        instance, started = self._begin()
+        # Body lớn có thể truyền lâu hơn UPSTREAM_TIMEOUT: chỉ giới hạn thời gian chờ giữa các lần đọc
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=UPSTREAM_TIMEOUT, sock_read=UPSTREAM_TIMEOUT)
+        try:
+            instance, response = await self._send(method, path, instance, timeout=timeout, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            self.in_flight -= 1
+            self.breaker.record(True, time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            self.in_flight -= 1
+            self.breaker.cancel()
+            raise
+        failed = response.status >= 500
+        # Circuit breaker tính thời gian tới khi có header: luồng SSE/tải xuống dài không phải là request chậm
+        self.breaker.record(failed, time.monotonic() - started)
+
+        # Body còn đang được chuyển: instance vẫn bận (least_outstanding/p2c) cho đến khi người gọi release()
+        release = response.release
+        released = False
+
+        def release_instance():
+            nonlocal released
+            try:
+                return release()
+            finally:
+                if not released:
+                    released = True
+                    self.in_flight -= 1
+                    self.balancer.release(instance, failed)
+
+        response.release = release_instance
+        return response
+
+    def stats(self):
+        stats = {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "errors": self.errors,
+        }
+        stats.update(self.balancer.stats())
+        return stats
+
+    async def aclose(self):
+        await self.session.close()
+
+
+POOLS = {}
+
+# Các GET giống hệt nhau đang chạy đồng thời chỉ tạo một lời gọi Back-end
+FLIGHTS = AsyncSingleFlight()
+COALESCE = compile_rules(COALESCE_RULES)
+
+
+# Xác thực JWT ở biên: mỗi token chỉ được giải mã một lần cho đến khi hết hạn
+VERIFIER = TokenVerifier(JWT_SECRET, JWT_ALGORITHM, AUTH_CLAIMS_CACHE_SIZE)
+
+# Nén phản hồi gửi về Frontend theo Accept-Encoding
+COMPRESSOR = ResponseCompressor(COMPRESSION_MIN_SIZE, COMPRESSIBLE_TYPES, GZIP_LEVEL, BROTLI_QUALITY,
+                                COMPRESSION_CACHE_MAX_BYTES)
+
+
+async def startup():
+    for name, config in SERVICES.items():
+        POOLS[name] = AsyncServicePool(name, config)
+
+
+async def shutdown():
+    for pool in POOLS.values():
+        await pool.aclose()
+    POOLS.clear()
+
+
+async def send_response(send, status, body, headers=()):
+    """Gửi toàn bộ phản hồi HTTP qua giao thức ASGI."""
+    response_headers = [(b'content-length', str(len(body)).encode())]
+    response_headers.extend(headers)
+    response_headers.extend(CORS_HEADERS)
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, data):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send_response(send, status, body, [(b'content-type', b'application/json')])
+
+
+async def read_body(receive):
+    """Đọc toàn bộ body của request từ client."""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def iter_body(receive):
+    """Đọc body của request từ client theo từng khối (streaming)."""
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunk = message.get('body', b'')
+        if chunk:
+            yield chunk
+        more_body = message.get('more_body', False)
+
+
+def response_headers(upstream_headers, exclude):
+    """Header của Back-end gửi lại cho client; header CORS do Gateway tự thêm."""
+    return [
+        (name.encode('latin-1'), value.encode('latin-1'))
+        for name, value in end_to_end_headers(upstream_headers.items(), exclude=exclude)
+        if not name.lower().startswith('access-control-')
+    ]
+
+
+async def wait_for_disconnect(receive):
+    """Chờ client ngắt kết nối (gọi sau khi đã đọc hết body của request)."""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def proxy_streaming(pool, method, path, params, request_headers, scope, receive, send):
+    """Chuyển tiếp request/response theo từng khối, không giữ toàn bộ body trong RAM."""
+    has_body = False
+    for name, value in scope['headers']:
+        if name == b'content-length' and value != b'0':
+            request_headers["Content-Length"] = value.decode('latin-1')
+            has_body = True
+        elif name == b'transfer-encoding':
+            has_body = True
+
+    response = await pool.open_stream(
+        method, path, params=params, headers=request_headers,
+        data=iter_body(receive) if has_body else None,
+    )
+    # Phản hồi không có điểm kết thúc (SSE): client ngắt kết nối thì ngừng đọc Back-end thay vì chuyển tiếp mãi
+    disconnected = None if has_body else asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        # Giữ nguyên Content-Length/Content-Encoding vì body được chuyển nguyên byte
+        headers = response_headers(response.headers, exclude=('date', 'server'))
+        headers.extend(CORS_HEADERS)
+        await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+        try:
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                if disconnected is not None and disconnected.done():
+                    return
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Header đã gửi đi nên không thể trả 503 nữa, chỉ có thể kết thúc phản hồi
+            print(f"Lỗi Gateway khi đọc phản hồi từ {pool.name}: {e!r}")
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if disconnected is not None:
+            disconnected.cancel()
+        response.release()
+
+
+async def reject_non_admin(scope, send):
+    """Trả 401/403 và True nếu request không mang token có role admin (xem require_admin ở gateway_app.py)."""
+    authorization = next(
+        (value.decode('latin-1') for name, value in scope['headers'] if name == b'authorization'), None
+    )
+    try:
+        require_role(VERIFIER, authorization, ADMIN_ROLE)
+        return False
+    except InvalidToken:
+        await send_response(send, 401, json.dumps({"error": "Admin token required"}).encode('utf-8'), [
+            (b'content-type', b'application/json'),
+            (b'www-authenticate', b'Bearer'),
+        ])
+    except Forbidden:
+        await send_json(send, 403, {"error": "Admin role required"})
+    return True
+
+
+async def gateway_router(scope, receive, send):
+    """Định tuyến yêu cầu từ Frontend đến đúng dịch vụ (phiên bản bất đồng bộ)."""
+    method = scope['method']
+
+    # Preflight CORS của trình duyệt (tương đương flask_cors ở gateway_app.py)
+    if method == 'OPTIONS':
+        await send_response(send, 200, b'', [
+            (b'access-control-allow-methods', ', '.join(sorted(ALLOWED_METHODS)).encode()),
+            (b'access-control-allow-headers', b'Content-Type, Authorization'),
+        ])
+        return
+
+    if scope['path'] == '/gateway/health' and method == 'GET':
+        services = {name: pool.breaker.stats() for name, pool in POOLS.items()}
+        healthy = all(stats["state"] == "closed" for stats in services.values())
+        await send_json(send, 200, {"status": "ok" if healthy else "degraded", "services": services})
+        return
+
+    if scope['path'] == '/gateway/stats' and method == 'GET':
+        await send_json(send, 200, {
+            "pools": {name: pool.stats() for name, pool in POOLS.items()},
+            "singleflight": FLIGHTS.stats(),
+            "compression": COMPRESSOR.stats(),
+            "auth": VERIFIER.stats(),
+        })
+        return
+
+    if scope['path'] == '/gateway/services' and method == 'GET':
+        await send_json(send, 200, {name: pool.balancer.stats() for name, pool in POOLS.items()})
+        return
+
+    if scope['path'].startswith('/gateway/services/') and method in ('POST', 'DELETE'):
+        # /gateway/services/<service>/instances: thêm/bớt instance khi Gateway đang chạy (chỉ quản trị viên)
+        if await reject_non_admin(scope, send):
+            return
+        service, _, rest = scope['path'][len('/gateway/services/'):].partition('/')
+        if rest != 'instances' or service not in POOLS:
+            await send_json(send, 404, {"error": "Service not found"})
+            return
+        try:
+            data = json.loads(await read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        payload, status = change_instances(POOLS[service].balancer, method, data)
+        await send_json(send, status, payload)
+        return
+
+    # /<service>/<path> -> service và path đích
+    service, _, path = scope['path'].lstrip('/').partition('/')
+    if not path:
+        await send_json(send, 404, {"error": "Not found"})
+        return
+
+    if method not in ALLOWED_METHODS:
+        body = json.dumps({"error": "Method not allowed"}).encode('utf-8')
+        await send_response(send, 405, body, [
+            (b'content-type', b'application/json'),
+            (b'allow', ', '.join(sorted(ALLOWED_METHODS | {'OPTIONS'})).encode()),
+        ])
+        return
+
+    if service not in POOLS:
+        await send_json(send, 404, {"error": "Service not found"})
+        return
+
+    content_type = 'application/json'
+    authorization = None
+    for name, value in scope['headers']:
+        if name == b'content-type':
+            content_type = value.decode('latin-1')
+        elif name == b'authorization':
+            authorization = value.decode('latin-1')
+
+    # Xác thực token ở biên: Back-end nhận định danh qua header thay vì tự giải mã token
+    try:
+        token = bearer_token(authorization)
+        identity = identity_headers(VERIFIER.verify(token)) if token else {}
+    except InvalidToken:
+        await send_response(send, 401, json.dumps({"error": "Invalid or expired token"}).encode('utf-8'), [
+            (b'content-type', b'application/json'),
+            (b'www-authenticate', b'Bearer error="invalid_token"'),
+        ])
+        return
+
+    params = parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+    request_headers = {"Content-Type": content_type, **identity}
+
+    try:
+        if method == 'GET' and matches(COALESCE, service, path):
+            key = (service, path, scope.get('query_string', b''), tuple(sorted(request_headers.items())))
+            response, _ = await FLIGHTS.do(
+                key, lambda: POOLS[service].request(method, path, params=params, headers=request_headers)
+            )
+        elif STREAMING_PROXY:
+            await proxy_streaming(POOLS[service], method, path, params, request_headers, scope, receive, send)
+            return
+        else:
+            response = await POOLS[service].request(
+                method,
+                path,
+                params=params,
+                headers=request_headers,
+                data=await read_body(receive),
+            )
+    except CircuitOpenError as e:
+        # Mạch đang mở: từ chối ngay, không chờ dịch vụ đang lỗi
+        body = json.dumps({"error": f"Gateway failed to connect to {service}"}).encode('utf-8')
+        await send_response(send, 503, body, [
+            (b'content-type', b'application/json'),
+            (b'retry-after', str(max(1, math.ceil(e.retry_after))).encode()),
+        ])
+        return
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Lỗi Gateway khi kết nối đến {service}: {e!r}")
+        await send_json(send, 503, {"error": f"Gateway failed to connect to {service}"})
+        return
+
+    # Content-Length được tính lại, Date/Server do uvicorn tự thêm
+    headers = response_headers(response.headers, exclude=('content-length', 'date', 'server'))
+    await send_response(send, response.status_code, response.content, headers)
+
+
+def encoded_headers(headers, encoding, length):
+    """Header của phản hồi sau khi nén: thay Content-Length, thêm Content-Encoding, ETag chuyển thành ETag yếu."""
+    result = []
+    for name, value in headers:
+        lower = name.lower()
+        if lower == b'content-length':
+            continue
+        if lower == b'etag':
+            value = weak_etag(value.decode('latin-1')).encode('latin-1')
+        result.append((name, value))
+    result.append((b'content-encoding', encoding.encode()))
+    if length is not None:
+        result.append((b'content-length', str(length).encode()))
+    return result
+
+
+def compressing_send(send, accept_encoding):
+    """Bọc hàm send của ASGI: nén body phản hồi nếu client chấp nhận gzip/brotli."""
+    start = None
+    encoding = None
+    stream = None
+
+    async def wrapped(message):
+        nonlocal start, encoding, stream
+        if message['type'] == 'http.response.start':
+            headers = list(message.get('headers', []))
+            values = {name.lower(): value.decode('latin-1') for name, value in headers}
+            content_type = values.get(b'content-type', '')
+            content_encoding = values.get(b'content-encoding')
+            if content_encoding or not COMPRESSOR.is_compressible(content_type):
+                await send(message)
+                return
+            # Nội dung trả về phụ thuộc Accept-Encoding của từng client
+            vary = values.get(b'vary')
+            headers = [(n, v) for n, v in headers if n.lower() != b'vary']
+            headers.append((b'vary', f"{vary}, Accept-Encoding".encode('latin-1') if vary else b'Accept-Encoding'))
+            length = values.get(b'content-length')
+            encoding = COMPRESSOR.select(accept_encoding, message['status'], content_type, content_encoding,
+                                         int(length) if length and length.isdigit() else None)
+            if encoding is None:
+                await send({**message, 'headers': headers})
+                return
+            # Giữ header lại cho đến khi biết body được gửi một lần hay theo từng khối
+            start = {**message, 'headers': headers}
+            return
+
+        if start is None:
+            await send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if stream is None and not more_body:
+            # Toàn bộ body trong một message: nén một lần (body lặp lại được lấy từ cache)
+            compressed = COMPRESSOR.compress(body, encoding)
+            await send({**start, 'headers': encoded_headers(start['headers'], encoding, len(compressed))})
+            await send({'type': 'http.response.body', 'body': compressed})
+            return
+
+        if stream is None:
+            stream = COMPRESSOR.open_stream(encoding)
+            await send({**start, 'headers': encoded_headers(start['headers'], encoding, None)})
+        data = stream.compress(body)
+        if not more_body:
+            data += stream.finish()
+        if data or not more_body:
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+    return wrapped
+
+
+async def app(scope, receive, send):
+    """Ứng dụng ASGI gốc."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    elif scope['type'] == 'http':
+        if COMPRESSION_ENABLED and scope['method'] != 'HEAD':
+            accept_encoding = next(
+                (value.decode('latin-1') for name, value in scope['headers'] if name == b'accept-encoding'), None
+            )
+            send = compressing_send(send, accept_encoding)
+        await gateway_router(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("API Gateway (ASGI) đang khởi động trên cổng 8000...")
+    uvicorn.run(app, port=8000)
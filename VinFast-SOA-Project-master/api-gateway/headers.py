@@ -0,0 +1,18 @@
+# api-gateway/headers.py
+
+# Header chỉ có ý nghĩa trên từng chặng kết nối, không được chuyển tiếp qua proxy (RFC 7230 mục 6.1)
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade',
+}
+
+
+def end_to_end_headers(headers, exclude=()):
+    """Lọc bỏ header hop-by-hop (kể cả các header được liệt kê trong Connection) và các header trong exclude."""
+    connection_tokens = set()
+    for name, value in headers:
+        if name.lower() == 'connection':
+            connection_tokens.update(token.strip().lower() for token in value.split(','))
+
+    skipped = HOP_BY_HOP_HEADERS | connection_tokens | {name.lower() for name in exclude}
+    return [(name, value) for name, value in headers if name.lower() not in skipped]
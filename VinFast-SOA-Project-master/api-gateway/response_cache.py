@@ -0,0 +1,128 @@
+# api-gateway/response_cache.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Chi phí ước tính (byte) của mỗi mục ngoài body và header
+ENTRY_OVERHEAD = 200
+
+
+class CacheEntry:
+    """Một phản hồi GET đã lưu, kèm ETag để xác thực lại với Back-end khi hết hạn."""
+
+    def __init__(self, status_code, headers, body, etag, ttl):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.ttl = ttl
+        self.expires_at = time.monotonic() + ttl
+        self.size = ENTRY_OVERHEAD + len(body) + sum(len(k) + len(v) for k, v in headers)
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires_at
+
+    def refresh(self):
+        """Back-end xác nhận (304) phản hồi vẫn đúng: gia hạn thêm một TTL."""
+        self.expires_at = time.monotonic() + self.ttl
+
+
+class ResponseCache:
+    """Cache LRU giới hạn theo dung lượng cho phản hồi GET, TTL cấu hình theo từng route."""
+
+    def __init__(self, rules, max_bytes):
+        # rules: danh sách (service, regex của path, ttl giây)
+        self.rules = [(service, re.compile(pattern), ttl) for service, pattern, ttl in rules]
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.stores = 0
+        self.evictions = 0
+        self.purges = 0
+
+    def ttl_for(self, service, path):
+        """TTL của route, hoặc None nếu route không được cache."""
+        for rule_service, pattern, ttl in self.rules:
+            if rule_service == service and pattern.match(path):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(service, path, query_string):
+        key = f"{service}/{path}"
+        return f"{key}?{query_string}" if query_string else key
+
+    def get(self, key):
+        """Lấy mục trong cache (kể cả đã hết hạn) và đánh dấu là vừa dùng."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_revalidation(self):
+        with self._lock:
+            self.revalidations += 1
+
+    def put(self, key, entry):
+        """Lưu phản hồi; loại bỏ các mục ít dùng nhất khi vượt quá dung lượng."""
+        if entry.size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.size
+            self._entries[key] = entry
+            self.current_bytes += entry.size
+            self.stores += 1
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+        return True
+
+    def purge(self, prefix=None):
+        """Xóa toàn bộ cache hoặc các mục có key bắt đầu bằng prefix. Trả về số mục đã xóa."""
+        with self._lock:
+            if prefix is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self.current_bytes = 0
+            else:
+                keys = [key for key in self._entries if key.startswith(prefix)]
+                for key in keys:
+                    self.current_bytes -= self._entries.pop(key).size
+                removed = len(keys)
+            self.purges += removed
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.revalidations
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "purged": self.purges,
+                "hit_ratio": round((self.hits + self.revalidations) / lookups, 4) if lookups else 0.0,
+            }
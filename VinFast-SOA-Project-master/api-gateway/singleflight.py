@@ -0,0 +1,98 @@
+# api-gateway/singleflight.py
+# Gộp các request GET giống hệt nhau đang chờ Back-end: chỉ một lời gọi thật, các request khác dùng chung kết quả
+
+import asyncio
+import re
+import threading
+
+
+def compile_rules(rules):
+    """rules: danh sách (service, regex của path) -> danh sách đã biên dịch."""
+    return [(service, re.compile(pattern)) for service, pattern in rules]
+
+
+def matches(compiled_rules, service, path):
+    return any(rule_service == service and pattern.match(path) for rule_service, pattern in compiled_rules)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Single-flight cho Gateway đa luồng (Flask): các thread trùng key chờ kết quả của thread đầu tiên."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.upstream_calls = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn):
+        """Gọi fn() một lần cho mỗi key đang chạy; trả về (kết quả, True nếu dùng chung kết quả)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream_calls += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight_keys": len(self._calls),
+                "upstream_calls": self.upstream_calls,
+                "deduplicated": self.deduplicated,
+            }
+
+
+class AsyncSingleFlight:
+    """Single-flight cho Gateway ASGI: các coroutine trùng key cùng chờ một Task."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.upstream_calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key, coroutine_fn):
+        """Chạy coroutine_fn() một lần cho mỗi key đang chạy; trả về (kết quả, True nếu dùng chung kết quả)."""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.deduplicated += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(coroutine_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # shield: client của một request ngắt kết nối không hủy lời gọi mà các request khác đang chờ
+        return await asyncio.shield(task), shared
+
+    def stats(self):
+        return {
+            "in_flight_keys": len(self._tasks),
+            "upstream_calls": self.upstream_calls,
+            "deduplicated": self.deduplicated,
+        }
@@ -0,0 +1,40 @@
+# api-gateway/streaming.py
+# Chuyển tiếp body theo từng khối (streaming) cho Gateway Flask: không giữ toàn bộ payload trong RAM
+
+
+class RequestBodyStream:
+    """Đọc body của Frontend theo từng khối; __len__ giúp requests gửi Content-Length thay vì chunked."""
+
+    def __init__(self, stream, length, chunk_size):
+        self.stream = stream
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def request_body(flask_request, chunk_size):
+    """Body để chuyển tiếp: luồng có độ dài, luồng chunked, hoặc None nếu request không có body."""
+    if flask_request.content_length:
+        return RequestBodyStream(flask_request.stream, flask_request.content_length, chunk_size)
+    if 'chunked' in flask_request.headers.get('Transfer-Encoding', '').lower():
+        # Không biết trước độ dài: requests sẽ gửi tiếp bằng Transfer-Encoding: chunked
+        return iter(RequestBodyStream(flask_request.stream, None, chunk_size))
+    return None
+
+
+def iter_upstream(response, chunk_size):
+    """Đọc phản hồi Back-end theo từng khối, giữ nguyên byte (không giải nén) và trả kết nối về pool khi xong."""
+    try:
+        for chunk in response.raw.stream(chunk_size, decode_content=False):
+            yield chunk
+    finally:
+        response.close()
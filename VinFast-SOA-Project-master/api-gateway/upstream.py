@@ -0,0 +1,234 @@
+# api-gateway/upstream.py
+
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from admission import ConcurrencyLimiter
+from balancer import RETRYABLE_METHODS, LoadBalancer, NoInstanceError
+from common.circuit_breaker import CircuitBreaker, CircuitOpenError
+from common.metrics import REGISTRY
+from common.tracing import TRACER
+
+DEFAULT_POOL_SIZE = 10
+# Số instance tối đa mà adapter giữ pool kết nối riêng (mỗi host một pool)
+MAX_POOLED_INSTANCES = 32
+# Retry-After (giây) gợi ý cho client khi dịch vụ đã đủ số request đồng thời
+OVERLOAD_RETRY_AFTER = 1
+
+# Thời gian từ lúc gửi request tới khi nhận header phản hồi của Back-end, theo dịch vụ và mã trạng thái
+# ("error" nếu không kết nối được / timeout)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'gateway_upstream_request_duration_seconds', 'Time spent waiting for backend services in seconds.',
+    ('service', 'status'))
+
+
+class UpstreamRejected(requests.exceptions.ConnectionError):
+    """Gateway từ chối ngay, không gửi request tới dịch vụ; client nên thử lại sau retry_after giây."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(UpstreamRejected):
+    """Mạch của dịch vụ đang mở: Gateway từ chối ngay thay vì chờ Back-end tới hết timeout."""
+
+    def __init__(self, service, retry_after):
+        super().__init__(f"Circuit breaker of {service} is open", retry_after)
+
+
+class BackendOverloaded(UpstreamRejected):
+    """Dịch vụ đã đủ số request đồng thời (max_concurrent trong SERVICES)."""
+
+    def __init__(self, service):
+        super().__init__(f"Service {service} is at its concurrency limit", OVERLOAD_RETRY_AFTER)
+
+
+def release_on_close(response, release):
+    """Gọi release() đúng một lần khi response.close() được gọi (lần đầu)."""
+    close = response.close
+    released = False
+
+    def close_and_release():
+        nonlocal released
+        try:
+            close()
+        finally:
+            if not released:
+                released = True
+                release()
+
+    response.close = close_and_release
+
+
+class ServicePool:
+    """Client HTTP dùng chung (keep-alive) cho một dịch vụ Back-end (một hoặc nhiều instance), kèm thống kê pool."""
+
+    def __init__(self, name, instances, pool_size=DEFAULT_POOL_SIZE, pool_block=False, breaker_config=None,
+                 balancer_config=None, limiter=None):
+        self.name = name
+        # Giới hạn số request đồng thời tới dịch vụ (None: không giới hạn)
+        self.limiter = limiter
+        self.pool_size = pool_size
+        # instances: danh sách URL gốc của các instance (chấp nhận một URL duy nhất)
+        if isinstance(instances, str):
+            instances = [instances]
+        self.balancer = LoadBalancer(name, instances, **(balancer_config or {}))
+
+        self.session = requests.Session()
+        # Gateway phục vụ nhiều người dùng: không được giữ cookie giữa các request
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # Bỏ qua việc đọc proxy từ biến môi trường ở mỗi request
+        self.session.trust_env = False
+
+        # Mỗi instance (host) giữ tối đa pool_size kết nối sống (keep-alive) để tái sử dụng
+        self.adapter = HTTPAdapter(pool_connections=MAX_POOLED_INSTANCES, pool_maxsize=pool_size,
+                                   pool_block=pool_block, max_retries=0)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        # Lỗi kết nối, timeout và HTTP 5xx được tính là lỗi của dịch vụ
+        self.breaker = CircuitBreaker(name, **(breaker_config or {}))
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.errors = 0
+
+    def request(self, method, path, priority=False, **kwargs):
+        """
+        Gửi request đến một instance của dịch vụ qua kết nối lấy từ pool.
+        Ném BackendOverloaded nếu dịch vụ đã đủ số request đồng thời (request ưu tiên được dùng
+        phần slot dự trữ) và CircuitOpen nếu mạch đang mở.
+        """
+        if self.limiter is not None and not self.limiter.acquire(priority):
+            raise BackendOverloaded(self.name)
+        streamed = False
+        try:
+            # Mỗi lời gọi Back-end là một span; traceparent cho Back-end nối tiếp trace của Gateway
+            with TRACER.span(f"{method} {self.name}", path=path) as span:
+                kwargs['headers'] = TRACER.inject(kwargs.get('headers'))
+                response = self._send(method, path, **kwargs)
+                span.set(status_code=response.status_code)
+            if self.limiter is not None and kwargs.get('stream'):
+                # Body còn đang được chuyển tiếp: giữ slot tới khi người gọi đóng phản hồi
+                release_on_close(response, self.limiter.release)
+                streamed = True
+            return response
+        finally:
+            if self.limiter is not None and not streamed:
+                self.limiter.release()
+
+    def _send(self, method, path, **kwargs):
+        """GET/HEAD không kết nối được tới một instance được gửi lại một lần tới instance khác."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            raise CircuitOpen(self.name, e.retry_after) from e
+        try:
+            instance = self.balancer.acquire()
+        except NoInstanceError as e:
+            self.breaker.cancel()
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+        retries = 1 if method.upper() in RETRYABLE_METHODS else 0
+        tried = []
+        with self._lock:
+            self.in_flight += 1
+            self.total_requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            while True:
+                tried.append(instance)
+                try:
+                    response = self.session.request(method, f"{instance.url}/{path}", **kwargs)
+                    break
+                except requests.exceptions.ConnectionError:
+                    self.balancer.release(instance, True)
+                    instance = self.balancer.acquire_retry(tried) if len(tried) <= retries else None
+                    if instance is None:
+                        raise
+                except requests.exceptions.RequestException:
+                    self.balancer.release(instance, True)
+                    instance = None
+                    raise
+        except requests.exceptions.RequestException:
+            # Circuit breaker chỉ ghi nhận kết quả cuối cùng của request (sau khi đã thử instance khác)
+            elapsed = time.monotonic() - started
+            self.breaker.record(True, elapsed)
+            UPSTREAM_SECONDS.observe(self.name, 'error', value=elapsed)
+            with self._lock:
+                self.errors += 1
+            raise
+        except BaseException:
+            self.breaker.cancel()
+            if instance is not None:
+                self.balancer.release(instance, None)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        failed = response.status_code >= 500
+        elapsed = time.monotonic() - started
+        self.breaker.record(failed, elapsed)
+        UPSTREAM_SECONDS.observe(self.name, response.status_code, value=elapsed)
+        self.balancer.release(instance, failed)
+        return response
+
+    def stats(self):
+        """Thống kê mức sử dụng pool (số kết nối đã mở, đang rảnh, tỉ lệ tái sử dụng)."""
+        opened = 0
+        pooled_requests = 0
+        idle = 0
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            pooled_requests += pool.num_requests
+            # Hàng đợi của urllib3 được lấp sẵn bằng None, chỉ đếm kết nối thật
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._lock:
+            stats = {
+                "pool_size": self.pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "total_requests": self.total_requests,
+                "errors": self.errors,
+                "connections_opened": opened,
+                "idle_connections": idle,
+                "connection_reuse_ratio": round(1 - opened / pooled_requests, 4) if pooled_requests else 0.0,
+            }
+        stats.update(self.balancer.stats())
+        if self.limiter is not None:
+            stats["concurrency"] = self.limiter.stats()
+        return stats
+
+
+def build_limiter(name, config, priority_reserved_ratio=0.0, priority_wait=0.0):
+    """ConcurrencyLimiter theo max_concurrent của dịch vụ, hoặc None nếu không khai báo."""
+    limit = config.get("max_concurrent")
+    if not limit:
+        return None
+    return ConcurrencyLimiter(name, limit, int(limit * priority_reserved_ratio), priority_wait)
+
+
+def build_pools(services, breaker_defaults=None, balancer_defaults=None, priority_reserved_ratio=0.0,
+                priority_wait=0.0):
+    """Tạo một ServicePool cho mỗi dịch vụ khai báo trong SERVICES."""
+    return {
+        name: ServicePool(
+            name, config["instances"], config.get("pool_size", DEFAULT_POOL_SIZE),
+            breaker_config={**(breaker_defaults or {}), **config.get("breaker", {})},
+            balancer_config={**(balancer_defaults or {}), **config.get("balancer", {})},
+            limiter=build_limiter(name, config, priority_reserved_ratio, priority_wait)
+        )
+        for name, config in services.items()
+    }
@@ -0,0 +1,165 @@
+# benchmarks/bench_bulk_import.py
+#
+# Đo nạp danh mục hàng loạt (bulk_import.py) với file tồn kho cỡ triệu dòng:
+#   - sinh file models (--models mẫu xe) và inventory (--models x --dealers dòng) dạng CSV và JSONL
+#   - mỗi định dạng chạy trong một tiến trình riêng (DB SQLite tạm) để đo bộ nhớ đỉnh (ru_maxrss, trừ mức nền
+#     trước mỗi bước; ru_maxrss không giảm nên bước sau chỉ hiện phần vượt đỉnh của bước trước);
+#     in số dòng/s, số transaction
+#   - nạp lại cùng file tồn kho (toàn bộ là cập nhật) để đo nhánh upsert
+#   - đối chứng: cách cũ của create_demo_data (commit mỗi mẫu xe để lấy car.id, rồi thêm từng dòng tồn kho)
+#     trên --legacy-models mẫu xe x --dealers đại lý, và trên 10 x --legacy-models mẫu xe x 2 đại lý (dạng dữ liệu demo)
+#
+# Chạy: python benchmarks/bench_bulk_import.py [--models 1000] [--dealers 1000] [--legacy-models 300]
+
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import add_service_path
+
+MOTOR_TYPES = ("Điện", "Xăng")
+
+
+def model(i):
+    return {
+        "model_name": f"VinFast Đại lý #{i:06d}",
+        "base_price": 400000000 + (i * 7919) % 1200 * 1000000,
+        "description": f"Mẫu xe nhập từ danh mục đại lý số {i}.",
+        "specs": json.dumps({"motor_type": MOTOR_TYPES[i % 2], "color": "Trắng"}, ensure_ascii=False),
+        "image_url": f"https://example.com/cars/{i}.jpg",
+    }
+
+
+def inventory_rows(model_count, dealers):
+    for d in range(dealers):
+        for i in range(model_count):
+            yield {"model_name": f"VinFast Đại lý #{i:06d}", "dealer_location": f"Đại lý {d:04d}",
+                   "stock_quantity": (i + d) % 7}
+
+
+def write_file(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+        else:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker(db_path, steps):
+    """Tiến trình con: chạy lần lượt các bước (kind, path) và in thống kê JSON của từng bước."""
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{db_path}"
+    add_service_path('catalog-service')
+    from app import app, upgrade_schema
+    from database import db
+    import bulk_import
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        for kind, path in steps:
+            baseline = max_rss_mb()
+            stats = bulk_import.import_file(db.session, path, kind)
+            stats["peak_mb"] = max_rss_mb() - baseline
+            print(json.dumps(stats), flush=True)
+
+
+def legacy_worker(db_path, model_count, dealers):
+    """Tiến trình con: cách cũ (commit từng mẫu xe rồi add từng dòng tồn kho qua ORM)."""
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{db_path}"
+    add_service_path('catalog-service')
+    from app import app
+    from database import CarModel, Inventory, db
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        for i in range(model_count):
+            car = CarModel(**model(i))
+            db.session.add(car)
+            db.session.commit()
+            for d in range(dealers):
+                db.session.add(Inventory(car_model_id=car.id, dealer_location=f"Đại lý {d:04d}",
+                                         stock_quantity=(i + d) % 7))
+        db.session.commit()
+        print(json.dumps({"rows": model_count * (1 + dealers), "seconds": time.perf_counter() - started}))
+
+
+def run_worker(args):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), *args],
+                            check=True, capture_output=True, text=True).stdout
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=1000)
+    parser.add_argument('--dealers', type=int, default=1000)
+    parser.add_argument('--legacy-models', type=int, default=300)
+    parser.add_argument('--worker', nargs='+', help=argparse.SUPPRESS)
+    parser.add_argument('--legacy-worker', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        db_path, *flat = args.worker
+        return worker(db_path, list(zip(flat[::2], flat[1::2])))
+    if args.legacy_worker:
+        db_path, model_count, dealers = args.legacy_worker
+        return legacy_worker(db_path, int(model_count), int(dealers))
+
+    workdir = tempfile.mkdtemp(prefix='bench_bulk_import_')
+    files = {}
+    started = time.perf_counter()
+    for extension in ('csv', 'jsonl'):
+        files['models', extension] = os.path.join(workdir, f"models.{extension}")
+        files['inventory', extension] = os.path.join(workdir, f"inventory.{extension}")
+        write_file(files['models', extension], (model(i) for i in range(args.models)))
+        write_file(files['inventory', extension], inventory_rows(args.models, args.dealers))
+    inventory_count = args.models * args.dealers
+    print(f"Sinh file: {args.models} mẫu xe, {inventory_count:,} dòng tồn kho "
+          f"({os.path.getsize(files['inventory', 'csv']) / 1024 / 1024:.0f} MB CSV, "
+          f"{os.path.getsize(files['inventory', 'jsonl']) / 1024 / 1024:.0f} MB JSONL) "
+          f"trong {time.perf_counter() - started:.1f}s")
+    print()
+    print(f"{'định dạng':<10} {'bước':<22} {'dòng':>10} {'giây':>7} {'dòng/s':>10} {'transaction':>12} "
+          f"{'bộ nhớ đỉnh MB':>15}")
+
+    for extension in ('csv', 'jsonl'):
+        steps = [('models', files['models', extension]), ('inventory', files['inventory', extension]),
+                 ('inventory', files['inventory', extension])]
+        labels = ['models (chèn mới)', 'inventory (chèn mới)', 'inventory (cập nhật)']
+        db_path = os.path.join(workdir, f"catalog_{extension}.db")
+        flat = [item for step in steps for item in step]
+        for label, stats in zip(labels, run_worker(['--worker', db_path, *flat])):
+            print(f"{extension:<10} {label:<22} {stats['rows']:>10,} {stats['seconds']:>7.1f} "
+                  f"{stats['rows'] / stats['seconds']:>10,.0f} {stats['transactions']:>12} "
+                  f"{stats['peak_mb']:>15.1f}")
+
+    print()
+    print("Cách cũ (commit từng mẫu xe, ORM từng dòng tồn kho):")
+    # Cùng dạng file tồn kho ở trên, và dạng dữ liệu demo (2 đại lý mỗi mẫu xe: commit chiếm phần lớn thời gian)
+    for model_count, dealers in ((args.legacy_models, args.dealers), (args.legacy_models * 10, 2)):
+        legacy = run_worker(['--legacy-worker', os.path.join(workdir, f'legacy_{dealers}.db'),
+                             str(model_count), str(dealers)])[0]
+        rate = legacy['rows'] / legacy['seconds']
+        print(f"  {model_count} mẫu xe x {dealers} đại lý: {legacy['rows']:,} dòng trong {legacy['seconds']:.1f}s "
+              f"= {rate:,.0f} dòng/s; ước tính {inventory_count:,} dòng: {inventory_count / rate:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
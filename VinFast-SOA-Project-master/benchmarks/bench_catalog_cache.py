@@ -0,0 +1,120 @@
+# benchmarks/bench_catalog_cache.py
+#
+# Đo GET /api/v1/catalog/cars và /catalog/cars/<id> của Catalog Service với danh mục lớn (--models mẫu xe):
+#   - trước: mỗi request query.all() + to_dict() (json.loads specs) + dumps lại (route /bench/uncached/cars)
+#   - sau: byte JSON đã mã hóa sẵn theo phiên bản danh mục, và 304 khi Gateway xác thực lại bằng ETag
+# Cuối cùng đổi giá một mẫu xe để kiểm tra cache được dựng lại với ETag mới.
+# Catalog Service chạy trên DB SQLite tạm (CATALOG_DATABASE_URI), không đụng DB demo.
+#
+# Chạy: python benchmarks/bench_catalog_cache.py [--models 10000] [--seconds 5] [--concurrency 8]
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_utils import ServerThread, add_service_path
+
+
+def load(url, concurrency, seconds, headers=None):
+    """requests/giây khi concurrency client gọi liên tục url trong seconds giây."""
+    deadline = time.perf_counter() + seconds
+    counts = [0] * concurrency
+    statuses = set()
+
+    def worker(index):
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            response = session.get(url, headers=headers)
+            statuses.add(response.status_code)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, statuses
+
+
+def seed(db, CarModel, Inventory, demo_cars, model_count):
+    db.create_all()
+    db.session.execute(CarModel.__table__.insert(), [
+        {"id": i + 1, "model_name": f"{demo_cars[i % len(demo_cars)]['model_name']} #{i + 1}",
+         "base_price": demo_cars[i % len(demo_cars)]['base_price'],
+         "description": demo_cars[i % len(demo_cars)]['description'],
+         "specs": demo_cars[i % len(demo_cars)]['specs'],
+         "image_url": demo_cars[i % len(demo_cars)]['image_url']}
+        for i in range(model_count)
+    ])
+    db.session.execute(Inventory.__table__.insert(), [
+        {"car_model_id": i + 1, "dealer_location": location, "stock_quantity": 10}
+        for i in range(model_count) for location in ("Hà Nội", "TP. HCM")
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=10000)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_catalog_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import CARS_DATA_DEMO, CATALOG_CACHE, Response, app, encode_json
+    from database import CarModel, Inventory, db
+
+    @app.route('/bench/uncached/cars')
+    def uncached_cars():
+        # Cách làm trước đây của get_all_cars
+        data = [car.to_dict() for car in CarModel.query.all()]
+        return Response(app.json.dumps(data, ensure_ascii=False), mimetype='application/json')
+
+    with app.app_context():
+        seed(db, CarModel, Inventory, CARS_DATA_DEMO, args.models)
+        started = time.perf_counter()
+        body = encode_json([car.to_dict() for car in CarModel.query.all()])
+        build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Danh mục {args.models} mẫu xe: {len(body) / 1024:.0f} KB JSON, "
+          f"query + to_dict + dumps mất {build_ms:.0f} ms mỗi lần")
+    print(f"{args.concurrency} client đồng thời, {args.seconds:.0f}s mỗi lần đo")
+    print(f"{'endpoint':<40} {'req/s':>9}")
+
+    with ServerThread(app) as server:
+        list_url = f"{server.url}/api/v1/catalog/cars"
+        etag = requests.get(list_url).headers['ETag']
+        car_etag = requests.get(f"{list_url}/1").headers['ETag']
+        cases = [
+            ("/cars (trước: dựng lại mỗi request)", f"{server.url}/bench/uncached/cars", None),
+            ("/cars (byte đã mã hóa sẵn)", list_url, None),
+            ("/cars If-None-Match -> 304", list_url, {"If-None-Match": etag}),
+            ("/cars/1 (byte đã mã hóa sẵn)", f"{list_url}/1", None),
+            ("/cars/1 If-None-Match -> 304", f"{list_url}/1", {"If-None-Match": car_etag}),
+        ]
+        for label, url, headers in cases:
+            rate, statuses = load(url, args.concurrency, args.seconds, headers)
+            print(f"{label:<40} {rate:>9.1f}   status={sorted(statuses)}")
+
+        # Đổi giá một mẫu xe: commit làm tăng phiên bản, lần đọc tiếp theo dựng lại cache với ETag mới
+        with app.app_context():
+            car = db.session.get(CarModel, 1)
+            car.base_price += 1000000
+            db.session.commit()
+        response = requests.get(list_url, headers={"If-None-Match": etag})
+        price = json.loads(response.content)[0]['base_price']
+        print()
+        print(f"Sau khi đổi giá xe 1: status={response.status_code}, ETag {etag} -> {response.headers['ETag']}, "
+              f"giá mới={price}")
+        print(f"Thống kê cache: {CATALOG_CACHE.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_catalog_query.py
+#
+# Đo GET /api/v1/catalog/cars có lọc/sắp xếp/phân trang theo con trỏ khi bảng car_models lớn dần
+# (--sizes, mặc định 1k, 10k, 100k mẫu xe). Với mỗi truy vấn: trang đầu qua API (test client, không tính mạng),
+# rồi truy vấn + to_dict() của trang ở vị trí 90% danh sách bằng con trỏ và bằng LIMIT/OFFSET để so sánh;
+# in thêm query plan của SQLite. Catalog Service chạy trên DB SQLite tạm (CATALOG_DATABASE_URI).
+#
+# Chạy: python benchmarks/bench_catalog_query.py [--sizes 1000 10000 100000] [--repeat 20]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from bench_utils import add_service_path, percentile
+
+QUERIES = [
+    ("giá 500tr-1.2 tỉ, sort=price", {"min_price": 500000000, "max_price": 1200000000, "sort": "price"}),
+    ("motor_type=Điện, sort=-price", {"motor_type": "Điện", "sort": "-price"}),
+    ("sort=name", {"sort": "name"}),
+    ("spec.color=Trắng, sort=id", {"spec.color": "Trắng"}),
+]
+
+
+def seed(db, CarModel, demo_cars, start, stop):
+    rows = []
+    for i in range(start, stop):
+        car = demo_cars[i % len(demo_cars)]
+        specs = json.loads(car['specs'])
+        specs['color'] = ("Trắng", "Đỏ", "Xanh", "Bạc", "Đen")[i % 5]
+        rows.append({
+            "id": i + 1, "model_name": f"{car['model_name']} #{i + 1:06d}",
+            # Giá phân tán để lọc theo khoảng giá có ý nghĩa
+            "base_price": 400000000 + (i * 7919) % 1200 * 1000000,
+            "description": car['description'], "specs": json.dumps(specs, ensure_ascii=False),
+            "image_url": car['image_url'],
+        })
+    db.session.execute(CarModel.__table__.insert(), rows)
+    db.session.commit()
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return percentile(samples, 50) * 1000
+
+
+def timed(client, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get('/api/v1/catalog/cars', query_string=params)
+        samples.append(time.perf_counter() - started)
+    assert response.status_code == 200, response.data
+    return percentile(samples, 50) * 1000, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_catalog_query_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import CARS_DATA_DEMO, app
+    from catalog_query import SORT_COLUMNS, build_query, encode_cursor
+    from database import CarModel, db
+    from sqlalchemy import text
+
+    client = app.test_client()
+    print(f"{'rows':>7}  {'truy vấn':<30} {'API trang đầu ms':>17} {'con trỏ 90% ms':>15} {'OFFSET 90% ms':>14}")
+    with app.app_context():
+        db.create_all()
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed(db, CarModel, CARS_DATA_DEMO, seeded, size)
+            seeded = size
+            db.session.execute(text('ANALYZE'))
+
+            for label, params in QUERIES:
+                first_ms, _ = timed(client, params, args.repeat)
+
+                # Con trỏ trỏ tới bản ghi ở vị trí 90% của danh sách đã lọc
+                query, limit, sort = build_query(CarModel.query, params)
+                matched = query.limit(None).with_entities(CarModel.id).count()
+                position = int(matched * 0.9)
+                row = query.limit(1).offset(position).one()
+                column = SORT_COLUMNS[sort.lstrip('-')]
+                cursor = encode_cursor(sort, getattr(row, column.key), row.id)
+                keyset_query, _, _ = build_query(CarModel.query, {**params, "cursor": cursor})
+                keyset_ms = median_ms(lambda: [car.to_dict() for car in keyset_query.all()], args.repeat)
+                offset_ms = median_ms(
+                    lambda: [car.to_dict() for car in query.limit(limit + 1).offset(position).all()], args.repeat)
+                print(f"{size:>7}  {label:<30} {first_ms:>17.2f} {keyset_ms:>15.2f} {offset_ms:>14.2f}")
+
+        print()
+        print("Query plan (trang tiếp theo theo con trỏ):")
+        for label, params in QUERIES:
+            query, _, sort = build_query(CarModel.query, {**params, "cursor": encode_cursor(
+                params.get("sort", "id"), "VinFast" if "name" in params.get("sort", "") else 800000000, 1)})
+            sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+            plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            print(f"  {label:<30} " + " | ".join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_catalog_search.py
+#
+# Đo tìm kiếm toàn văn (FTS5) của Catalog Service khi danh mục lớn dần (--sizes, mặc định 10k và 100k mẫu xe):
+#   - thời gian dựng lại toàn bộ chỉ mục (rebuild_index) và kích thước chỉ mục
+#   - chi phí cập nhật chỉ mục khi thêm/sửa một mẫu xe (commit có và không có chỉ mục)
+#   - độ trễ p50/p99 của GET /api/v1/catalog/search (test client, không tính mạng) cho các từ khóa thường gặp,
+#     so với lọc bằng LIKE '%...%' trên car_models (phân biệt dấu, không xếp hạng; phải quét toàn bảng
+#     để lấy mọi bản ghi khớp trước khi có thể xếp hạng)
+# Catalog Service chạy trên DB SQLite tạm (CATALOG_DATABASE_URI).
+#
+# Chạy: python benchmarks/bench_catalog_search.py [--sizes 10000 100000] [--repeat 50]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from bench_utils import add_service_path, percentile
+
+QUERIES = ["SUV điện 7 chỗ", "suv dien 7 cho", "VinFast VF 8", "sedan xăng", "đô thị", "vinf"]
+COLORS = ["Trắng", "Đỏ", "Xanh", "Bạc", "Đen", "Vàng"]
+TRIMS = ["Eco", "Plus", "Lux", "Base", "Sport"]
+
+
+def seed(db, CarModel, demo_cars, start, stop):
+    rows = []
+    for i in range(start, stop):
+        car = demo_cars[i % len(demo_cars)]
+        specs = json.loads(car['specs'])
+        specs['color'] = COLORS[i % len(COLORS)]
+        rows.append({
+            "id": i + 1, "model_name": f"{car['model_name']} {TRIMS[i % len(TRIMS)]} #{i + 1}",
+            "base_price": car['base_price'],
+            "description": f"{car['description']} Phiên bản đại lý số {i % 97}.",
+            "specs": json.dumps(specs, ensure_ascii=False), "image_url": car['image_url'],
+        })
+    db.session.execute(CarModel.__table__.insert(), rows)
+    db.session.commit()
+
+
+def latencies(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return percentile(samples, 50) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_catalog_search_')
+    db_path = os.path.join(workdir, 'catalog.db')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{db_path}"
+    add_service_path('catalog-service')
+    from app import CARS_DATA_DEMO, app
+    from database import CarModel, db
+    from sqlalchemy import text
+    import search
+
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed(db, CarModel, CARS_DATA_DEMO, seeded, size)
+            seeded = size
+
+            started = time.perf_counter()
+            search.rebuild_index(db.session)
+            db.session.commit()
+            rebuild_s = time.perf_counter() - started
+            index_pages = db.session.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'car_models_fts%'")).scalar() or 0
+
+            # Cập nhật một mẫu xe: commit kèm cập nhật chỉ mục trong cùng transaction
+            def update_car():
+                car = db.session.get(CarModel, 1)
+                car.description = f"SUV điện 7 chỗ cập nhật {time.perf_counter()}"
+                db.session.commit()
+
+            update_ms, _ = latencies(update_car, args.repeat)
+            db.session.execute(text(f"DROP TABLE {search.FTS_TABLE}"))
+            db.session.commit()
+            update_plain_ms, _ = latencies(update_car, args.repeat)
+            search.rebuild_index(db.session)
+            db.session.commit()
+
+            print(f"{size} mẫu xe: dựng lại chỉ mục {rebuild_s:.2f}s ({size / rebuild_s:,.0f} mẫu xe/s), "
+                  f"chỉ mục {index_pages / 1024 / 1024:.1f} MB; sửa một mẫu xe + commit "
+                  f"{update_ms:.2f} ms (không có chỉ mục: {update_plain_ms:.2f} ms)")
+            print(f"  {'từ khóa':<18} {'kết quả':>8} {'FTS p50 ms':>11} {'FTS p99 ms':>11} "
+                  f"{'LIKE p50 ms':>12} {'LIKE khớp':>10}")
+            for query in QUERIES:
+                items = client.get('/api/v1/catalog/search', query_string={"q": query}).get_json()['items']
+                p50, p99 = latencies(
+                    lambda: client.get('/api/v1/catalog/search', query_string={"q": query}), args.repeat)
+                words = query.split()
+                like_sql = text("SELECT id FROM car_models WHERE " + " AND ".join(
+                    f"(model_name || ' ' || description || ' ' || specs) LIKE :w{i}" for i in range(len(words))))
+                like_params = {f"w{i}": f"%{word}%" for i, word in enumerate(words)}
+                like_matches = len(db.session.execute(like_sql, like_params).fetchall())
+                like_p50, _ = latencies(lambda: db.session.execute(like_sql, like_params).fetchall(),
+                                        max(5, args.repeat // 10))
+                print(f"  {query:<18} {len(items):>8} {p50:>11.2f} {p99:>11.2f} "
+                      f"{like_p50:>12.2f} {like_matches:>10}")
+            print()
+
+
+if __name__ == '__main__':
+    main()
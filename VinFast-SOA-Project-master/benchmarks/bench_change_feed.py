@@ -0,0 +1,217 @@
+# benchmarks/bench_change_feed.py
+#
+# So sánh cách dashboard nhận biết thay đổi tồn kho, qua HTTP thật (Catalog Service trong ServerThread,
+# DB SQLite tạm với --models mẫu xe x 2 đại lý), trong khi một luồng ghi cập nhật tồn kho --rate lần/giây:
+#   - poll: --consumers client GET /api/v1/catalog/cars (kèm If-None-Match) mỗi --poll-interval giây
+#   - long-poll: GET /api/v1/catalog/changes?cursor=...&wait=8 liên tục
+#   - SSE: GET /api/v1/catalog/changes/stream
+# Với mỗi cách: số byte và số request mỗi client, độ trễ từ lúc commit đến lúc client thấy thay đổi (p50/p99).
+# --via flask/asgi: client đi qua Gateway (tiến trình riêng, /catalog/...) như Frontend thay vì gọi thẳng dịch vụ.
+#
+# Chạy: python benchmarks/bench_change_feed.py [--models 10000] [--consumers 5] [--rate 20] [--duration 10]
+#                                              [--via catalog|flask|asgi]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_utils import (PROJECT_ROOT, ServerThread, add_service_path, disable_admission_control, free_port,
+                         percentile, start_process, stop_process)
+
+
+def serve_gateway(mode, port, catalog_url):
+    """Chế độ tiến trình con: Gateway Flask hoặc ASGI trỏ tới Catalog Service của bench."""
+    add_service_path('api-gateway')
+    import config
+    disable_admission_control(config)
+    config.SERVICES['catalog']['instances'] = [f"{catalog_url}/api/v1"]
+    if mode == 'flask':
+        from werkzeug.serving import run_simple
+        import gateway_app
+        run_simple('127.0.0.1', port, gateway_app.app, threaded=True)
+    else:
+        import uvicorn
+        import gateway_asgi
+        uvicorn.run(gateway_asgi.app, port=port, log_level='error')
+
+
+def seed(db, CarModel, Inventory, model_count):
+    db.create_all()
+    db.session.execute(CarModel.__table__.insert(), [
+        {"id": i + 1, "model_name": f"VinFast #{i + 1}", "base_price": 500000000 + i,
+         "description": "SUV điện đô thị, phiên bản đại lý.", "specs": '{"motor_type": "Điện"}', "image_url": None}
+        for i in range(model_count)
+    ])
+    db.session.execute(Inventory.__table__.insert(), [
+        {"car_model_id": i + 1, "dealer_location": location, "stock_quantity": 10}
+        for i in range(model_count) for location in ("Hà Nội", "TP. HCM")
+    ])
+    db.session.commit()
+
+
+class Writer(threading.Thread):
+    """Cập nhật tồn kho ngẫu nhiên rate lần/giây; ghi lại thời điểm commit của mỗi seq trong change_log."""
+
+    def __init__(self, app, rate, duration, row_count):
+        super().__init__(daemon=True)
+        self.app, self.rate, self.duration, self.row_count = app, rate, duration, row_count
+        self.committed = {}
+
+    def run(self):
+        from database import Inventory, db
+        import change_feed
+        rng = random.Random(3)
+        with self.app.app_context():
+            deadline = time.perf_counter() + self.duration
+            while time.perf_counter() < deadline:
+                # Luôn đổi giá trị: UPDATE không đổi gì thì trigger không ghi change_log
+                db.session.execute(Inventory.__table__.update().where(
+                    Inventory.id == rng.randint(1, self.row_count)).values(stock_quantity=Inventory.stock_quantity + 1))
+                db.session.commit()
+                committed = time.perf_counter()
+                self.committed[change_feed.latest_cursor(db.session)] = committed
+                db.session.rollback()
+                time.sleep(1 / self.rate)
+
+
+def poll_consumer(url, interval, stop, stats):
+    session = requests.Session()
+    etag = None
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = session.get(f"{url}/catalog/cars", headers={"If-None-Match": etag} if etag else {})
+        stats["requests"] += 1
+        stats["bytes"] += len(response.content)
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+        stats["polls"].append((started, time.perf_counter()))
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def long_poll_consumer(url, cursor, stop, stats):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.get(f"{url}/catalog/changes", params={"cursor": cursor, "wait": 8}, timeout=15)
+        received = time.perf_counter()
+        stats["requests"] += 1
+        stats["bytes"] += len(response.content)
+        body = response.json()
+        stats["seen"].extend((change["cursor"], received) for change in body["changes"])
+        cursor = body["cursor"]
+
+
+def sse_consumer(url, cursor, stop, stats):
+    # Heartbeat mỗi HEARTBEAT_SECONDS: quá 15s không nhận được byte nào là luồng đã bị giữ lại ở đâu đó
+    try:
+        with requests.get(f"{url}/catalog/changes/stream", params={"cursor": cursor}, stream=True,
+                          timeout=15) as response:
+            stats["requests"] += 1
+            for line in response.iter_lines(chunk_size=1):
+                stats["bytes"] += len(line) + 1
+                if line.startswith(b"id: "):
+                    stats["seen"].append((int(line[4:]), time.perf_counter()))
+                if stop.is_set():
+                    return
+    except requests.exceptions.RequestException as e:
+        stats["errors"] += 1
+        print(f"SSE lỗi: {e!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=10000)
+    parser.add_argument('--consumers', type=int, default=5)
+    parser.add_argument('--rate', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--via', choices=['catalog', 'flask', 'asgi'], default='catalog')
+    parser.add_argument('--serve-gateway', nargs=2, metavar=('PORT', 'CATALOG_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_gateway:
+        serve_gateway(args.via, int(args.serve_gateway[0]), args.serve_gateway[1])
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_change_feed_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import app
+    from database import CarModel, Inventory, db
+    import change_feed
+
+    with app.app_context():
+        seed(db, CarModel, Inventory, args.models)
+
+    print(f"{args.models} mẫu xe, {args.consumers} client mỗi cách, ghi {args.rate:.0f} thay đổi/s "
+          f"trong {args.duration:.0f}s, qua {args.via}")
+    print(f"{'cách':<10} {'request/client':>15} {'KB/client':>10} {'thấy thay đổi':>14} {'trễ p50 ms':>11} "
+          f"{'trễ p99 ms':>11}")
+    with ServerThread(app) as server:
+        gateway = None
+        url = f"{server.url}/api/v1"
+        if args.via != 'catalog':
+            port = free_port()
+            gateway = start_process([sys.executable, os.path.abspath(__file__), '--via', args.via,
+                                     '--serve-gateway', str(port), server.url], port,
+                                    cwd=os.path.join(PROJECT_ROOT, 'api-gateway'))
+            url = f"http://127.0.0.1:{port}/catalog"
+        try:
+            run_consumers(args, app, db, change_feed, url)
+        finally:
+            if gateway is not None:
+                stop_process(gateway)
+
+
+def run_consumers(args, app, db, change_feed, url):
+    """Chạy lần lượt poll / long-poll / SSE với url gốc của danh mục (dịch vụ hoặc Gateway)."""
+    requests.get(f"{url}/catalog/cars")  # dựng cache trước khi đo
+    for label, consumer, extra in (
+        ("poll", poll_consumer, (args.poll_interval,)),
+        ("long-poll", long_poll_consumer, None),
+        ("SSE", sse_consumer, None),
+    ):
+        with app.app_context():
+            cursor = change_feed.latest_cursor(db.session)
+        stop = threading.Event()
+        all_stats = [{"requests": 0, "bytes": 0, "seen": [], "polls": [], "errors": 0} for _ in range(args.consumers)]
+        threads = [threading.Thread(target=consumer, daemon=True,
+                                    args=(url, *(extra or (cursor,)), stop, stats))
+                   for stats in all_stats]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        writer = Writer(app, args.rate, args.duration, args.models * 2)
+        writer.start()
+        writer.join()
+        time.sleep(1.5 if label != "poll" else args.poll_interval + 1)
+        stop.set()
+        for thread in threads:
+            thread.join()  # long-poll/SSE thoát sau lần trả lời tiếp theo (tối đa wait hoặc heartbeat)
+
+        delays = []
+        for stats in all_stats:
+            if label == "poll":
+                # Thay đổi được thấy ở lần poll đầu tiên bắt đầu sau khi commit
+                for committed in writer.committed.values():
+                    done = next((end for start, end in stats["polls"] if start >= committed), None)
+                    if done is not None:
+                        delays.append(done - committed)
+            else:
+                delays.extend(received - writer.committed[seq] for seq, received in stats["seen"]
+                              if seq in writer.committed)
+        seen = len(delays) / args.consumers
+        requests_per_client = sum(stats["requests"] for stats in all_stats) / args.consumers
+        kb_per_client = sum(stats["bytes"] for stats in all_stats) / args.consumers / 1024
+        print(f"{label:<10} {requests_per_client:>15.0f} {kb_per_client:>10.0f} "
+              f"{seen:>9.0f}/{len(writer.committed):<4} {percentile(delays, 50) * 1000:>11.1f} "
+              f"{percentile(delays, 99) * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_dashboard.py
+#
+# So sánh độ trễ tải Dashboard quản trị:
+#   - vòng lặp phía Frontend cũ: GET /orders/orders rồi tuần tự gọi /users/users/<id> cho mỗi đơn
+#     và /catalog/catalog/cars/<id> cho mỗi mặt hàng (N+1 round trip qua Gateway)
+#   - endpoint ghép dữ liệu mới: một lần GET /dashboard/orders
+# Back-end giả lập mất --latency-ms cho mỗi request.
+#
+# Chạy: python benchmarks/bench_dashboard.py [--orders 50 200 500] [--latency-ms 2]
+
+import argparse
+import time
+
+import requests
+from flask import Flask, jsonify, request
+
+from bench_utils import ServerThread, add_service_path, disable_admission_control
+
+
+def make_backend(order_count, latency):
+    backend = Flask('bench_backend')
+    orders = [
+        {
+            "order_id": i, "user_id": i % 50 + 1, "status": "Confirmed", "total_amount": 2 * 850000000,
+            "order_date": "2026-01-01T00:00:00",
+            "items": [
+                {"item_id": 2 * i, "car_model_id": i % 8 + 1, "quantity": 1, "unit_price": 850000000,
+                 "subtotal": 850000000},
+                {"item_id": 2 * i + 1, "car_model_id": (i + 3) % 8 + 1, "quantity": 1, "unit_price": 850000000,
+                 "subtotal": 850000000},
+            ],
+        }
+        for i in range(1, order_count + 1)
+    ]
+
+    def user(user_id):
+        return {"id": user_id, "name": f"Khách hàng Demo {user_id}", "email": f"user{user_id}@test.com",
+                "role": "customer"}
+
+    def car(car_id):
+        return {"id": car_id, "model_name": f"VinFast VF {car_id}", "base_price": 850000000}
+
+    def ids_arg():
+        return [int(x) for x in request.args.get('ids', '').split(',') if x]
+
+    @backend.before_request
+    def simulate_latency():
+        time.sleep(latency)
+
+    @backend.route('/api/v1/orders')
+    def all_orders():
+        return jsonify(orders)
+
+    @backend.route('/api/v1/users/<int:user_id>')
+    def one_user(user_id):
+        return jsonify(user(user_id))
+
+    @backend.route('/api/v1/users')
+    def users_batch():
+        return jsonify([user(i) for i in ids_arg()])
+
+    @backend.route('/api/v1/catalog/cars/<int:car_id>')
+    def one_car(car_id):
+        return jsonify(car(car_id))
+
+    @backend.route('/api/v1/catalog/cars')
+    def cars_batch():
+        return jsonify([car(i) for i in ids_arg()])
+
+    return backend
+
+
+def client_side_loop(gateway_url):
+    """Mô phỏng loadDashboard cũ trong script.js."""
+    orders = requests.get(f"{gateway_url}/orders/orders").json()
+    for order in orders:
+        requests.get(f"{gateway_url}/users/users/{order['user_id']}").json()
+        for item in order['items']:
+            requests.get(f"{gateway_url}/catalog/catalog/cars/{item['car_model_id']}").json()
+    return len(orders)
+
+
+def aggregated(gateway_url):
+    return len(requests.get(f"{gateway_url}/dashboard/orders").json())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--latency-ms', type=float, default=2)
+    args = parser.parse_args()
+
+    add_service_path('api-gateway')
+    import config
+    disable_admission_control(config)
+
+    print(f"Back-end giả lập mất {args.latency_ms} ms mỗi request")
+    print(f"{'orders':>7} {'client-side loop ms':>20} {'/dashboard/orders ms':>21} {'speedup':>8}")
+    for order_count in args.orders:
+        with ServerThread(make_backend(order_count, args.latency_ms / 1000)) as backend:
+            for service in config.SERVICES.values():
+                service['instances'] = [f"{backend.url}/api/v1"]
+            import gateway_app
+            gateway_app.POOLS.update(gateway_app.build_pools(config.SERVICES))
+            gateway_app.CACHE.purge()
+
+            with ServerThread(gateway_app.app) as gateway:
+                started = time.perf_counter()
+                assert client_side_loop(gateway.url) == order_count
+                loop_ms = (time.perf_counter() - started) * 1000
+
+                started = time.perf_counter()
+                assert aggregated(gateway.url) == order_count
+                aggregated_ms = (time.perf_counter() - started) * 1000
+
+            print(f"{order_count:>7} {loop_ms:>20.1f} {aggregated_ms:>21.1f} {loop_ms / aggregated_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_gateway_admission.py
+#
+# Đo tác dụng của kiểm soát tải ở Gateway Flask khi Order Service bị quá tải:
+#   - --browsers client liên tục GET /orders/orders (lưu lượng duyệt xem)
+#   - --buyers client liên tục POST /orders/orders (đặt hàng, lưu lượng ưu tiên)
+# Order Service giả lập chỉ xử lý --capacity request cùng lúc, mỗi request mất --service-ms.
+# So sánh khi tắt kiểm soát tải (mọi request xếp hàng ở Back-end) và khi bật max_concurrent
+# bằng --capacity (request duyệt xem vượt ngân sách bị trả 503 ngay, đặt hàng dùng slot dự trữ).
+#
+# Chạy: python benchmarks/bench_gateway_admission.py [--browsers 48] [--buyers 4] [--seconds 5]
+
+import argparse
+import threading
+import time
+
+import requests
+from flask import Flask, jsonify
+
+from bench_utils import ServerThread, add_service_path, disable_admission_control, percentile
+
+
+def make_backend(capacity, service_time):
+    backend = Flask('bench_backend')
+    slots = threading.Semaphore(capacity)
+
+    @backend.route('/api/v1/orders', methods=['GET', 'POST'])
+    def orders():
+        with slots:
+            time.sleep(service_time)
+        return jsonify([{"order_id": 1, "status": "Confirmed"}])
+
+    return backend
+
+
+def client_loop(session, method, url, deadline, results):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = session.request(method, url, json={"user_id": 1, "items": [{"car_id": 1}]}
+                                   if method == 'POST' else None)
+        elapsed = time.perf_counter() - started
+        results.append((response.status_code, elapsed))
+        if response.status_code in (429, 503):
+            # Client tôn trọng việc bị từ chối nhưng không chờ hết Retry-After để giữ áp lực tải
+            time.sleep(0.05)
+
+
+def run(gateway_url, browsers, buyers, seconds):
+    deadline = time.perf_counter() + seconds
+    results = {"browse": [], "checkout": []}
+    threads = []
+    for label, method, count in (("browse", 'GET', browsers), ("checkout", 'POST', buyers)):
+        for _ in range(count):
+            thread = threading.Thread(target=client_loop, args=(
+                requests.Session(), method, f"{gateway_url}/orders/orders", deadline, results[label]))
+            thread.start()
+            threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--browsers', type=int, default=48)
+    parser.add_argument('--buyers', type=int, default=4)
+    parser.add_argument('--capacity', type=int, default=8)
+    parser.add_argument('--service-ms', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    add_service_path('api-gateway')
+    import config
+    # Mọi client của benchmark cùng một địa chỉ IP: chỉ đo giới hạn đồng thời và ưu tiên
+    disable_admission_control(config)
+    import gateway_app
+
+    print(f"Order Service giả lập: {args.capacity} request cùng lúc, {args.service_ms:.0f} ms/request; "
+          f"{args.browsers} client duyệt xem, {args.buyers} client đặt hàng, {args.seconds:.0f}s mỗi lần đo")
+    print(f"{'admission':<10} {'traffic':<9} {'ok':>6} {'shed':>6} {'ok/s':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    with ServerThread(make_backend(args.capacity, args.service_ms / 1000)) as backend:
+        for mode in ('off', 'on'):
+            for service in config.SERVICES.values():
+                service['instances'] = [f"{backend.url}/api/v1"]
+                service.pop('max_concurrent', None)
+            if mode == 'on':
+                config.SERVICES['orders']['max_concurrent'] = args.capacity
+            gateway_app.POOLS.update(gateway_app.build_pools(
+                config.SERVICES, priority_reserved_ratio=config.PRIORITY_RESERVED_RATIO,
+                priority_wait=config.PRIORITY_WAIT_SECONDS))
+
+            with ServerThread(gateway_app.app) as gateway:
+                results = run(gateway.url, args.browsers, args.buyers, args.seconds)
+
+            for label, samples in results.items():
+                ok = [elapsed for status, elapsed in samples if status < 400]
+                shed = sum(1 for status, _ in samples if status in (429, 503))
+                print(f"{mode:<10} {label:<9} {len(ok):>6} {shed:>6} {len(ok) / args.seconds:>7.1f} "
+                      f"{percentile(ok, 50) * 1000:>8.1f} {percentile(ok, 99) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/bench_gateway_compression.py
+#
+# Đo hiệu quả nén phản hồi của Gateway với dữ liệu giống thật:
+#   - danh mục xe (CARS_DATA_DEMO của Catalog Service, nhân lên --models mẫu xe, ensure_ascii=False)
+#   - danh sách đơn hàng (--orders đơn, mỗi đơn 2 mặt hàng)
+# Với mỗi kiểu nén: kích thước sau nén, CPU cho lần nén đầu và cho lần lặp lại (lấy từ cache),
+# rồi đi qua Gateway Flask để kiểm tra byte thực gửi về client và thống kê /gateway/stats.
+#
+# Chạy: python benchmarks/bench_gateway_compression.py [--models 8 200 2000] [--orders 1000]
+
+import argparse
+import json
+import time
+
+import requests
+from flask import Flask, Response
+
+from bench_utils import ServerThread, add_service_path
+
+
+def catalog_payload(model_count, demo_cars):
+    cars = []
+    for i in range(model_count):
+        car = demo_cars[i % len(demo_cars)]
+        cars.append({
+            "id": i + 1,
+            "model_name": f"{car['model_name']} #{i + 1}",
+            "base_price": car['base_price'],
+            "description": car['description'],
+            "specs": json.loads(car['specs']),
+            "image_url": car['image_url'],
+        })
+    return json.dumps(cars, ensure_ascii=False).encode('utf-8')
+
+
+def orders_payload(order_count):
+    orders = [
+        {
+            "order_id": i, "user_id": i % 50 + 1, "order_date": "2026-01-01T00:00:00", "status": "Confirmed",
+            "total_amount": 1907000000,
+            "items": [
+                {"item_id": 2 * i, "car_model_id": i % 8 + 1, "quantity": 1, "unit_price": 1057000000,
+                 "subtotal": 1057000000},
+                {"item_id": 2 * i + 1, "car_model_id": (i + 3) % 8 + 1, "quantity": 1, "unit_price": 850000000,
+                 "subtotal": 850000000},
+            ],
+        }
+        for i in range(1, order_count + 1)
+    ]
+    return json.dumps(orders).encode('utf-8')
+
+
+def measure(compressor, body, encoding, repeat=20):
+    """(kích thước sau nén, ms CPU lần nén đầu, ms trung bình khi lấy lại từ cache)."""
+    started = time.perf_counter()
+    compressed = compressor.compress(body, encoding)
+    first_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compressor.compress(body, encoding)
+    cached_ms = (time.perf_counter() - started) * 1000 / repeat
+    return len(compressed), first_ms, cached_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, nargs='+', default=[8, 200, 2000])
+    parser.add_argument('--orders', type=int, default=1000)
+    args = parser.parse_args()
+
+    add_service_path('catalog-service')
+    from app import CARS_DATA_DEMO
+
+    add_service_path('api-gateway')
+    import config
+    from compression import SUPPORTED_ENCODINGS, ResponseCompressor
+
+    payloads = [(f"catalog {n} mẫu xe", catalog_payload(n, CARS_DATA_DEMO)) for n in args.models]
+    payloads.append((f"{args.orders} đơn hàng", orders_payload(args.orders)))
+
+    print(f"{'payload':<22} {'gốc KB':>9} {'nén':>5} {'sau nén KB':>11} {'tỉ lệ':>7} "
+          f"{'nén lần đầu ms':>15} {'từ cache ms':>12}")
+    for label, body in payloads:
+        for encoding in SUPPORTED_ENCODINGS:
+            compressor = ResponseCompressor(config.COMPRESSION_MIN_SIZE, config.COMPRESSIBLE_TYPES,
+                                            config.GZIP_LEVEL, config.BROTLI_QUALITY,
+                                            config.COMPRESSION_CACHE_MAX_BYTES)
+            size, first_ms, cached_ms = measure(compressor, body, encoding)
+            print(f"{label:<22} {len(body) / 1024:>9.1f} {encoding:>5} {size / 1024:>11.1f} "
+                  f"{size / len(body):>7.3f} {first_ms:>15.2f} {cached_ms:>12.3f}")
+
+    # Đi qua Gateway Flask: Back-end trả JSON không nén, Gateway nén theo Accept-Encoding
+    catalog_body = payloads[-2][1]
+    backend = Flask('bench_backend')
+
+    @backend.route('/api/v1/catalog/cars')
+    def cars():
+        return Response(catalog_body, mimetype='application/json')
+
+    print()
+    with ServerThread(backend) as server:
+        for service in config.SERVICES.values():
+            service['instances'] = [f"{server.url}/api/v1"]
+        import gateway_app
+        gateway_app.POOLS.update(gateway_app.build_pools(config.SERVICES))
+        gateway_app.CACHE.purge()
+
+        with ServerThread(gateway_app.app) as gateway:
+            for accept in ['identity', 'gzip', 'br, gzip']:
+                response = requests.get(f"{gateway.url}/catalog/catalog/cars",
+                                        headers={'Accept-Encoding': accept}, stream=True)
+                wire = len(response.raw.read(decode_content=False))
+                print(f"Accept-Encoding: {accept:<10} -> Content-Encoding: "
+                      f"{response.headers.get('Content-Encoding', '-'):<5} {wire / 1024:>9.1f} KB trên đường truyền")
+            stats = requests.get(f"{gateway.url}/gateway/stats").json()['compression']
+            print(f"/gateway/stats: bytes_saved={stats['bytes_saved']} cpu_ms={stats['cpu_ms']} "
+                  f"cache hits/misses={stats['cache']['hits']}/{stats['cache']['misses']}")
+
+
+if __name__ == '__main__':
+    main()
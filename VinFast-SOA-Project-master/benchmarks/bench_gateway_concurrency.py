@@ -0,0 +1,133 @@
+# benchmarks/bench_gateway_concurrency.py
+#
+# Kiểm thử tải: so sánh khả năng chịu nhiều request đồng thời của Gateway Flask (gateway_app.py)
+# và Gateway ASGI (gateway_asgi.py) khi Back-end chậm (mô phỏng order-service mất --delay giây).
+# Back-end và mỗi Gateway chạy trong tiến trình riêng để không tranh chấp GIL với bộ tạo tải.
+#
+# Chạy: python benchmarks/bench_gateway_concurrency.py [--delay 0.2] [--concurrency 10 100 500 1000]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench_utils import (PROJECT_ROOT, add_service_path, disable_admission_control, free_port, percentile,
+                         start_process, stop_process)
+
+GATEWAY_DIR = os.path.join(PROJECT_ROOT, 'api-gateway')
+
+
+def make_slow_backend(delay):
+    async def backend(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        await asyncio.sleep(delay)
+        body = b'{"order_id": 1, "status": "Confirmed"}'
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+    return backend
+
+
+def serve(args):
+    """Chế độ tiến trình con: chạy Back-end giả lập hoặc một trong hai Gateway."""
+    import uvicorn
+
+    if args.serve == 'backend':
+        uvicorn.run(make_slow_backend(args.delay), port=args.port, log_level='error', backlog=4096)
+        return
+
+    add_service_path('api-gateway')
+    import config
+    disable_admission_control(config)
+    for service in config.SERVICES.values():
+        service['instances'] = [f"{args.backend_url}/api/v1"]
+        service['pool_size'] = 1000
+        service['max_connections'] = 2000
+
+    if args.serve == 'flask':
+        from werkzeug.serving import run_simple
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        import gateway_app
+        run_simple('127.0.0.1', args.port, gateway_app.app, threaded=True)
+    else:
+        import gateway_asgi
+        uvicorn.run(gateway_asgi.app, port=args.port, log_level='error', backlog=4096)
+
+
+def start(mode, port, **extra):
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)]
+    for key, value in extra.items():
+        cmd += [f'--{key.replace("_", "-")}', str(value)]
+    return start_process(cmd, port, cwd=GATEWAY_DIR)
+
+
+async def load(url, concurrency, total):
+    import aiohttp
+
+    latencies = []
+    failures = 0
+    remaining = total
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+
+        async def worker():
+            nonlocal failures, remaining
+            while remaining > 0:
+                remaining -= 1
+                start_time = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        if response.status != 200:
+                            failures += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    failures += 1
+                latencies.append(time.perf_counter() - start_time)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+    return total / duration, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', choices=['backend', 'flask', 'asgi'])
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--backend-url')
+    parser.add_argument('--delay', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500, 1000])
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    backend_port = free_port()
+    backend = start('backend', backend_port, delay=args.delay)
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    try:
+        print(f"Back-end giả lập trả lời sau {args.delay * 1000:.0f} ms mỗi request")
+        print(f"{'gateway':<8} {'concurrency':>11} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'lỗi':>6}")
+        for mode in ('flask', 'asgi'):
+            port = free_port()
+            gateway = start(mode, port, backend_url=backend_url)
+            try:
+                for concurrency in args.concurrency:
+                    rps, latencies, failures = asyncio.run(
+                        load(f"http://127.0.0.1:{port}/orders/orders", concurrency, concurrency * 3))
+                    print(f"{mode:<8} {concurrency:>11} {rps:>10.1f} "
+                          f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} "
+                          f"{failures:>6}")
+            finally:
+                stop_process(gateway)
+    finally:
+        stop_process(backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_gateway_pool.py
+#
+# So sánh throughput khi gọi Back-end bằng requests.request (mở TCP mới mỗi lần)
+# và bằng ServicePool (keep-alive). Back-end giả lập là endpoint GET rẻ giống /catalog/cars/<id>.
+#
+# Chạy: python benchmarks/bench_gateway_pool.py [--requests 3000] [--concurrency 1 8 32]
+
+import argparse
+
+import requests
+from flask import Flask, jsonify
+
+from bench_utils import ServerThread, add_service_path, print_row, run_load
+
+add_service_path('api-gateway')
+from upstream import ServicePool  # noqa: E402
+
+
+def make_backend():
+    backend = Flask('bench_backend')
+
+    @backend.route('/api/v1/catalog/cars/<int:car_id>')
+    def car(car_id):
+        return jsonify({"id": car_id, "model_name": "VinFast VF 8", "base_price": 1057000000})
+
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+
+    with ServerThread(make_backend()) as backend:
+        base_url = f"{backend.url}/api/v1"
+
+        for concurrency in args.concurrency:
+            print(f"\n--- concurrency={concurrency}, {args.requests} requests ---")
+
+            def unpooled():
+                requests.request('GET', f"{base_url}/catalog/cars/1", timeout=10).content
+
+            rps, latencies = run_load(unpooled, args.requests, concurrency)
+            print_row("unpooled (requests.request)", rps, latencies)
+
+            pool = ServicePool('catalog', base_url, pool_size=concurrency)
+
+            def pooled():
+                pool.request('GET', 'catalog/cars/1', timeout=10).content
+
+            rps, latencies = run_load(pooled, args.requests, concurrency)
+            print_row("pooled (ServicePool)", rps, latencies)
+            stats = pool.stats()
+            print(f"  connections_opened={stats['connections_opened']} "
+                  f"reuse_ratio={stats['connection_reuse_ratio']} peak_in_flight={stats['peak_in_flight']}")
+
+
+if __name__ == '__main__':
+    main()
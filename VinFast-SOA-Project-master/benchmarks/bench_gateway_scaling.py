@@ -0,0 +1,126 @@
+# benchmarks/bench_gateway_scaling.py
+#
+# Đo throughput của Gateway ASGI khi tăng dần số instance Catalog Service phía sau.
+# Mỗi instance giả lập chỉ xử lý một request tại một thời điểm, mất --service-ms mỗi request
+# (giống Catalog Service chạy một worker), nên một instance phục vụ tối đa ~1000/service-ms req/s.
+# Các instance được thêm vào lúc Gateway đang chạy qua POST /gateway/services/catalog/instances.
+#
+# Chạy: python benchmarks/bench_gateway_scaling.py [--instances 4] [--service-ms 10]
+#       [--concurrency 64] [--requests 2000] [--strategy p2c|least_outstanding]
+
+import argparse
+import asyncio
+import os
+import sys
+
+import requests
+
+from bench_gateway_auth import make_token
+from bench_gateway_concurrency import load
+from bench_utils import PROJECT_ROOT, add_service_path, free_port, percentile, start_process, stop_process
+
+GATEWAY_DIR = os.path.join(PROJECT_ROOT, 'api-gateway')
+
+
+def make_single_worker_backend(service_time):
+    lock = None
+
+    async def backend(scope, receive, send):
+        nonlocal lock
+        if scope['type'] != 'http':
+            return
+        if lock is None:
+            lock = asyncio.Lock()
+        async with lock:
+            await asyncio.sleep(service_time)
+        body = b'[{"id": 1, "model_name": "VinFast VF 8", "base_price": 1057000000}]'
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+    return backend
+
+
+def serve(args):
+    """Chế độ tiến trình con: chạy một instance Catalog giả lập hoặc Gateway ASGI."""
+    import uvicorn
+
+    if args.serve == 'backend':
+        uvicorn.run(make_single_worker_backend(args.service_ms / 1000), port=args.port, log_level='error')
+        return
+
+    add_service_path('api-gateway')
+    import config
+    config.SERVICES['catalog']['instances'] = [args.backend_url]
+    config.LOAD_BALANCING['strategy'] = args.strategy
+    # Chỉ đo cân bằng tải: tắt cache và gộp request của Gateway
+    config.COALESCE_RULES.clear()
+    import gateway_asgi
+    uvicorn.run(gateway_asgi.app, port=args.port, log_level='error', backlog=4096)
+
+
+def start(mode, port, **extra):
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)]
+    for key, value in extra.items():
+        cmd += [f'--{key.replace("_", "-")}', str(value)]
+    return start_process(cmd, port, cwd=GATEWAY_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', choices=['backend', 'gateway'])
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--backend-url')
+    parser.add_argument('--instances', type=int, default=4)
+    parser.add_argument('--service-ms', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--strategy', choices=['p2c', 'least_outstanding'], default='p2c')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    backends = []
+    gateway = None
+    try:
+        urls = []
+        for _ in range(args.instances):
+            port = free_port()
+            backends.append(start('backend', port, service_ms=args.service_ms))
+            urls.append(f"http://127.0.0.1:{port}/api/v1")
+
+        gateway_port = free_port()
+        gateway_url = f"http://127.0.0.1:{gateway_port}"
+        gateway = start('gateway', gateway_port, backend_url=urls[0], strategy=args.strategy)
+
+        print(f"Mỗi instance xử lý tuần tự, {args.service_ms:.0f} ms/request; strategy={args.strategy}, "
+              f"{args.concurrency} client đồng thời")
+        print(f"{'instances':>9} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'lỗi':>6}  phân bố request")
+        for count in range(1, args.instances + 1):
+            if count > 1:
+                # Thêm instance là endpoint quản trị: cần token có role admin
+                response = requests.post(f"{gateway_url}/gateway/services/catalog/instances",
+                                         json={"url": urls[count - 1]}, timeout=5,
+                                         headers={"Authorization": f"Bearer {make_token(0, role='admin')}"})
+                assert response.status_code == 201, response.text
+
+            before = {i['url']: i['total_requests']
+                      for i in requests.get(f"{gateway_url}/gateway/services", timeout=5).json()['catalog']['instances']}
+            rps, latencies, failures = asyncio.run(
+                load(f"{gateway_url}/catalog/catalog/cars", args.concurrency, args.requests))
+            after = requests.get(f"{gateway_url}/gateway/services", timeout=5).json()['catalog']['instances']
+            spread = '/'.join(str(i['total_requests'] - before.get(i['url'], 0)) for i in after)
+
+            print(f"{count:>9} {rps:>10.1f} {percentile(latencies, 50) * 1000:>9.1f} "
+                  f"{percentile(latencies, 99) * 1000:>9.1f} {failures:>6}  {spread}")
+    finally:
+        if gateway:
+            stop_process(gateway)
+        for backend in backends:
+            stop_process(backend)
+
+
+if __name__ == '__main__':
+    main()
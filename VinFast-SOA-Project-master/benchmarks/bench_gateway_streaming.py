@@ -0,0 +1,153 @@
+# benchmarks/bench_gateway_streaming.py
+#
+# Đo bộ nhớ đỉnh (VmHWM) và thời gian tới byte đầu tiên (TTFB) của Gateway khi chuyển tiếp
+# phản hồi lớn (ví dụ danh sách đơn hàng đầy đủ) ở chế độ đọc toàn bộ (buffered) và streaming.
+# Mỗi cấu hình chạy Gateway trong một tiến trình riêng để đo RSS chính xác.
+#
+# Chạy: python benchmarks/bench_gateway_streaming.py [--size-mb 50] [--rounds 3]
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+from flask import Flask, Response, request
+
+from bench_utils import (PROJECT_ROOT, ServerThread, add_service_path, disable_admission_control, free_port,
+                         start_process, stop_process)
+
+GATEWAY_DIR = os.path.join(PROJECT_ROOT, 'api-gateway')
+CHUNK = b'{"order_id": 1, "user_id": 1, "status": "Confirmed", "total_amount": 1499000000},' * 800
+
+
+def make_backend(size_bytes):
+    backend = Flask('bench_backend')
+
+    @backend.route('/api/v1/orders', methods=['GET'])
+    def large_orders():
+        def generate():
+            sent = 0
+            while sent < size_bytes:
+                part = CHUNK[:size_bytes - sent]
+                sent += len(part)
+                yield part
+        return Response(generate(), mimetype='application/json',
+                        headers={'Content-Length': str(size_bytes)})
+
+    @backend.route('/api/v1/orders', methods=['POST'])
+    def upload():
+        received = 0
+        while True:
+            part = request.stream.read(64 * 1024)
+            if not part:
+                break
+            received += len(part)
+        return {"received": received}
+
+    return backend
+
+
+def serve(args):
+    """Chế độ tiến trình con: chạy Gateway với chế độ streaming bật/tắt."""
+    add_service_path('api-gateway')
+    import config
+    disable_admission_control(config)
+    config.STREAMING_PROXY = args.streaming == 1
+    for service in config.SERVICES.values():
+        service['instances'] = [f"{args.backend_url}/api/v1"]
+
+    if args.serve == 'flask':
+        import logging
+        from werkzeug.serving import run_simple
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        import gateway_app
+        run_simple('127.0.0.1', args.port, gateway_app.app, threaded=True)
+    else:
+        import uvicorn
+        import gateway_asgi
+        uvicorn.run(gateway_asgi.app, port=args.port, log_level='error')
+
+
+def peak_rss_mb(pid):
+    """Bộ nhớ RSS đỉnh của tiến trình (Linux: VmHWM trong /proc/<pid>/status)."""
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class UploadBody:
+    """Body upload sinh dần từng khối; __len__ để requests gửi Content-Length thay vì chunked."""
+
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def __len__(self):
+        return self.size_bytes
+
+    def __iter__(self):
+        sent = 0
+        while sent < self.size_bytes:
+            part = CHUNK[:self.size_bytes - sent]
+            sent += len(part)
+            yield part
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', choices=['flask', 'asgi'])
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--backend-url')
+    parser.add_argument('--streaming', type=int, choices=[0, 1])
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    size_bytes = args.size_mb * 1024 * 1024
+    print(f"Phản hồi/upload {args.size_mb} MB, {args.rounds} lượt mỗi cấu hình")
+    print(f"{'gateway':<8} {'mode':<10} {'TTFB ms':>9} {'total ms':>9} {'upload ms':>10} "
+          f"{'RSS start MB':>13} {'RSS peak MB':>12}")
+
+    with ServerThread(make_backend(size_bytes)) as backend:
+        for gateway in ('flask', 'asgi'):
+            for streaming in (0, 1):
+                port = free_port()
+                process = start_process(
+                    [sys.executable, os.path.abspath(__file__), '--serve', gateway, '--port', str(port),
+                     '--backend-url', backend.url, '--streaming', str(streaming)],
+                    port, cwd=GATEWAY_DIR)
+                try:
+                    rss_start = peak_rss_mb(process.pid)
+                    ttfb, total, upload = [], [], []
+                    for _ in range(args.rounds):
+                        started = time.perf_counter()
+                        with requests.get(f"http://127.0.0.1:{port}/orders/orders", stream=True) as response:
+                            chunks = response.iter_content(64 * 1024)
+                            first = next(chunks)
+                            ttfb.append(time.perf_counter() - started)
+                            received = len(first) + sum(len(chunk) for chunk in chunks)
+                        total.append(time.perf_counter() - started)
+                        assert received == size_bytes, received
+
+                        started = time.perf_counter()
+                        response = requests.post(
+                            f"http://127.0.0.1:{port}/orders/orders", data=UploadBody(size_bytes),
+                            headers={'Content-Type': 'application/json'})
+                        upload.append(time.perf_counter() - started)
+                        assert response.json()['received'] == size_bytes, response.text
+
+                    print(f"{gateway:<8} {'streaming' if streaming else 'buffered':<10} "
+                          f"{min(ttfb) * 1000:>9.1f} {min(total) * 1000:>9.1f} {min(upload) * 1000:>10.1f} "
+                          f"{rss_start:>13.1f} {peak_rss_mb(process.pid):>12.1f}")
+                finally:
+                    stop_process(process)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_inventory_quote.py
+#
+# Đo thời gian báo giá + kiểm tra tồn kho cho giỏ hàng 1, 10 và 100 mặt hàng (--carts) qua HTTP thật:
+#   - trước: mỗi mặt hàng một POST /inventory/check (SUM riêng) và một GET /catalog/cars/<id>
+#     (cách Order Service đang gọi Catalog Service)
+#   - sau: một POST /inventory/quote cho cả giỏ hàng (một truy vấn GROUP BY)
+# Catalog Service chạy trên DB SQLite tạm (CATALOG_DATABASE_URI) với --models mẫu xe, mỗi mẫu 2 dòng tồn kho.
+#
+# Chạy: python benchmarks/bench_inventory_quote.py [--models 10000] [--carts 1 10 100] [--repeat 30]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import requests
+
+from bench_utils import ServerThread, add_service_path, percentile
+
+
+def seed(db, CarModel, Inventory, demo_cars, model_count):
+    db.create_all()
+    db.session.execute(CarModel.__table__.insert(), [
+        {"id": i + 1, "model_name": f"{demo_cars[i % len(demo_cars)]['model_name']} #{i + 1}",
+         "base_price": demo_cars[i % len(demo_cars)]['base_price'],
+         "description": demo_cars[i % len(demo_cars)]['description'],
+         "specs": demo_cars[i % len(demo_cars)]['specs'], "image_url": None}
+        for i in range(model_count)
+    ])
+    db.session.execute(Inventory.__table__.insert(), [
+        {"car_model_id": i + 1, "dealer_location": location, "stock_quantity": 5}
+        for i in range(model_count) for location in ("Hà Nội", "TP. HCM")
+    ])
+    db.session.commit()
+
+
+def per_item(session, base_url, cart):
+    """Cách cũ: hai request tuần tự cho mỗi mặt hàng."""
+    results = []
+    for item in cart:
+        check = session.post(f"{base_url}/api/v1/inventory/check", json=item).json()
+        price = session.get(f"{base_url}/api/v1/catalog/cars/{item['car_id']}").json()['base_price']
+        results.append((check['is_available'], price))
+    return results
+
+
+def bulk(session, base_url, cart):
+    response = session.post(f"{base_url}/api/v1/inventory/quote", json={"items": cart}).json()
+    return [(item['is_available'], item['unit_price']) for item in response['items']]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=10000)
+    parser.add_argument('--carts', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_quote_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import CARS_DATA_DEMO, app
+    from database import CarModel, Inventory, db
+
+    with app.app_context():
+        seed(db, CarModel, Inventory, CARS_DATA_DEMO, args.models)
+
+    rng = random.Random(7)
+    print(f"{args.models} mẫu xe; p50/p99 ms của {args.repeat} giỏ hàng ngẫu nhiên mỗi cỡ")
+    print(f"{'mặt hàng':>9} {'từng món p50':>13} {'p99':>8} {'HTTP':>6} {'quote p50':>10} {'p99':>8} {'HTTP':>6}")
+    with ServerThread(app) as server:
+        session = requests.Session()
+        for size in args.carts:
+            timings = {per_item: [], bulk: []}
+            for _ in range(args.repeat):
+                cart = [{"car_id": rng.randint(1, args.models), "quantity": 1} for _ in range(size)]
+                for fn in (per_item, bulk):
+                    started = time.perf_counter()
+                    fn(session, server.url, cart)
+                    timings[fn].append((time.perf_counter() - started) * 1000)
+            # Kết quả của hai cách phải giống nhau (kiểm tra trên giỏ hàng cuối)
+            assert per_item(session, server.url, cart) == bulk(session, server.url, cart)
+            old, new = timings[per_item], timings[bulk]
+            print(f"{size:>9} {percentile(old, 50):>13.2f} {percentile(old, 99):>8.2f} {2 * size:>6} "
+                  f"{percentile(new, 50):>10.2f} {percentile(new, 99):>8.2f} {1:>6}")
+
+        unknown = session.post(f"{server.url}/api/v1/inventory/quote", json={"items": [
+            {"car_id": 1, "quantity": 2}, {"car_id": args.models + 99, "quantity": 1}]}).json()
+        print()
+        print(f"car_id không tồn tại: unknown_car_ids={unknown['unknown_car_ids']}, "
+              f"all_available={unknown['all_available']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+# benchmarks/bench_location_stock.py
+#
+# Đo tra cứu tồn kho theo đại lý (location_stock.py) với --dealers đại lý x --models mẫu xe (mặc định
+# 1.000 x 10.000 = 10 triệu dòng inventory, DB SQLite tạm; dữ liệu được nạp bằng SQL rồi mới tạo chỉ mục/trigger):
+#   1. mẫu xe x đại lý: SQL chỉ dùng chỉ mục car_model_id (như trước, quét mọi đại lý của mẫu xe),
+#      SQL theo chỉ mục (car_model_id, dealer_location), và ảnh chụp trong bộ nhớ (nạp lần đầu / đã nạp)
+#   2. mọi đại lý còn xe của một mẫu xe, và --limit đại lý gần nhất còn >= 3 xe: SQL + tính khoảng cách
+#      trong Python so với ảnh chụp
+#      (chi phí của ảnh chụp: nạp cả --dealers đại lý, bộ nhớ của các mảng tồn kho)
+#   3. qua HTTP (ServerThread, --concurrency client): /inventory/locations và /inventory/nearest,
+#      và tra cứu ngay sau một lần giữ chỗ (ảnh chụp phải đọc nhật ký thay đổi trước khi trả lời)
+#
+# Chạy: python benchmarks/bench_location_stock.py [--dealers 1000] [--models 10000] [--lookups 2000]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import requests
+
+from bench_utils import ServerThread, add_service_path, percentile, print_row, run_load
+
+LAT_RANGE = (8.6, 23.3)
+LON_RANGE = (102.2, 109.4)
+
+
+def dealer_name(index):
+    return f"Đại lý {index:04d}"
+
+
+def seed(db, CarModel, Inventory, DealerLocation, dealers, models):
+    """Nạp dữ liệu bằng SQL thuần khi chưa có chỉ mục/trigger của inventory, rồi mới tạo chúng (nhanh hơn nhiều)."""
+    from sqlalchemy import text
+    connection = db.session.connection()
+    for kind, name in connection.execute(text(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('trigger', 'index') AND tbl_name = 'inventory' "
+            "AND sql IS NOT NULL")).all():
+        connection.execute(text(f"DROP {kind.upper()} {name}"))
+    connection.execute(CarModel.__table__.insert(), [
+        {"id": i, "model_name": f"VinFast #{i}", "base_price": 500000000 + i, "description": "",
+         "specs": "{}", "image_url": None}
+        for i in range(1, models + 1)
+    ])
+    rng = random.Random(7)
+    connection.execute(DealerLocation.__table__.insert(), [
+        {"name": dealer_name(d), "latitude": rng.uniform(*LAT_RANGE), "longitude": rng.uniform(*LON_RANGE)}
+        for d in range(dealers)
+    ])
+    # Tồn kho 0..4 (20% đại lý hết một mẫu xe)
+    connection.execute(text("""
+        WITH RECURSIVE d(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM d WHERE i + 1 < :dealers),
+                       m(j) AS (SELECT 1 UNION ALL SELECT j + 1 FROM m WHERE j < :models)
+        INSERT INTO inventory (car_model_id, dealer_location, stock_quantity)
+        SELECT j, printf('Đại lý %04d', i), (i * 7 + j * 13) % 5 FROM d, m
+    """), {"dealers": dealers, "models": models})
+    for index in Inventory.__table__.indexes:
+        index.create(connection)
+
+
+def timed(fn, repeat):
+    """Độ trễ (giây) của repeat lần gọi fn(i)."""
+    latencies = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def print_latency(label, latencies):
+    print(f"  {label:<52} p50={percentile(latencies, 50) * 1000:8.3f} ms   "
+          f"p99={percentile(latencies, 99) * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dealers', type=int, default=1000)
+    parser.add_argument('--models', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_location_stock_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import app, upgrade_schema
+    from database import CarModel, DealerLocation, Inventory, db
+    from sqlalchemy import text
+    import location_stock
+    import stock_totals
+
+    rng = random.Random(1)
+    cars = [rng.randint(1, args.models) for _ in range(args.lookups)]
+    locations = [dealer_name(rng.randrange(args.dealers)) for _ in range(args.lookups)]
+    origins = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.lookups)]
+
+    with app.app_context():
+        started = time.perf_counter()
+        db.create_all()
+        seed(db, CarModel, Inventory, DealerLocation, args.dealers, args.models)
+        stock_totals.recompute(db.session.connection())
+        upgrade_schema()  # tạo lại trigger
+        print(f"Nạp {args.dealers} đại lý x {args.models} mẫu xe = {args.dealers * args.models:,} dòng inventory "
+              f"(kèm chỉ mục) trong {time.perf_counter() - started:.0f}s")
+        session = db.session
+
+        print("1. Tồn kho một mẫu xe tại một đại lý")
+        by_model_index = text("SELECT stock_quantity FROM inventory INDEXED BY ix_inventory_car_model_id "
+                              "WHERE car_model_id = :car AND dealer_location = :location")
+        by_pair_index = text("SELECT stock_quantity FROM inventory "
+                             "WHERE car_model_id = :car AND dealer_location = :location")
+        sample = min(args.lookups, 300)
+        print_latency("SQL, chỉ mục car_model_id (quét mọi đại lý)", timed(
+            lambda i: session.execute(by_model_index, {"car": cars[i], "location": locations[i]}).scalar(), sample))
+        print_latency("SQL, chỉ mục (car_model_id, dealer_location)", timed(
+            lambda i: session.execute(by_pair_index, {"car": cars[i], "location": locations[i]}).scalar(),
+            args.lookups))
+        snapshot = location_stock.LocationSnapshot()
+        started = time.perf_counter()
+        snapshot.refresh(session)
+        print(f"  ảnh chụp: đọc danh sách {len(snapshot._locations)} đại lý + {args.models} mẫu xe "
+              f"trong {(time.perf_counter() - started) * 1000:.0f} ms")
+        cold = timed(lambda i: snapshot.stock(session, cars[i], [locations[i]]), args.lookups)
+        print_latency(f"ảnh chụp, lần đầu ({snapshot.partition_loads} lần nạp một đại lý)", cold)
+        print_latency("ảnh chụp, đã nạp", timed(lambda i: snapshot.stock(session, cars[i], [locations[i]]),
+                                                args.lookups))
+        # Đối chiếu với DB
+        for i in range(50):
+            expected = session.execute(by_pair_index, {"car": cars[i], "location": locations[i]}).scalar()
+            assert snapshot.stock(session, cars[i], [locations[i]]) == [(locations[i], expected)]
+
+        print("2. Mọi đại lý của một mẫu xe / đại lý gần nhất còn >= 3 xe")
+        all_locations = text("SELECT dealer_location, stock_quantity FROM inventory "
+                             "WHERE car_model_id = :car AND stock_quantity > 0 ORDER BY dealer_location")
+        print_latency("SQL mọi đại lý còn xe", timed(
+            lambda i: session.execute(all_locations, {"car": cars[i]}).all(), sample))
+        started = time.perf_counter()
+        snapshot.stock(session, cars[0])
+        print(f"  ảnh chụp: nạp nốt đến {snapshot.partition_loads} đại lý trong {time.perf_counter() - started:.1f}s, "
+              f"mảng tồn kho {snapshot.stats()['partition_bytes'] / 1024 / 1024:.0f} MB")
+        print_latency("ảnh chụp mọi đại lý còn xe", timed(lambda i: snapshot.stock(session, cars[i]), args.lookups))
+
+        coordinates = dict(((name, (lat, lon)) for name, lat, lon in
+                            session.execute(text("SELECT name, latitude, longitude FROM dealer_locations"))))
+        in_stock = text("SELECT dealer_location, stock_quantity FROM inventory "
+                        "WHERE car_model_id = :car AND stock_quantity >= 3")
+
+        def sql_nearest(i):
+            rows = session.execute(in_stock, {"car": cars[i]}).all()
+            ranked = sorted((location_stock.distance_km(origins[i], coordinates[location]), location, quantity)
+                            for location, quantity in rows if location in coordinates)
+            return ranked[:args.limit]
+
+        print_latency(f"SQL + khoảng cách trong Python ({args.limit} gần nhất)", timed(sql_nearest, sample))
+        print_latency("ảnh chụp, điểm xuất phát mới (sắp xếp đại lý)", timed(
+            lambda i: snapshot.nearest(session, cars[i], origins[i], 3, args.limit), args.lookups))
+        print_latency("ảnh chụp, 50 điểm xuất phát đã gặp", timed(
+            lambda i: snapshot.nearest(session, cars[i], origins[i % 50], 3, args.limit), args.lookups))
+        for i in range(20):
+            expected = [(location, quantity) for _, location, quantity in sql_nearest(i)]
+            got = [(location, quantity) for location, _, quantity in
+                   snapshot.nearest(session, cars[i], origins[i], 3, args.limit)]
+            assert got == expected, (got, expected)
+        db.session.rollback()
+
+    print(f"3. Qua HTTP ({args.concurrency} client, ảnh chụp của tiến trình dịch vụ đã nạp trước)")
+    with ServerThread(app) as server:
+        http = requests.Session()
+        http.get(f"{server.url}/api/v1/inventory/locations", params={"car_id": 1})
+        counter = iter(range(10 ** 9))
+
+        def get(path, params):
+            response = http.get(f"{server.url}{path}", params=params)
+            response.raise_for_status()
+            return response.json()
+
+        rps, latencies = run_load(lambda: get("/api/v1/inventory/locations", {
+            "car_id": cars[next(counter) % args.lookups], "location": locations[next(counter) % args.lookups]}),
+            args.lookups, args.concurrency)
+        print_row("/inventory/locations (1 đại lý)", rps, latencies)
+        rps, latencies = run_load(lambda: get("/api/v1/inventory/locations", {
+            "car_id": cars[next(counter) % args.lookups]}), args.lookups // 4, args.concurrency)
+        print_row("/inventory/locations (mọi đại lý)", rps, latencies)
+        rps, latencies = run_load(lambda: get("/api/v1/inventory/nearest", dict(zip(
+            ("lat", "lon"), origins[next(counter) % 50]), car_id=cars[next(counter) % args.lookups], quantity=3)),
+            args.lookups, args.concurrency)
+        print_row("/inventory/nearest (50 điểm xuất phát)", rps, latencies)
+
+        # Giữ chỗ rồi đọc ngay: kết quả phải phản ánh lần ghi vừa commit
+        write_latencies, read_latencies = [], []
+        for i in range(200):
+            car_id, location = cars[i], dealer_name(i % args.dealers)
+            before = get("/api/v1/inventory/locations", {"car_id": car_id, "location": location})
+            if before["total"] == 0:
+                continue
+            started = time.perf_counter()
+            reservation = http.post(f"{server.url}/api/v1/inventory/reservations", json={
+                "car_id": car_id, "location": location, "policy": "location_only", "quantity": 1})
+            reservation.raise_for_status()
+            write_latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            after = get("/api/v1/inventory/locations", {"car_id": car_id, "location": location})
+            read_latencies.append(time.perf_counter() - started)
+            assert after["total"] == before["total"] - 1, (before, after)
+        print(f"  giữ chỗ ({len(write_latencies)} lần) p50={percentile(write_latencies, 50) * 1000:.2f} ms; "
+              f"đọc ngay sau đó (áp dụng nhật ký) p50={percentile(read_latencies, 50) * 1000:.2f} ms "
+              f"p99={percentile(read_latencies, 99) * 1000:.2f} ms, luôn thấy tồn kho mới")
+
+
+if __name__ == '__main__':
+    main()
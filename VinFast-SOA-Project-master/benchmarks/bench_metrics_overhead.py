@@ -0,0 +1,122 @@
+# benchmarks/bench_metrics_overhead.py
+#
+# Đo chi phí của common/metrics.py để bảo đảm có thể bật /metrics trên môi trường thật:
+#   1. chi phí một lần Histogram.observe / Counter.inc (một thread và --threads thread cùng ghi)
+#   2. cùng một ứng dụng Flask (route có tham số, giống /catalog/cars/<id>) có và không có instrument(),
+#      đo qua test client (không tính mạng) và qua HTTP thật; in thêm thời gian render /metrics
+#
+# Chạy: python benchmarks/bench_metrics_overhead.py [--requests 5000] [--threads 8]
+
+import argparse
+import threading
+import time
+
+import requests
+from flask import Flask, jsonify
+
+from bench_utils import ServerThread, percentile
+
+from common.metrics import Registry, instrument
+
+
+def make_app(with_metrics, registry):
+    app = Flask('bench_metrics')
+
+    @app.route('/api/v1/catalog/cars/<int:car_id>')
+    def car(car_id):
+        return jsonify({"id": car_id, "model_name": "VinFast VF 8", "base_price": 1057000000})
+
+    if with_metrics:
+        instrument(app, registry)
+    return app
+
+
+def per_call_us(fn, count):
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def threaded_us(fn, count, threads):
+    """Thời gian trung bình mỗi lần gọi khi threads thread cùng ghi vào một metric."""
+    per_thread = count // threads
+    workers = [threading.Thread(target=lambda: [fn(i) for i in range(per_thread)]) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e6
+
+
+def client_latencies(app, count):
+    client = app.test_client()
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        client.get(f'/api/v1/catalog/cars/{i % 50 + 1}')
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def http_latencies(app, count):
+    samples = []
+    with ServerThread(app) as server:
+        session = requests.Session()
+        for i in range(count):
+            started = time.perf_counter()
+            session.get(f'{server.url}/api/v1/catalog/cars/{i % 50 + 1}')
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.histogram('bench_seconds', 'Benchmark histogram.', ('method', 'route', 'status'))
+    counter = registry.counter('bench_total', 'Benchmark counter.', ('method', 'route', 'status'))
+    calls = args.requests * 20
+
+    print(f"Histogram.observe: {per_call_us(lambda i: histogram.observe('GET', '/r', '200', value=i * 1e-6), calls):6.2f} us"
+          f"  ({args.threads} thread: "
+          f"{threaded_us(lambda i: histogram.observe('GET', '/r', '200', value=i * 1e-6), calls, args.threads):.2f} us)")
+    print(f"Counter.inc:       {per_call_us(lambda i: counter.inc('GET', '/r', '200'), calls):6.2f} us"
+          f"  ({args.threads} thread: "
+          f"{threaded_us(lambda i: counter.inc('GET', '/r', '200'), calls, args.threads):.2f} us)")
+
+    print()
+    print(f"{'đo qua':<12} {'metrics':<8} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+    for label, measure in (("test client", client_latencies), ("HTTP", http_latencies)):
+        means = {}
+        for with_metrics in (False, True):
+            app = make_app(with_metrics, Registry())
+            measure(app, min(500, args.requests))  # làm nóng
+            samples = measure(app, args.requests)
+            means[with_metrics] = sum(samples) / len(samples)
+            print(f"{label:<12} {'on' if with_metrics else 'off':<8} {means[with_metrics] * 1e6:>9.1f} "
+                  f"{percentile(samples, 50) * 1e6:>9.1f} {percentile(samples, 99) * 1e6:>9.1f}")
+        overhead = means[True] - means[False]
+        print(f"{label:<12} chi phí thêm: {overhead * 1e6:.1f} us/request ({overhead / means[False]:.1%})")
+
+    # /metrics sau khi đã ghi nhiều route khác nhau (mỗi mã trạng thái/route một chuỗi histogram)
+    registry = Registry()
+    app = make_app(True, registry)
+    for route in range(50):
+        for status in ('200', '404', '503'):
+            registry.histogram('http_request_duration_seconds', '', ('method', 'route', 'status')).observe(
+                'GET', f'/route/{route}', status, value=0.01)
+    client = app.test_client()
+    started = time.perf_counter()
+    body = client.get('/metrics').data
+    print()
+    print(f"/metrics với 150 chuỗi histogram: {len(body) / 1024:.1f} KB, "
+          f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
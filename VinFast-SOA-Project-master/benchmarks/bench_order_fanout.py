@@ -0,0 +1,163 @@
+# benchmarks/bench_order_fanout.py
+#
+# Độ trễ tạo đơn hàng (POST /api/v1/orders của order-service) theo số mặt hàng trong giỏ, khi các lời gọi
+# T1/T2 chạy lần lượt (như trước: ORDER_FANOUT_CONCURRENCY = 1, không có hạn chót chung, mỗi lời gọi chờ tối đa
+# SERVICE_TIMEOUT) và đồng thời (cấu hình mặc định):
+#   - User Service và Catalog Service giả lập (uvicorn, tiến trình riêng) trả lời sau --delay giây mỗi lời gọi
+#   - Order Service chạy trong ServerThread với DB SQLite tạm; các đơn được gửi lần lượt từng đơn một
+#   - giỏ --sizes mặt hàng (mẫu xe khác nhau): 1 lời gọi T1 + 2 lời gọi T2 mỗi mặt hàng
+#   - mặt hàng cuối hết hàng (409): cách đồng thời dừng ngay ở lỗi đầu tiên
+#   - một lời gọi T2 treo: hạn chót chung (--deadline) trả 504 thay vì chờ SERVICE_TIMEOUT rồi báo hết hàng;
+#     đơn lỗi không để lại dòng nào trong DB
+#
+# Chạy: python benchmarks/bench_order_fanout.py [--delay 0.02] [--sizes 1 2 5 10 20] [--orders 20]
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_utils import ServerThread, add_service_path, free_port, percentile, start_process, stop_process
+
+UNKNOWN_USER_ID = 404
+SOLD_OUT_CAR_ID = 999
+HANGING_CAR_ID = 998
+
+
+def make_backend(delay):
+    """T1 + T2 giả lập: mỗi lời gọi mất delay giây; xe SOLD_OUT_CAR_ID hết hàng, xe HANGING_CAR_ID treo 30s."""
+
+    async def backend(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        path = scope['path']
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        status, data = 200, {}
+        if path.startswith('/api/v1/users/'):
+            user_id = int(path.rsplit('/', 1)[1])
+            status, data = (404, {"message": "not found"}) if user_id == UNKNOWN_USER_ID else (200, {"id": user_id})
+        elif path == '/api/v1/inventory/check':
+            car_id = json.loads(body)['car_id']
+            if car_id == HANGING_CAR_ID:
+                await asyncio.sleep(30)
+            data = {"car_id": car_id, "is_available": car_id != SOLD_OUT_CAR_ID}
+        elif path.startswith('/api/v1/catalog/cars/'):
+            car_id = int(path.rsplit('/', 1)[1])
+            data = {"id": car_id, "base_price": 500000000 + car_id}
+        await asyncio.sleep(delay)
+        payload = json.dumps(data).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(payload)).encode())]})
+        await send({'type': 'http.response.body', 'body': payload})
+    return backend
+
+
+def place_orders(url, carts, orders):
+    """Gửi lần lượt `orders` đơn cho mỗi giỏ trong carts (vòng tròn); trả về (độ trễ, [status])."""
+    latencies, statuses = [], []
+    session = requests.Session()
+    for i in range(orders):
+        items = [{"car_id": car_id, "quantity": 1} for car_id in carts[i % len(carts)]]
+        started = time.perf_counter()
+        response = session.post(f"{url}/api/v1/orders", json={"user_id": 7, "items": items})
+        latencies.append(time.perf_counter() - started)
+        statuses.append(response.status_code)
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=0.02)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 5, 10, 20])
+    parser.add_argument('--orders', type=int, default=20)
+    parser.add_argument('--deadline', type=float, default=1.0)
+    parser.add_argument('--serve-backend', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_backend:
+        import uvicorn
+        uvicorn.run(make_backend(args.delay), port=args.serve_backend, log_level='error', backlog=4096)
+        return
+
+    backend_port = free_port()
+    backend = start_process([sys.executable, os.path.abspath(__file__), '--serve-backend', str(backend_port),
+                             '--delay', str(args.delay)], backend_port)
+    try:
+        workdir = tempfile.mkdtemp(prefix='bench_order_fanout_')
+        os.environ['ORDER_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'orders.db')}"
+        add_service_path('order-service')
+        import app as order_service
+        from database import Order, OrderItem, db
+
+        order_service.USER_SERVICE_URL = order_service.CATALOG_SERVICE_URL = f"http://127.0.0.1:{backend_port}"
+        app = order_service.app
+        app.db_initialized = True  # không xóa/tạo lại order_service.db của thư mục hiện tại
+        app.setup_done = True  # dịch vụ giả lập không có luồng thay đổi: không chạy PRICE_WATCHER
+        with app.app_context():
+            db.create_all()
+        # Chỉ đo phần fan-out: mọi lời gọi T1/T2 đều tới dịch vụ giả lập (không dùng cache tra cứu)
+        for cache in (order_service.USER_CACHE, order_service.PRICE_CACHE):
+            cache.ttl = cache.negative_ttl = 0
+        # Cách cũ: lần lượt, không có hạn chót chung (chỉ SERVICE_TIMEOUT của từng lời gọi)
+        modes = (("lần lượt (trước)", 1, 3600),
+                 ("đồng thời", order_service.ORDER_FANOUT_CONCURRENCY, args.deadline))
+
+        def use(mode):
+            order_service.ORDER_FANOUT_CONCURRENCY, order_service.ORDER_DEADLINE_SECONDS = mode[1:]
+
+        with ServerThread(app) as server:
+            place_orders(server.url, [[1]], 3)  # làm nóng
+            print(f"T1/T2 giả lập: {args.delay * 1000:.0f} ms mỗi lời gọi; {args.orders} đơn mỗi dòng, gửi lần lượt")
+            print(f"{'mặt hàng':>9} {'lời gọi':>8} " + " ".join(f"{mode[0] + ' p50/p99 ms':>28}" for mode in modes)
+                  + f" {'nhanh hơn':>10}")
+            for size in args.sizes:
+                p50s = []
+                cells = []
+                for mode in modes:
+                    use(mode)
+                    latencies, statuses = place_orders(server.url, [list(range(1, size + 1))], args.orders)
+                    assert set(statuses) == {201}, statuses
+                    p50s.append(percentile(latencies, 50))
+                    cells.append(f"{percentile(latencies, 50) * 1000:>12.1f} / {percentile(latencies, 99) * 1000:<8.1f}")
+                print(f"{size:>9} {1 + 2 * size:>8} " + " ".join(f"{cell:>28}" for cell in cells)
+                      + f" {p50s[0] / p50s[1]:>9.1f}x")
+
+            size = max(args.sizes)
+            with app.app_context():
+                orders_before = (Order.query.count(), OrderItem.query.count())
+            print()
+            print(f"Giỏ {size} mặt hàng, mặt hàng cuối hết hàng (409):")
+            for mode in modes:
+                use(mode)
+                latencies, statuses = place_orders(
+                    server.url, [list(range(1, size)) + [SOLD_OUT_CAR_ID]], args.orders)
+                assert set(statuses) == {409}, statuses
+                print(f"  {mode[0]:<18} p50={percentile(latencies, 50) * 1000:.1f} ms")
+
+            print(f"Giỏ {size} mặt hàng, một lời gọi T2 treo (hạn chót chung {args.deadline:.1f}s, "
+                  f"SERVICE_TIMEOUT {order_service.SERVICE_TIMEOUT}s):")
+            for mode in modes:
+                use(mode)
+                latencies, statuses = place_orders(server.url, [[HANGING_CAR_ID] + list(range(1, size))], 2)
+                print(f"  {mode[0]:<18} {max(latencies):.2f}s, status {sorted(set(statuses))}")
+            with app.app_context():
+                orders_after = (Order.query.count(), OrderItem.query.count())
+            assert orders_after == orders_before, (orders_before, orders_after)
+            print(f"Đơn lỗi không ghi dòng nào: (orders, order_items) = {orders_after}")
+    finally:
+        stop_process(backend)
+
+
+if __name__ == '__main__':
+    main()
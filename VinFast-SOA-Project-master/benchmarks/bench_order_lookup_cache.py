@@ -0,0 +1,181 @@
+# benchmarks/bench_order_lookup_cache.py
+#
+# Cache người dùng / giá xe của order-service (lookup_cache.py) khi tạo đơn hàng:
+#   - Catalog Service thật (tiến trình riêng, DB SQLite tạm với --models mẫu xe) kèm route giả lập
+#     GET /api/v1/users/<id> của User Service; mỗi request tới tiến trình này chậm thêm --delay giây (mạng)
+#   - Order Service chạy trong ServerThread (DB SQLite tạm); --orders đơn gửi lần lượt, mỗi đơn --items mẫu xe
+#     (mẫu xe phổ biến được đặt nhiều hơn), người dùng lấy từ --users người, --unknown-users phần đơn có
+#     người dùng không tồn tại (404, cache âm)
+#   - so sánh cache tắt (TTL = 0, như trước) và bật: độ trễ p50/p99, số lời gọi T1/T2 thật, tỉ lệ trúng,
+#     thời gian gọi dịch vụ ước tính đã tiết kiệm và các dòng order_lookup_cache_* của /metrics
+#   - đổi giá một mẫu xe trong Catalog Service: thời gian tới khi đơn mới dùng giá mới
+#     (CatalogPriceWatcher theo luồng thay đổi, thay vì chờ hết PRICE_CACHE_TTL)
+#
+# Chạy: python benchmarks/bench_order_lookup_cache.py [--delay 0.005] [--orders 300] [--models 100]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_utils import ServerThread, add_service_path, free_port, percentile, start_process, stop_process
+
+BASE_PRICE = 500000000
+
+
+def serve_catalog(port, workdir, models, delay):
+    """Catalog Service với --models mẫu xe, route /api/v1/users/<id> giả lập và route đổi giá cho bench."""
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import app, bulk_import, search, upgrade_schema
+    from database import CarModel, db
+    from flask import jsonify
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        with search.bulk_indexing(db.session):
+            bulk_import.import_rows(db.session, ((i, {
+                "model_name": f"VinFast #{i}", "base_price": BASE_PRICE + i, "description": "",
+                "specs": "{}", "image_url": None}) for i in range(1, models + 1)), 'models')
+            bulk_import.import_rows(db.session, ((i, {
+                "model_name": f"VinFast #{i}", "dealer_location": "Hà Nội", "stock_quantity": 1000})
+                for i in range(1, models + 1)), 'inventory')
+
+    @app.before_request
+    def network_delay():
+        time.sleep(delay)
+
+    @app.route('/api/v1/users/<int:user_id>', methods=['GET'])
+    def get_user(user_id):
+        if user_id >= 1000:
+            return jsonify({"message": "Người dùng không tồn tại"}), 404
+        return jsonify({"id": user_id}), 200
+
+    @app.route('/bench/price/<int:car_id>', methods=['POST'])
+    def change_price(car_id):
+        car = db.session.get(CarModel, car_id)
+        car.base_price += 1000000
+        db.session.commit()
+        return jsonify({"base_price": car.base_price}), 200
+
+    app.run(port=port, threaded=True)
+
+
+def make_orders(args):
+    """Danh sách (user_id, [car_id]) cố định cho mọi lần chạy."""
+    rng = random.Random(5)
+    weights = [1 / rank for rank in range(1, args.models + 1)]
+    orders = []
+    for _ in range(args.orders):
+        user_id = rng.randint(1000, 1004) if rng.random() < args.unknown_users else rng.randint(1, args.users)
+        cars = set()
+        while len(cars) < args.items:
+            cars.add(rng.choices(range(1, args.models + 1), weights)[0])
+        orders.append((user_id, sorted(cars)))
+    return orders
+
+
+def place_orders(url, orders):
+    latencies, statuses = [], []
+    session = requests.Session()
+    for user_id, cars in orders:
+        started = time.perf_counter()
+        response = session.post(f"{url}/api/v1/orders", json={
+            "user_id": user_id, "items": [{"car_id": car_id, "quantity": 1} for car_id in cars]})
+        latencies.append(time.perf_counter() - started)
+        statuses.append(response.status_code)
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=0.005)
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--items', type=int, default=3)
+    parser.add_argument('--models', type=int, default=100)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--unknown-users', type=float, default=0.05)
+    parser.add_argument('--serve-catalog', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_order_lookup_cache_')
+    if args.serve_catalog:
+        serve_catalog(args.serve_catalog, workdir, args.models, args.delay)
+        return
+
+    catalog_port = free_port()
+    catalog = start_process([sys.executable, os.path.abspath(__file__), '--serve-catalog', str(catalog_port),
+                             '--delay', str(args.delay), '--models', str(args.models)], catalog_port,
+                            timeout=60)
+    try:
+        os.environ['ORDER_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'orders.db')}"
+        add_service_path('order-service')
+        import app as order_service
+        from database import db
+
+        order_service.USER_SERVICE_URL = order_service.CATALOG_SERVICE_URL = f"http://127.0.0.1:{catalog_port}"
+        app = order_service.app
+        app.db_initialized = True  # không xóa/tạo lại order_service.db của thư mục hiện tại
+        with app.app_context():
+            db.create_all()
+        caches = {"users": order_service.USER_CACHE, "prices": order_service.PRICE_CACHE}
+        ttls = {name: (cache.ttl, cache.negative_ttl) for name, cache in caches.items()}
+        orders = make_orders(args)
+
+        print(f"{args.orders} đơn x {args.items} mẫu xe ({args.models} mẫu xe, {args.users} người dùng, "
+              f"{args.unknown_users:.0%} người dùng không tồn tại); dịch vụ chậm thêm {args.delay * 1000:.0f} ms")
+        print(f"{'cache':<6} {'p50 ms':>8} {'p99 ms':>8} {'gọi T1':>7} {'gọi giá':>8} {'trúng T1':>9} "
+              f"{'trúng giá':>10} {'tiết kiệm ms':>13}")
+        with ServerThread(app) as server:
+            place_orders(server.url, orders[:5])  # làm nóng; request đầu tiên bắt đầu PRICE_WATCHER
+            while order_service.PRICE_WATCHER.cursor is None:
+                time.sleep(0.01)
+            for label, enabled in (("tắt", False), ("bật", True)):
+                for name, cache in caches.items():
+                    cache.ttl, cache.negative_ttl = ttls[name] if enabled else (0, 0)
+                    cache.invalidate()
+                before = {name: cache.stats() for name, cache in caches.items()}
+                latencies, statuses = place_orders(server.url, orders)
+                assert set(statuses) <= {201, 404}, set(statuses)
+                after = {name: cache.stats() for name, cache in caches.items()}
+                calls = {name: after[name]["misses"] - before[name]["misses"] for name in caches}
+                hits = {name: after[name]["hits"] - before[name]["hits"] for name in caches}
+                rates = {name: hits[name] / max(1, hits[name] + calls[name]) for name in caches}
+                saved = sum(after[name]["saved_ms"] - before[name]["saved_ms"] for name in caches)
+                print(f"{label:<6} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+                      f"{calls['users']:>7} {calls['prices']:>8} {rates['users']:>9.0%} {rates['prices']:>10.0%} "
+                      f"{saved:>13.0f}")
+            print("  " + "\n  ".join(line for line in requests.get(f"{server.url}/metrics").text.splitlines()
+                                     if line.startswith('order_lookup_cache_')))
+
+            # Đổi giá: đơn mới phải dùng giá mới ngay khi watcher thấy thay đổi
+            car_id = orders[0][1][0]
+            session = requests.Session()
+
+            def unit_price():
+                response = session.post(f"{server.url}/api/v1/orders", json={
+                    "user_id": 1, "items": [{"car_id": car_id, "quantity": 1}]})
+                return response.json()["items"][0]["unit_price"]
+
+            unit_price()
+            new_price = requests.post(f"http://127.0.0.1:{catalog_port}/bench/price/{car_id}").json()["base_price"]
+            changed = time.perf_counter()
+            stale = 0
+            while unit_price() != new_price:
+                stale += 1
+                time.sleep(0.01)
+            print(f"Đổi giá mẫu xe {car_id}: đơn dùng giá mới sau {(time.perf_counter() - changed) * 1000:.0f} ms "
+                  f"({stale} đơn còn giá cũ; không có watcher: tới {order_service.PRICE_CACHE_TTL}s), "
+                  f"watcher {order_service.PRICE_WATCHER.stats()}")
+            order_service.PRICE_WATCHER.stop()
+    finally:
+        stop_process(catalog)
+
+
+if __name__ == '__main__':
+    main()
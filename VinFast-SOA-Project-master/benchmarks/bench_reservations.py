@@ -0,0 +1,188 @@
+# benchmarks/bench_reservations.py
+#
+# Giữ chỗ tồn kho khi tranh chấp cao: --clients request đồng thời (mặc định 100 và 300) cùng giữ chỗ một mẫu xe
+# "hot" có --stock xe ở 3 đại lý, qua HTTP thật (Catalog Service trong ServerThread, DB SQLite tạm):
+#   1. bán hết: mỗi client giữ chỗ 1 xe liên tục đến khi nhận 409; số giữ chỗ thành công phải đúng bằng tồn kho,
+#      không đại lý nào âm kho và car_models.total_stock khớp với bảng inventory
+#   2. giữ chỗ rồi xác nhận/hủy ngẫu nhiên (--ops lượt): kho cuối = kho đầu - số đã xác nhận
+#   3. đối chứng: đọc-rồi-ghi thông thường (SELECT stock rồi UPDATE stock = giá trị đã đọc - 1) với tối đa 14
+#      thread (bằng số kết nối của pool) ghi thẳng vào DB, để thấy số xe bị bán vượt khi không dùng UPDATE có điều kiện
+#
+# Chạy: python benchmarks/bench_reservations.py [--clients 100 300] [--stock 600] [--ops 2000]
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_utils import ServerThread, add_service_path, percentile
+
+LOCATIONS = ("Hà Nội", "TP. HCM", "Đà Nẵng")
+HOT_CAR_ID = 1
+
+
+def reset_stock(db, CarModel, Inventory, Reservation, stock):
+    """Một mẫu xe hot, tồn kho chia đều 3 đại lý; xóa giữ chỗ cũ."""
+    db.session.execute(Reservation.__table__.delete())
+    db.session.execute(Inventory.__table__.delete())
+    if db.session.get(CarModel, HOT_CAR_ID) is None:
+        db.session.execute(CarModel.__table__.insert(), [{
+            "id": HOT_CAR_ID, "model_name": "VinFast VF 3 (mở bán)", "base_price": 299000000,
+            "description": "", "specs": "{}", "image_url": None}])
+    per_location = [stock // len(LOCATIONS)] * len(LOCATIONS)
+    per_location[0] += stock - sum(per_location)
+    db.session.execute(Inventory.__table__.insert(), [
+        {"car_model_id": HOT_CAR_ID, "dealer_location": location, "stock_quantity": quantity}
+        for location, quantity in zip(LOCATIONS, per_location)
+    ])
+    db.session.commit()
+
+
+def run_clients(clients, worker):
+    """Chạy worker(index, session) trên `clients` thread cùng lúc; trả về (thời gian, [kết quả])."""
+    barrier = threading.Barrier(clients)
+
+    def run(index):
+        session = requests.Session()
+        barrier.wait()
+        return worker(index, session)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(run, range(clients)))
+    return time.perf_counter() - started, results
+
+
+def check_consistency(db, CarModel, Inventory, stock_totals):
+    stocks = [row[0] for row in db.session.query(Inventory.stock_quantity)]
+    total = db.session.query(CarModel.total_stock).filter(CarModel.id == HOT_CAR_ID).scalar()
+    assert min(stocks) >= 0, f"âm kho: {stocks}"
+    assert stock_totals.verify() == [], "total_stock lệch với inventory"
+    return sum(stocks), total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--stock', type=int, default=600)
+    parser.add_argument('--ops', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_reservations_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import app
+    from database import CarModel, Inventory, Reservation, db
+    from sqlalchemy import text
+    import stock_totals
+
+    with app.app_context():
+        db.create_all()
+
+    with ServerThread(app) as server, app.app_context():
+        url = f"{server.url}/api/v1/inventory/reservations"
+
+        for clients in args.clients:
+            print(f"=== {clients} client đồng thời, tồn kho {args.stock} xe ở {len(LOCATIONS)} đại lý ===")
+
+            # 1. Bán hết
+            reset_stock(db, CarModel, Inventory, Reservation, args.stock)
+
+            def sell_out(index, session):
+                latencies, won, errors = [], 0, 0
+                while True:
+                    started = time.perf_counter()
+                    response = session.post(url, json={"car_id": HOT_CAR_ID, "quantity": 1})
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code == 201:
+                        won += 1
+                    elif response.status_code == 409:
+                        return won, errors, latencies
+                    else:
+                        errors += 1
+
+            duration, results = run_clients(clients, sell_out)
+            won = sum(result[0] for result in results)
+            errors = sum(result[1] for result in results)
+            latencies = [value for result in results for value in result[2]]
+            remaining, total = check_consistency(db, CarModel, Inventory, stock_totals)
+            reserved = db.session.query(db.func.sum(Reservation.quantity)).scalar() or 0
+            print(f"bán hết: {won} giữ chỗ thành công / {args.stock} xe, lỗi khác {errors}, còn lại {remaining} "
+                  f"(total_stock={total}), tổng giữ chỗ {reserved}")
+            print(f"  {len(latencies) / duration:,.0f} request/s ({won / duration:,.0f} giữ chỗ/s), "
+                  f"p50={percentile(latencies, 50) * 1000:.1f} ms p99={percentile(latencies, 99) * 1000:.1f} ms")
+            assert won == args.stock == reserved and remaining == 0, "bán vượt hoặc thiếu tồn kho"
+
+            # 2. Giữ chỗ rồi xác nhận hoặc hủy
+            reset_stock(db, CarModel, Inventory, Reservation, args.stock)
+            per_client = max(1, args.ops // clients)
+
+            def reserve_then_decide(index, session):
+                rng = random.Random(index)
+                committed, released, rejected = 0, 0, 0
+                for _ in range(per_client):
+                    response = session.post(url, json={"car_id": HOT_CAR_ID, "quantity": rng.randint(1, 2)})
+                    if response.status_code != 201:
+                        rejected += 1
+                        continue
+                    reservation = response.json()
+                    if rng.random() < 0.3:
+                        session.post(f"{url}/{reservation['reservation_id']}/commit").raise_for_status()
+                        committed += reservation['quantity']
+                    else:
+                        session.post(f"{url}/{reservation['reservation_id']}/release").raise_for_status()
+                        released += reservation['quantity']
+                return committed, released, rejected
+
+            duration, results = run_clients(clients, reserve_then_decide)
+            committed = sum(result[0] for result in results)
+            rejected = sum(result[2] for result in results)
+            remaining, total = check_consistency(db, CarModel, Inventory, stock_totals)
+            pending = Reservation.query.filter_by(status='pending').count()
+            operations = per_client * clients
+            print(f"giữ chỗ + xác nhận/hủy: {operations} lượt trong {duration:.2f}s "
+                  f"({operations / duration:,.0f} lượt/s, 2 request mỗi lượt), đã xác nhận {committed} xe, "
+                  f"hết hàng {rejected}, còn lại {remaining} = {args.stock} - {committed}, pending {pending}")
+            assert remaining == args.stock - committed and pending == 0
+
+            # 3. Đối chứng: đọc-rồi-ghi không có điều kiện
+            reset_stock(db, CarModel, Inventory, Reservation, args.stock)
+            inventory_ids = [row[0] for row in db.session.query(Inventory.id)]
+            engine = db.engine
+            sold = []
+            sold_lock = threading.Lock()
+
+            def naive(index):
+                rng = random.Random(index)
+                with engine.connect() as connection:
+                    while True:
+                        candidates = [inventory_id for inventory_id in inventory_ids if connection.execute(
+                            text("SELECT stock_quantity FROM inventory WHERE id = :id"),
+                            {"id": inventory_id}).scalar() > 0]
+                        if not candidates:
+                            return
+                        inventory_id = rng.choice(candidates)
+                        current = connection.execute(text("SELECT stock_quantity FROM inventory WHERE id = :id"),
+                                                     {"id": inventory_id}).scalar()
+                        if current < 1:
+                            continue
+                        connection.execute(text("UPDATE inventory SET stock_quantity = :value WHERE id = :id"),
+                                           {"value": current - 1, "id": inventory_id})
+                        connection.commit()
+                        with sold_lock:
+                            sold.append(inventory_id)
+
+            with ThreadPoolExecutor(max_workers=min(clients, 14)) as executor:
+                list(executor.map(naive, range(min(clients, 14))))
+            print(f"đối chứng đọc-rồi-ghi: bán {len(sold)} xe / {args.stock} xe tồn kho "
+                  f"-> bán vượt {len(sold) - args.stock} xe")
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_stock_totals.py
+#
+# So sánh kiểm tra tồn kho bằng SUM(inventory) với đọc car_models.total_stock (do trigger duy trì) khi số đại lý
+# của mỗi mẫu xe tăng dần (--dealers, mặc định 2, 50, 500 dòng inventory mỗi mẫu xe):
+#   - p50/p99 của truy vấn tồn kho một mẫu xe ngẫu nhiên (cách cũ: SUM; cách mới: đọc theo khóa chính)
+#   - p50 của POST /api/v1/inventory/check (dùng total_stock) qua test client
+#   - chi phí thêm của trigger khi ghi: cập nhật stock_quantity một dòng + commit, có và không có trigger
+#   - thời gian của stock_totals.verify() (lệnh flask verify-stock) trên toàn bộ dữ liệu
+# Catalog Service chạy trên DB SQLite tạm (CATALOG_DATABASE_URI).
+#
+# Chạy: python benchmarks/bench_stock_totals.py [--models 2000] [--dealers 2 50 500] [--repeat 500]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import add_service_path, percentile
+
+
+def seed(db, CarModel, Inventory, model_count, dealers):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(CarModel.__table__.insert(), [
+        {"id": i + 1, "model_name": f"VinFast #{i + 1}", "base_price": 500000000, "description": "",
+         "specs": "{}", "image_url": None}
+        for i in range(model_count)
+    ])
+    db.session.execute(Inventory.__table__.insert(), [
+        {"car_model_id": i + 1, "dealer_location": f"Đại lý {d}", "stock_quantity": 1 + (i + d) % 5}
+        for i in range(model_count) for d in range(dealers)
+    ])
+    db.session.commit()
+
+
+def latencies(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=2000)
+    parser.add_argument('--dealers', type=int, nargs='+', default=[2, 50, 500])
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_stock_totals_')
+    os.environ['CATALOG_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    add_service_path('catalog-service')
+    from app import app
+    from database import CarModel, Inventory, db
+    from sqlalchemy import func, text
+    import stock_totals
+
+    rng = random.Random(7)
+    client = app.test_client()
+    print(f"{args.models} mẫu xe; thời gian tính bằng ms")
+    print(f"{'đại lý':>7} {'SUM p50':>8} {'p99':>7} {'total p50':>10} {'p99':>7} "
+          f"{'API check':>10} {'ghi+trigger':>12} {'ghi':>6} {'verify':>8}")
+    with app.app_context():
+        for dealers in args.dealers:
+            seed(db, CarModel, Inventory, args.models, dealers)
+            assert stock_totals.verify() == []
+
+            def sum_stock():
+                car_id = rng.randint(1, args.models)
+                return db.session.query(func.sum(Inventory.stock_quantity)).filter(
+                    Inventory.car_model_id == car_id).scalar() or 0
+
+            def stored_stock():
+                return stock_totals.total_stock(rng.randint(1, args.models))
+
+            sum_p50, sum_p99 = latencies(sum_stock, args.repeat)
+            total_p50, total_p99 = latencies(stored_stock, args.repeat)
+            api_total, _ = latencies(lambda: client.post(
+                '/api/v1/inventory/check', json={"car_id": rng.randint(1, args.models), "quantity": 1}),
+                args.repeat // 5)
+
+            def write_one():
+                db.session.execute(Inventory.__table__.update().where(
+                    Inventory.id == rng.randint(1, args.models * dealers)).values(
+                    stock_quantity=Inventory.stock_quantity + 1))
+                db.session.commit()
+
+            write_p50, _ = latencies(write_one, args.repeat // 5)
+            verify_ms, _ = latencies(stock_totals.verify, 3)
+            assert stock_totals.verify() == []
+            for trigger in ('insert', 'update', 'delete'):
+                db.session.execute(text(f"DROP TRIGGER inventory_stock_{trigger}"))
+            db.session.commit()
+            write_plain_p50, _ = latencies(write_one, args.repeat // 5)
+
+            print(f"{dealers:>7} {sum_p50:>8.3f} {sum_p99:>7.3f} {total_p50:>10.3f} {total_p99:>7.3f} "
+                  f"{api_total:>10.3f} {write_p50:>12.3f} {write_plain_p50:>6.3f} "
+                  f"{verify_ms:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_utils.py
+
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Package common/ dùng chung giữa các dịch vụ
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Tắt access log của werkzeug để không làm nhiễu kết quả đo
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+
+def add_service_path(service_dir):
+    """Cho phép import module của một dịch vụ (thư mục có dấu '-' nên không import trực tiếp được)."""
+    path = os.path.join(PROJECT_ROOT, service_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def disable_admission_control(config):
+    """Tắt giới hạn tải của Gateway (token bucket, max_concurrent) để đo đúng phần đang cần đo."""
+    config.CLIENT_RATE_LIMITS.clear()
+    config.ROUTE_RATE_LIMITS.clear()
+    for service in config.SERVICES.values():
+        service.pop('max_concurrent', None)
+
+
+class ServerThread:
+    """Chạy một ứng dụng WSGI (Flask) trên cổng ngẫu nhiên trong thread nền."""
+
+    def __init__(self, wsgi_app, threaded=True, port=0):
+        self.server = make_server('127.0.0.1', port, wsgi_app, threaded=threaded)
+        self.port = self.server.server_port
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def free_port():
+    """Một cổng TCP đang trống trên 127.0.0.1."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_process(cmd, port, cwd=None, timeout=15):
+    """Chạy một tiến trình máy chủ và chờ đến khi cổng port nhận kết nối."""
+    process = subprocess.Popen(cmd, cwd=cwd)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{cmd} không khởi động được trên cổng {port}")
+
+
+def stop_process(process):
+    process.terminate()
+    process.wait()
+
+
+def run_load(fn, total_requests, concurrency):
+    """Gọi fn() total_requests lần với concurrency thread, trả về (req/s, danh sách độ trễ)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(_):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(total_requests)))
+    duration = time.perf_counter() - started
+    return total_requests / duration, latencies
+
+
+def percentile(values, pct):
+    """Phân vị pct (0-100) của danh sách giá trị."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_row(label, rps, latencies):
+    """In một dòng kết quả: throughput và p50/p99 (ms)."""
+    print(f"{label:<32} {rps:>10.1f} req/s   p50={percentile(latencies, 50) * 1000:7.2f} ms"
+          f"   p99={percentile(latencies, 99) * 1000:7.2f} ms")
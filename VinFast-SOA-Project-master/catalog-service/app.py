@@ -1,21 +1,113 @@
 # catalog-service/app.py
 
-from flask import Flask, request, jsonify, Response
-from database import db, CarModel, Inventory 
+from flask import Flask, request, jsonify, Response, stream_with_context
+from database import db, CarModel, Inventory, Reservation
+from catalog_cache import CatalogCache, watch_changes
+import catalog_query
+from catalog_query import QueryError, is_paginated, page
+import search
+import stock_totals
+import reservations
+import bulk_import
+import change_feed
+import location_stock
+import click
 import os
+import sys
 import json
-from sqlalchemy import func
 from flask_cors import CORS 
 
+# Thư mục gốc của dự án (chứa package common/ dùng chung giữa các dịch vụ)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import instrument
+from common.tracing import trace_requests
+
 app = Flask(__name__)
 CORS(app) 
+# Số request, độ trễ theo route và endpoint /metrics cho Prometheus
+instrument(app)
+# Span cho mỗi request, nối tiếp trace của bên gọi (header traceparent)
+trace_requests(app, 'catalog')
 
 # Đảm bảo sử dụng tên DB mới để tránh xung đột
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///catalog_service_v3.db' 
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('CATALOG_DATABASE_URI', 'sqlite:///catalog_service_v3.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Nhiều request giữ chỗ ghi cùng lúc: chờ khóa ghi của SQLite tới 30s thay vì lỗi "database is locked" sau 5s
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {"connect_args": {"timeout": 30}}
 
 db.init_app(app) 
 
+# Byte JSON của /catalog/cars và /catalog/cars/<id> được giữ lại cho đến khi CarModel/Inventory thay đổi
+CATALOG_CACHE = CatalogCache()
+watch_changes(CATALOG_CACHE)
+# Chỉ mục tìm kiếm FTS5 được cập nhật cùng transaction khi CarModel thay đổi
+search.watch_changes()
+# Request đang chờ luồng thay đổi (long-poll/SSE) được đánh thức sau mỗi commit
+change_feed.watch_commits()
+# Tồn kho theo (đại lý, mẫu xe) trong bộ nhớ, làm mới từ nhật ký thay đổi sau mỗi commit
+LOCATION_STOCK = location_stock.LocationSnapshot()
+
+def upgrade_schema():
+    """DB tạo trước khi có car_models.total_stock / bảng reservations: bổ sung cột, trigger và bảng còn thiếu."""
+    stock_totals.ensure_schema(db.session.connection())
+    Reservation.__table__.create(db.session.connection(), checkfirst=True)
+    bulk_import.ensure_schema(db.session.connection())
+    change_feed.ensure_schema(db.session.connection())
+    location_stock.ensure_schema(db.session.connection())
+    catalog_query.ensure_schema(db.session.connection())
+    db.session.commit()
+
+@app.before_request
+def upgrade_schema_once():
+    # Một lần cho mỗi tiến trình
+    if not hasattr(app, 'schema_ready'):
+        upgrade_schema()
+        app.schema_ready = True
+
+@app.cli.command('verify-stock')
+@click.option('--fix', is_flag=True, help='Tính lại total_stock từ bảng inventory nếu có sai lệch.')
+def verify_stock(fix):
+    """So sánh car_models.total_stock với SUM(inventory.stock_quantity) của từng mẫu xe."""
+    upgrade_schema()
+    mismatches = stock_totals.verify(fix=fix)
+    for car_id, stored, actual in mismatches:
+        print(f"Mẫu xe {car_id}: total_stock={stored}, tồn kho thực tế={actual}")
+    if not mismatches:
+        print("Tổng tồn kho khớp với bảng inventory.")
+    elif fix:
+        print(f"Đã tính lại total_stock ({len(mismatches)} mẫu xe bị lệch).")
+    else:
+        raise SystemExit(1)
+
+@app.cli.command('import-catalog')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(bulk_import.KINDS), required=True,
+              help='models: upsert mẫu xe theo model_name; inventory: tồn kho theo mẫu xe + đại lý; '
+                   'dealers: tọa độ đại lý.')
+@click.option('--format', 'file_format', type=click.Choice(bulk_import.FORMATS),
+              help='Mặc định đoán theo đuôi file (.csv, .jsonl).')
+@click.option('--batch-size', default=bulk_import.DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--commit-every', default=bulk_import.DEFAULT_COMMIT_EVERY, show_default=True)
+@click.option('--skip-invalid', is_flag=True, help='Bỏ qua dòng lỗi thay vì dừng lại.')
+def import_catalog(path, kind, file_format, batch_size, commit_every, skip_invalid):
+    """Nạp mẫu xe hoặc tồn kho từ file CSV/JSONL theo lô."""
+    db.create_all()
+    upgrade_schema()
+    options = dict(file_format=file_format, batch_size=batch_size, commit_every=commit_every,
+                   skip_invalid=skip_invalid)
+    try:
+        if kind == 'models':
+            # Chỉ mục tìm kiếm được dựng lại một lần sau khi nạp xong
+            with search.bulk_indexing(db.session):
+                stats = bulk_import.import_file(db.session, path, kind, **options)
+        else:
+            stats = bulk_import.import_file(db.session, path, kind, **options)
+    except bulk_import.ImportRowError as e:
+        raise click.ClickException(f"{e} (phần chưa commit đã được hủy)")
+    print(f"Đã nạp {stats['rows']} dòng {kind} trong {stats['seconds']:.1f}s "
+          f"({stats['rows'] / max(stats['seconds'], 1e-9):,.0f} dòng/s): {stats['inserted']} mới, "
+          f"{stats['updated']} cập nhật, {stats['skipped']} bỏ qua, {stats['transactions']} transaction.")
+
 # --- DỮ LIỆU DEMO MỚI (Giữ nguyên) ---
 CARS_DATA_DEMO = [
     {
@@ -79,48 +171,114 @@ CARS_DATA_DEMO = [
 def create_demo_data(data):
     """Tạo DB và chèn dữ liệu demo."""
     db.create_all()
-    
+    # create_all() không sửa bảng đã có: DB cũ còn thiếu cột/bảng/trigger của các phiên bản sau
+    upgrade_schema()
+
+    # Chỉ mục tìm kiếm được dựng lại một lần sau khi nạp xong thay vì cập nhật theo từng mẫu xe
+    with search.bulk_indexing(db.session):
+        load_demo_rows(data)
+    print("Đã khởi tạo DB Danh mục & Kho với dữ liệu mới thành công.")
+
+# Cột tồn kho trong dữ liệu demo -> đại lý
+DEMO_LOCATIONS = (("inventory_HN", "Hà Nội"), ("inventory_HCM", "TP. HCM"))
+
+def load_demo_rows(data):
+    Reservation.query.delete()
     CarModel.query.delete() 
     Inventory.query.delete()
 
-    for item in data:
-        car = CarModel(
-            model_name=item['model_name'], 
-            base_price=item['base_price'],
-            description=item['description'],
-            specs=item['specs'],
-            image_url=item['image_url']
-        )
-        db.session.add(car)
-        
-        db.session.commit() 
-        car_id = car.id
-        
-        db.session.add(Inventory(car_model_id=car_id, dealer_location="Hà Nội", stock_quantity=item['inventory_HN']))
-        db.session.add(Inventory(car_model_id=car_id, dealer_location="TP. HCM", stock_quantity=item['inventory_HCM']))
-
-    db.session.commit() 
-    print("Đã khởi tạo DB Danh mục & Kho với dữ liệu mới thành công.")
+    # Nạp theo lô (bulk_import.py) thay vì commit từng mẫu xe để lấy car.id
+    bulk_import.import_rows(db.session, enumerate(data, start=1), 'models')
+    bulk_import.import_rows(db.session, (
+        (line, {"model_name": item['model_name'], "dealer_location": location, "stock_quantity": item[column]})
+        for line, item in enumerate(data, start=1) for column, location in DEMO_LOCATIONS
+    ), 'inventory')
 
 
 # --- API ENDPOINTS (Giữ nguyên) ---
 
+def conditional_json(json_output, etag=None):
+    """Trả JSON kèm ETag (mặc định băm body); trả 304 nếu client (Gateway) gửi If-None-Match trùng khớp."""
+    response = Response(json_output, mimetype='application/json', status=200)
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+    return response.make_conditional(request)
+
+def encode_json(data):
+    return app.json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+def parse_ids(raw_ids):
+    """Chuyển tham số "1,2,3" thành danh sách số nguyên; None nếu không hợp lệ."""
+    try:
+        return [int(x) for x in raw_ids.split(',') if x.strip()]
+    except ValueError:
+        return None
+
 @app.route('/api/v1/catalog/cars', methods=['GET'])
 def get_all_cars():
-    cars = CarModel.query.all()
+    # Toàn bộ danh mục: byte JSON đã mã hóa sẵn, ETag theo phiên bản danh mục
+    if not request.args:
+        body, version = CATALOG_CACHE.car_list(lambda: encode_json([car.to_dict() for car in CarModel.query.all()]))
+        return conditional_json(body, CATALOG_CACHE.etag('cars', version))
+
+    query = CarModel.query
+
+    # Lọc/sắp xếp/phân trang theo con trỏ (xem catalog_query.py): trả {"items", "limit", "next_cursor"}
+    if 'ids' not in request.args and is_paginated(request.args):
+        try:
+            return conditional_json(encode_json(page(query, request.args)))
+        except QueryError as e:
+            return jsonify({"message": str(e)}), 400
+
+    # Tra cứu theo lô (?ids=1,2,3) cho Gateway khi ghép dữ liệu Dashboard
+    raw_ids = request.args.get('ids')
+    if raw_ids is not None:
+        ids = parse_ids(raw_ids)
+        if ids is None:
+            return jsonify({"message": "Tham số ids không hợp lệ"}), 400
+        query = query.filter(CarModel.id.in_(ids))
+
+    cars = query.all()
     data = [car.to_dict() for car in cars]
     json_output = app.json.dumps(data, ensure_ascii=False)
-    return Response(json_output, mimetype='application/json', status=200)
+    return conditional_json(json_output)
 
 @app.route('/api/v1/catalog/cars/<int:car_id>', methods=['GET'])
 def get_car_details(car_id):
-    car = CarModel.query.get(car_id)
-    if car:
-        data = car.to_dict()
-        json_output = app.json.dumps(data, ensure_ascii=False)
-        return Response(json_output, mimetype='application/json', status=200)
+    def build():
+        car = CarModel.query.get(car_id)
+        return encode_json(car.to_dict()) if car else None
+
+    cached = CATALOG_CACHE.car(car_id, build)
+    if cached:
+        body, version = cached
+        return conditional_json(body, CATALOG_CACHE.etag(f'car-{car_id}', version))
     return jsonify({"message": "Mẫu xe không tồn tại"}), 404
 
+@app.route('/api/v1/catalog/search', methods=['GET'])
+def search_cars():
+    """Tìm mẫu xe theo từ khóa (?q=SUV điện 7 chỗ&limit=20), không phân biệt dấu, xếp theo độ liên quan."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"message": "Thiếu từ khóa tìm kiếm (q)"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+    except ValueError:
+        return jsonify({"message": "limit phải là số nguyên"}), 400
+
+    # DB tạo trước khi có tìm kiếm: dựng chỉ mục một lần khi tiến trình nhận request tìm kiếm đầu tiên
+    if not hasattr(app, 'search_index_ready'):
+        search.ensure_index(db.session)
+        db.session.commit()
+        app.search_index_ready = True
+
+    results = search.search(db.session, q, limit)
+    cars = {car.id: car for car in CarModel.query.filter(CarModel.id.in_([car_id for car_id, _ in results]))}
+    items = [dict(cars[car_id].to_dict(), score=round(-score, 4)) for car_id, score in results if car_id in cars]
+    return Response(encode_json({"query": q, "items": items}), mimetype='application/json')
+
 @app.route('/api/v1/inventory/check', methods=['POST'])
 def check_inventory():
     data = request.json
@@ -130,9 +288,8 @@ def check_inventory():
     if not car_id:
         return jsonify({"message": "Thiếu ID mẫu xe"}), 400
 
-    total_stock = db.session.query(func.sum(Inventory.stock_quantity)).filter(
-        Inventory.car_model_id == car_id
-    ).scalar() or 0
+    # Tổng tồn kho được duy trì sẵn trên car_models (stock_totals.py): đọc một dòng theo khóa chính
+    total_stock = stock_totals.total_stock(car_id)
     
     is_available = total_stock >= required_quantity
     
@@ -143,14 +300,290 @@ def check_inventory():
         "required": required_quantity
     }), 200 
 
+# Số dòng tối đa của một yêu cầu báo giá (giữ truy vấn IN trong giới hạn tham số của SQLite)
+MAX_QUOTE_ITEMS = 500
+
+def parse_quote_items(data):
+    """[{"car_id", "quantity"}] -> [(car_id, quantity)]; ném ValueError nếu không hợp lệ."""
+    items = (data or {}).get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError("Thiếu danh sách items")
+    if len(items) > MAX_QUOTE_ITEMS:
+        raise ValueError(f"Tối đa {MAX_QUOTE_ITEMS} dòng mỗi yêu cầu")
+    pairs = []
+    for item in items:
+        try:
+            car_id = int(item['car_id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Mỗi dòng cần car_id và quantity là số nguyên")
+        if quantity < 1:
+            raise ValueError("quantity phải >= 1")
+        pairs.append((car_id, quantity))
+    return pairs
+
+@app.route('/api/v1/inventory/quote', methods=['POST'])
+def quote_inventory():
+    """
+    Báo giá và kiểm tra tồn kho cho cả giỏ hàng trong một truy vấn (tổng tồn kho duy trì sẵn trên car_models).
+    Kết quả giữ đúng thứ tự đầu vào; car_id không tồn tại có found = false.
+    Một mẫu xe xuất hiện ở nhiều dòng được kiểm tra tồn kho theo tổng số lượng của các dòng đó.
+    """
+    try:
+        pairs = parse_quote_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    car_ids = {car_id for car_id, _ in pairs}
+    rows = db.session.query(CarModel.id, CarModel.base_price, CarModel.total_stock).filter(
+        CarModel.id.in_(car_ids)
+    ).all()
+    cars = {car_id: (base_price, stock) for car_id, base_price, stock in rows}
+
+    requested = {}
+    for car_id, quantity in pairs:
+        requested[car_id] = requested.get(car_id, 0) + quantity
+
+    items = []
+    for car_id, quantity in pairs:
+        if car_id not in cars:
+            items.append({"car_id": car_id, "quantity": quantity, "found": False, "unit_price": None,
+                          "available_stock": 0, "is_available": False, "subtotal": None})
+            continue
+        base_price, stock = cars[car_id]
+        items.append({
+            "car_id": car_id,
+            "quantity": quantity,
+            "found": True,
+            "unit_price": base_price,
+            "available_stock": stock,
+            "is_available": stock >= requested[car_id],
+            "subtotal": base_price * quantity,
+        })
+
+    return jsonify({
+        "items": items,
+        "all_available": all(item["is_available"] for item in items),
+        "unknown_car_ids": sorted(car_ids - cars.keys()),
+        "total_amount": sum(item["subtotal"] or 0 for item in items),
+    }), 200
+
+def parse_car_id(args):
+    try:
+        return int(args['car_id'])
+    except (KeyError, ValueError):
+        raise ValueError("Thiếu car_id hoặc car_id không phải số nguyên")
+
+@app.route('/api/v1/inventory/locations', methods=['GET'])
+def stock_by_location():
+    """
+    Tồn kho của ?car_id= tại từng ?location= (lặp lại được), hoặc tại mọi đại lý còn xe nếu không chỉ định.
+    Đọc từ ảnh chụp trong bộ nhớ (location_stock.py), không quét bảng inventory.
+    """
+    try:
+        car_id = parse_car_id(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    locations = request.args.getlist('location') or None
+    stock = LOCATION_STOCK.stock(db.session, car_id, locations)
+    if stock is None:
+        return jsonify({"message": "Mẫu xe không tồn tại"}), 404
+    return Response(encode_json({
+        "car_id": car_id,
+        "locations": [{"dealer_location": location, "stock_quantity": quantity} for location, quantity in stock],
+        "total": sum(quantity for _, quantity in stock),
+    }), mimetype='application/json')
+
+def parse_nearest(args):
+    """?car_id=&location= (hoặc ?lat=&lon=)&quantity=&limit= -> (car_id, tên hoặc tọa độ, quantity, limit)."""
+    car_id = parse_car_id(args)
+    try:
+        quantity = int(args.get('quantity', 1))
+        limit = min(max(int(args.get('limit', location_stock.DEFAULT_NEAREST_LIMIT)), 1),
+                    location_stock.MAX_NEAREST_LIMIT)
+        origin = args.get('location') or (float(args['lat']), float(args['lon']))
+    except KeyError:
+        raise ValueError("Cần location hoặc lat và lon")
+    except ValueError:
+        raise ValueError("quantity, limit phải là số nguyên; lat, lon phải là số")
+    if quantity < 1:
+        raise ValueError("quantity phải >= 1")
+    if not isinstance(origin, str) and not (-90 <= origin[0] <= 90 and -180 <= origin[1] <= 180):
+        raise ValueError("lat phải trong [-90, 90], lon trong [-180, 180]")
+    return car_id, origin, quantity, limit
+
+@app.route('/api/v1/inventory/nearest', methods=['GET'])
+def nearest_stock():
+    """Các đại lý gần ?location= (tên đại lý) hoặc ?lat=&lon= nhất còn ít nhất ?quantity= xe ?car_id=."""
+    try:
+        car_id, origin, quantity, limit = parse_nearest(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if isinstance(origin, str):
+        name, origin = origin, LOCATION_STOCK.coordinates(db.session).get(origin)
+        if origin is None:
+            return jsonify({"message": f"Chưa có tọa độ của đại lý {name}"}), 404
+    dealers = LOCATION_STOCK.nearest(db.session, car_id, origin, quantity, limit)
+    if dealers is None:
+        return jsonify({"message": "Mẫu xe không tồn tại"}), 404
+    return Response(encode_json({
+        "car_id": car_id,
+        "origin": {"latitude": origin[0], "longitude": origin[1]},
+        "quantity": quantity,
+        "dealers": [{"dealer_location": location, "distance_km": round(distance, 1), "stock_quantity": available}
+                    for location, distance, available in dealers],
+    }), mimetype='application/json')
+
+def parse_reservation(data):
+    """Body của POST /inventory/reservations -> tham số của reservations.reserve; ném ValueError nếu không hợp lệ."""
+    data = data or {}
+    try:
+        car_id = int(data['car_id'])
+        quantity = int(data.get('quantity', 1))
+        ttl_seconds = int(data.get('ttl_seconds', reservations.DEFAULT_TTL_SECONDS))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Cần car_id, quantity và ttl_seconds là số nguyên")
+    if quantity < 1:
+        raise ValueError("quantity phải >= 1")
+    if not 1 <= ttl_seconds <= reservations.MAX_TTL_SECONDS:
+        raise ValueError(f"ttl_seconds phải trong khoảng 1..{reservations.MAX_TTL_SECONDS}")
+    return {
+        "car_id": car_id,
+        "quantity": quantity,
+        "ttl_seconds": ttl_seconds,
+        "location": data.get('location'),
+        "policy": data.get('policy', reservations.DEFAULT_POLICY),
+    }
+
+def reservation_response(action, status_code=200):
+    """Chạy action(connection) trong một transaction, commit khi thành công và trả JSON của giữ chỗ."""
+    try:
+        result = action(db.session.connection())
+        db.session.commit()
+    except reservations.ReservationError as e:
+        # Hết hạn được phát hiện lúc commit: vẫn lưu việc trả kho trước khi báo lỗi
+        db.session.commit()
+        return jsonify({"message": str(e)}), e.status_code
+    return jsonify(result), status_code
+
+@app.route('/api/v1/inventory/reservations', methods=['POST'])
+def create_reservation():
+    """
+    Giữ chỗ tồn kho: {"car_id", "quantity", "location"?, "policy"?, "ttl_seconds"?}.
+    201 kèm reservation_id và đại lý được chọn; 409 nếu không đại lý nào đủ hàng.
+    """
+    try:
+        params = parse_reservation(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    def action(connection):
+        reservations.maybe_expire(connection)
+        return reservations.reserve(connection, **params)
+    return reservation_response(action, 201)
+
+@app.route('/api/v1/inventory/reservations/<int:reservation_id>', methods=['GET'])
+def get_reservation(reservation_id):
+    return reservation_response(lambda connection: reservations.as_dict(reservations.get(connection, reservation_id)))
+
+@app.route('/api/v1/inventory/reservations/<int:reservation_id>/commit', methods=['POST'])
+def commit_reservation(reservation_id):
+    """Xác nhận giữ chỗ còn hạn (kho đã trừ được giữ nguyên); 409 nếu đã hết hạn hoặc đã hủy."""
+    return reservation_response(lambda connection: reservations.commit(connection, reservation_id))
+
+@app.route('/api/v1/inventory/reservations/<int:reservation_id>/release', methods=['POST'])
+def release_reservation(reservation_id):
+    """Hủy giữ chỗ và trả lại kho; 409 nếu giữ chỗ đã được xác nhận."""
+    return reservation_response(lambda connection: reservations.release(connection, reservation_id))
+
+@app.cli.command('expire-reservations')
+def expire_reservations():
+    """Trả lại kho cho mọi giữ chỗ pending đã quá hạn (có thể chạy định kỳ bằng cron)."""
+    upgrade_schema()
+    expired = reservations.expire(db.session.connection())
+    db.session.commit()
+    print(f"Đã hủy {expired} giữ chỗ hết hạn.")
+
+def parse_change_filters(args):
+    """?entity=&car_id=&limit= của luồng thay đổi; ném ValueError nếu không hợp lệ."""
+    entity = args.get('entity')
+    if entity and entity not in change_feed.ENTITIES:
+        raise ValueError(f"entity phải là một trong {list(change_feed.ENTITIES)}")
+    try:
+        car_id = int(args['car_id']) if args.get('car_id') else None
+        limit = min(max(int(args.get('limit', change_feed.DEFAULT_LIMIT)), 1), change_feed.MAX_LIMIT)
+    except ValueError:
+        raise ValueError("car_id và limit phải là số nguyên")
+    return {"entity": entity, "car_id": car_id, "limit": limit}
+
+def parse_cursor(raw):
+    """Con trỏ của client (seq của thay đổi cuối đã nhận); None nếu client chưa có con trỏ."""
+    if raw in (None, ''):
+        return None
+    try:
+        cursor = int(raw)
+    except ValueError:
+        raise ValueError("cursor phải là số nguyên")
+    if cursor < 0:
+        raise ValueError("cursor phải >= 0")
+    return cursor
+
+@app.route('/api/v1/catalog/changes', methods=['GET'])
+def list_changes():
+    """
+    Long-poll các thay đổi CarModel/Inventory sau ?cursor= (chờ tối đa ?wait= giây nếu chưa có).
+    Không có cursor: bắt đầu từ thay đổi mới nhất. 410 nếu cursor trỏ vào phần nhật ký đã bị xóa.
+    """
+    try:
+        filters = parse_change_filters(request.args)
+        cursor = parse_cursor(request.args.get('cursor'))
+        wait = min(max(float(request.args.get('wait', 0)), 0), change_feed.MAX_WAIT_SECONDS)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if cursor is None:
+        cursor = change_feed.latest_cursor(db.session)
+    elif change_feed.is_expired(db.session, cursor):
+        return jsonify({"message": "cursor đã hết hạn, hãy tải lại danh mục",
+                        "cursor": change_feed.latest_cursor(db.session)}), 410
+
+    changes, next_cursor = change_feed.wait_for_changes(db.session, cursor, wait, **filters)
+    return Response(encode_json({"changes": changes, "cursor": next_cursor,
+                                 "has_more": len(changes) == filters["limit"]}), mimetype='application/json')
+
+@app.route('/api/v1/catalog/changes/stream', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events: đẩy từng thay đổi ngay khi commit; tiếp tục từ Last-Event-ID (hoặc ?cursor=)."""
+    try:
+        filters = parse_change_filters(request.args)
+        cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if cursor is None:
+        cursor = change_feed.latest_cursor(db.session)
+    db.session.rollback()
+    return Response(stream_with_context(change_feed.stream(db.session, cursor, **filters)),
+                    mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+
+@app.cli.command('prune-changes')
+@click.option('--keep-days', default=7, show_default=True, help='Giữ nhật ký thay đổi trong số ngày này.')
+def prune_changes(keep_days):
+    """Xóa nhật ký thay đổi cũ; client có con trỏ cũ hơn sẽ nhận 410/reset và tải lại danh mục."""
+    upgrade_schema()
+    deleted = change_feed.prune(db.session, keep_days)
+    db.session.commit()
+    print(f"Đã xóa {deleted} thay đổi cũ hơn {keep_days} ngày.")
+
 if __name__ == '__main__':
     # THỰC HIỆN XÓA FILE DB VÀ TẠO MỚI TRONG APPLICATION CONTEXT
     with app.app_context():
-        db_path = 'catalog_service_v3.db'
-        
+        # Flask-SQLAlchemy đặt file SQLite có đường dẫn tương đối trong app.instance_path, không phải thư mục hiện tại
+        db_path = db.engine.url.database if db.engine.url.get_backend_name() == 'sqlite' else None
+
         # Xóa file DB cũ
-        if os.path.exists(db_path):
-             os.remove(db_path) 
+        if db_path and os.path.exists(db_path):
+            db.engine.dispose()
+            os.remove(db_path)
              
         # Tạo DB và dữ liệu mới
         create_demo_data(CARS_DATA_DEMO)
@@ -0,0 +1,338 @@
+# catalog-service/bulk_import.py
+# Nạp danh mục hàng loạt từ CSV/JSONL (lệnh: flask --app app import-catalog FILE --kind models|inventory)
+#   - đọc file theo từng lô (batch_size dòng), không bao giờ giữ cả file trong bộ nhớ
+#   - mỗi lô là một câu INSERT nhiều dòng (executemany), commit sau mỗi commit_every dòng: vài transaction
+#     cho cả file thay vì một commit cho mỗi mẫu xe
+#   - models: upsert theo model_name (INSERT ... ON CONFLICT(model_name) DO UPDATE); cột tùy chọn để trống
+#     thì giữ giá trị cũ
+#   - inventory: (model_name hoặc car_id, dealer_location, stock_quantity); upsert theo (car_model_id,
+#     dealer_location) (chỉ mục unique uq_inventory_model_location). car_models.total_stock do trigger
+#     cập nhật (stock_totals.py)
+#   - dealers: (dealer_location, latitude, longitude); upsert tọa độ đại lý theo tên (tìm đại lý gần nhất,
+#     location_stock.py)
+#   - ghi qua session (câu lệnh Core) nên cache JSON của danh mục vẫn bị bỏ sau mỗi commit (catalog_cache.py);
+#     chỉ mục tìm kiếm được dựng lại một lần sau khi nạp models (search.bulk_indexing ở app.py)
+
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from database import CarModel, DealerLocation, Inventory, Reservation
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_COMMIT_EVERY = 200000
+FORMATS = ('csv', 'jsonl')
+KINDS = ('models', 'inventory', 'dealers')
+
+car_models = CarModel.__table__
+inventory = Inventory.__table__
+dealers = DealerLocation.__table__
+reservations = Reservation.__table__
+MODEL_LOCATION_INDEX = next(index for index in inventory.indexes if index.name == 'uq_inventory_model_location')
+
+
+class ImportRowError(ValueError):
+    """Một dòng không hợp lệ; line là số dòng trong file (dòng tiêu đề CSV là dòng 1)."""
+
+    def __init__(self, line, message):
+        super().__init__(f"Dòng {line}: {message}")
+        self.line = line
+
+
+def ensure_schema(connection):
+    """DB tạo trước khi có uq_inventory_model_location: gộp các dòng tồn kho trùng đại lý rồi tạo chỉ mục."""
+    if not inspect(connection).has_table(inventory.name) or connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"),
+            {"name": MODEL_LOCATION_INDEX.name}).first():
+        return
+    merged = merge_duplicate_inventory(connection)
+    if merged:
+        print(f"Đã gộp {merged} dòng tồn kho trùng mẫu xe/đại lý trước khi tạo {MODEL_LOCATION_INDEX.name}.")
+    MODEL_LOCATION_INDEX.create(connection, checkfirst=True)
+
+
+def merge_duplicate_inventory(connection):
+    """
+    Gộp các dòng inventory cùng (car_model_id, dealer_location) vào dòng có id nhỏ nhất (cộng stock_quantity,
+    chuyển giữ chỗ sang dòng được giữ lại); trả về số dòng đã xóa. total_stock do trigger cập nhật.
+    """
+    duplicates = connection.execute(
+        select(inventory.c.car_model_id, inventory.c.dealer_location, func.min(inventory.c.id),
+               func.sum(inventory.c.stock_quantity))
+        # Chỉ mục unique của SQLite coi các NULL là khác nhau: dòng chưa có đại lý không cần gộp
+        .where(inventory.c.dealer_location.is_not(None))
+        .group_by(inventory.c.car_model_id, inventory.c.dealer_location)
+        .having(func.count() > 1)
+    ).all()
+    has_reservations = inspect(connection).has_table(reservations.name)
+    removed = 0
+    for car_id, location, keep_id, quantity in duplicates:
+        others = select(inventory.c.id).where(
+            inventory.c.car_model_id == car_id, inventory.c.dealer_location == location, inventory.c.id != keep_id)
+        if has_reservations:
+            connection.execute(reservations.update().where(reservations.c.inventory_id.in_(others))
+                               .values(inventory_id=keep_id))
+        connection.execute(inventory.update().where(inventory.c.id == keep_id).values(stock_quantity=quantity))
+        removed += connection.execute(inventory.delete().where(inventory.c.id.in_(others))).rowcount
+    return removed
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    raise ValueError(f"Không nhận ra định dạng của {path} (cần .csv hoặc .jsonl)")
+
+
+def read_rows(path, file_format=None):
+    """Sinh (số dòng, dict) từ file CSV (có dòng tiêu đề) hoặc JSONL, đọc tuần tự từng dòng."""
+    file_format = file_format or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'csv':
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+            return
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                raise ImportRowError(line, f"JSON không hợp lệ ({e})")
+            if not isinstance(row, dict):
+                raise ImportRowError(line, "mỗi dòng JSONL phải là một object")
+            yield line, row
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _int(line, row, key, required=True):
+    value = row.get(key)
+    if value is None or str(value).strip() == '':
+        if required:
+            raise ImportRowError(line, f"thiếu {key}")
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(line, f"{key} phải là số nguyên")
+    if number < 0:
+        raise ImportRowError(line, f"{key} phải >= 0")
+    return number
+
+
+def model_row(line, row):
+    """Dòng file -> tham số INSERT car_models."""
+    model_name = _text(row, 'model_name')
+    if not model_name:
+        raise ImportRowError(line, "thiếu model_name")
+    specs = row.get('specs')
+    if isinstance(specs, (dict, list)):
+        specs = json.dumps(specs, ensure_ascii=False)
+    else:
+        specs = _text(row, 'specs')
+        if specs is not None:
+            try:
+                json.loads(specs)
+            except ValueError:
+                raise ImportRowError(line, "specs phải là JSON")
+    return {
+        "model_name": model_name,
+        "base_price": _int(line, row, 'base_price'),
+        "description": _text(row, 'description'),
+        "specs": specs,
+        "image_url": _text(row, 'image_url'),
+    }
+
+
+def inventory_row(line, row):
+    """Dòng file -> (khóa mẫu xe, dealer_location, stock_quantity); khóa là car_id (int) hoặc model_name."""
+    car_id = _int(line, row, 'car_id', required=False)
+    key = car_id if car_id is not None else _text(row, 'model_name')
+    if key is None:
+        raise ImportRowError(line, "cần car_id hoặc model_name")
+    location = _text(row, 'dealer_location')
+    if not location:
+        raise ImportRowError(line, "thiếu dealer_location")
+    return key, location, _int(line, row, 'stock_quantity')
+
+
+def _coordinate(line, row, key, limit):
+    value = row.get(key)
+    if value is None or str(value).strip() == '':
+        raise ImportRowError(line, f"thiếu {key}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(line, f"{key} phải là số")
+    if not -limit <= number <= limit:
+        raise ImportRowError(line, f"{key} phải trong khoảng [-{limit}, {limit}]")
+    return number
+
+
+def dealer_row(line, row):
+    """Dòng file -> tham số INSERT dealer_locations."""
+    name = _text(row, 'dealer_location')
+    if not name:
+        raise ImportRowError(line, "thiếu dealer_location")
+    return {"name": name, "latitude": _coordinate(line, row, 'latitude', 90),
+            "longitude": _coordinate(line, row, 'longitude', 180)}
+
+
+def upsert_models_statement():
+    """INSERT car_models ... ON CONFLICT(model_name) DO UPDATE; cột tùy chọn rỗng giữ giá trị cũ."""
+    statement = insert(car_models)
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[car_models.c.model_name],
+        set_={
+            "base_price": excluded.base_price,
+            "description": func.coalesce(excluded.description, car_models.c.description),
+            "specs": func.coalesce(excluded.specs, car_models.c.specs),
+            "image_url": func.coalesce(excluded.image_url, car_models.c.image_url),
+        },
+    )
+
+
+def write_models(session, batch):
+    """Upsert một lô mẫu xe; trả về số dòng bị bỏ qua (luôn 0)."""
+    # Một model_name xuất hiện nhiều lần trong cùng lô: dòng sau cùng thắng (như khi ở hai lô khác nhau)
+    session.execute(upsert_models_statement(), list({row["model_name"]: row for row in batch}.values()))
+    return 0
+
+
+def upsert_inventory_statement():
+    """INSERT inventory ... ON CONFLICT(car_model_id, dealer_location) DO UPDATE SET stock_quantity."""
+    statement = insert(inventory)
+    return statement.on_conflict_do_update(
+        index_elements=[inventory.c.car_model_id, inventory.c.dealer_location],
+        set_={"stock_quantity": statement.excluded.stock_quantity},
+    )
+
+
+def write_dealers(session, batch):
+    """Upsert một lô tọa độ đại lý theo tên; trả về số dòng bị bỏ qua (luôn 0)."""
+    statement = insert(dealers)
+    statement = statement.on_conflict_do_update(
+        index_elements=[dealers.c.name],
+        set_={"latitude": statement.excluded.latitude, "longitude": statement.excluded.longitude},
+    )
+    session.execute(statement, list({row["name"]: row for row in batch}.values()))
+    return 0
+
+
+class InventoryWriter:
+    """Upsert từng lô inventory; nhớ model_name -> id đã tra để không tra lại ở các lô sau."""
+
+    def __init__(self, session, skip_invalid=False):
+        self.session = session
+        self.skip_invalid = skip_invalid
+        self.car_ids = {}
+
+    def resolve(self, keys):
+        names = [key for key in keys if isinstance(key, str) and key not in self.car_ids]
+        if names:
+            self.car_ids.update(self.session.execute(
+                select(car_models.c.model_name, car_models.c.id).where(car_models.c.model_name.in_(names))
+            ).all())
+        ids = [key for key in keys if isinstance(key, int) and key not in self.car_ids]
+        if ids:
+            found = self.session.execute(select(car_models.c.id).where(car_models.c.id.in_(ids))).scalars()
+            self.car_ids.update((car_id, car_id) for car_id in found)
+
+    def write(self, batch):
+        """batch: [(line, key, location, quantity)]; trả về số dòng bị bỏ qua (mẫu xe không tồn tại)."""
+        self.resolve({key for _, key, _, _ in batch})
+        wanted = {}
+        skipped = 0
+        for line, key, location, quantity in batch:
+            car_id = self.car_ids.get(key)
+            if car_id is None:
+                if not self.skip_invalid:
+                    raise ImportRowError(line, f"không tìm thấy mẫu xe {key!r}")
+                skipped += 1
+                continue
+            wanted[(car_id, location)] = quantity
+        if wanted:
+            self.session.execute(upsert_inventory_statement(), [
+                {"car_model_id": car_id, "dealer_location": location, "stock_quantity": quantity}
+                for (car_id, location), quantity in wanted.items()
+            ])
+        return skipped
+
+
+def import_rows(session, rows, kind, batch_size=DEFAULT_BATCH_SIZE, commit_every=DEFAULT_COMMIT_EVERY,
+                skip_invalid=False):
+    """
+    Nạp các (số dòng, dict) của rows vào car_models, inventory hoặc dealer_locations theo lô, commit sau mỗi commit_every dòng.
+    Dòng lỗi: ném ImportRowError (phần chưa commit bị rollback), hoặc bỏ qua và đếm nếu skip_invalid.
+    Trả về thống kê {"rows", "inserted", "updated", "skipped", "transactions", "seconds"}.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind phải là một trong {KINDS}")
+    parse, table = {'models': (model_row, car_models), 'inventory': (inventory_row, inventory),
+                    'dealers': (dealer_row, dealers)}[kind]
+    stats = {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "transactions": 0}
+    started = time.perf_counter()
+    # Số dòng mới = chênh lệch số dòng của bảng (đếm hai lần cho cả file thay vì tra từng lô)
+    count_rows = select(func.count()).select_from(table)
+    rows_before = session.execute(count_rows).scalar()
+    if kind == 'models':
+        write = lambda batch: write_models(session, batch)
+    elif kind == 'dealers':
+        write = lambda batch: write_dealers(session, batch)
+    else:
+        write = InventoryWriter(session, skip_invalid).write
+    uncommitted = 0
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line, row in chunk:
+                try:
+                    parsed = parse(line, row)
+                except ImportRowError:
+                    if not skip_invalid:
+                        raise
+                    stats["skipped"] += 1
+                    continue
+                batch.append((line, *parsed) if kind == 'inventory' else parsed)
+            if batch:
+                skipped = write(batch)
+                stats["skipped"] += skipped
+                stats["rows"] += len(batch) - skipped
+            uncommitted += len(chunk)
+            if uncommitted >= commit_every:
+                session.commit()
+                stats["transactions"] += 1
+                uncommitted = 0
+        stats["inserted"] = session.execute(count_rows).scalar() - rows_before
+        stats["updated"] = stats["rows"] - stats["inserted"]
+        session.commit()
+        stats["transactions"] += 1
+    except Exception:
+        session.rollback()
+        raise
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def import_file(session, path, kind, file_format=None, **options):
+    """import_rows cho một file CSV/JSONL (định dạng đoán theo đuôi file nếu không chỉ định)."""
+    return import_rows(session, read_rows(path, file_format), kind, **options)
@@ -0,0 +1,118 @@
+# catalog-service/catalog_cache.py
+# Cache byte JSON đã mã hóa sẵn cho GET /catalog/cars và /catalog/cars/<id>
+#   - danh mục gần như không đổi: mỗi phiên bản chỉ truy vấn + to_dict() + dumps một lần
+#   - mọi commit có thay đổi CarModel/Inventory làm tăng số phiên bản và bỏ cache (sự kiện SQLAlchemy)
+#   - ETag gắn với phiên bản, nên Gateway xác thực lại (If-None-Match) mà không phải so sánh body
+
+import secrets
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import CarModel, Inventory
+
+CATALOG_MODELS = (CarModel, Inventory)
+CATALOG_TABLES = (CarModel.__table__, Inventory.__table__)
+_DIRTY_KEY = 'catalog_changed'
+
+
+class CatalogCache:
+    """
+    Byte JSON của danh sách xe và của từng xe cho phiên bản danh mục hiện tại.
+    Phiên bản có tiền tố ngẫu nhiên theo tiến trình: ETag cũ không khớp nhầm sau khi dịch vụ khởi động lại.
+    """
+
+    def __init__(self):
+        self._boot = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self.version = 1
+        self._list = None
+        self._cars = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def etag(self, key, version):
+        return f"{key}-{self._boot}-{version}"
+
+    def invalidate(self):
+        """Danh mục đã đổi: tăng phiên bản, bỏ toàn bộ byte đã mã hóa."""
+        with self._lock:
+            self.version += 1
+            self._list = None
+            self._cars = {}
+            self.invalidations += 1
+
+    def _get(self, lookup, build, store):
+        with self._lock:
+            cached = lookup()
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+            version = self.version
+        body = build()
+        if body is None:
+            return None
+        entry = (body, version)
+        with self._lock:
+            # Danh mục đổi trong lúc đang dựng: vẫn trả kết quả nhưng không lưu byte của phiên bản cũ
+            if version == self.version:
+                store(entry)
+        return entry
+
+    def car_list(self, build):
+        """(body, phiên bản) của danh sách xe; build() trả về byte JSON khi cache trống."""
+        return self._get(lambda: self._list, build, lambda entry: setattr(self, '_list', entry))
+
+    def car(self, car_id, build):
+        """(body, phiên bản) của một xe; build() trả về None nếu xe không tồn tại (không cache)."""
+        return self._get(lambda: self._cars.get(car_id), build,
+                         lambda entry: self._cars.__setitem__(car_id, entry))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "cached_cars": len(self._cars),
+                "list_cached": self._list is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+def mark_changed(session):
+    """Đánh dấu transaction hiện tại có thay đổi danh mục (dùng khi ghi bằng SQL thuần)."""
+    session.info[_DIRTY_KEY] = True
+
+
+def watch_changes(cache):
+    """Bỏ cache sau mỗi commit có thêm/sửa/xóa CarModel hoặc Inventory (kể cả update/delete theo lô)."""
+
+    @event.listens_for(Session, 'after_flush')
+    def record_flush(session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, CATALOG_MODELS):
+                mark_changed(session)
+                return
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def record_bulk(orm_execute_state):
+        if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+            # Câu lệnh ORM (update(CarModel)...) hoặc Core (Inventory.__table__.insert())
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if table in CATALOG_TABLES or any(mapper.class_ in CATALOG_MODELS
+                                              for mapper in orm_execute_state.all_mappers):
+                mark_changed(orm_execute_state.session)
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_version(session):
+        if session.info.pop(_DIRTY_KEY, False):
+            cache.invalidate()
+
+    @event.listens_for(Session, 'after_rollback')
+    def discard_changes(session):
+        session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,149 @@
+# catalog-service/catalog_query.py
+# Lọc, sắp xếp và phân trang theo con trỏ (keyset) cho GET /api/v1/catalog/cars
+#   ?min_price=&max_price=            khoảng giá base_price
+#   ?motor_type=Điện                  specs.motor_type (có index biểu thức json_extract)
+#   ?spec.color=Trắng                 trường bất kỳ khác trong specs
+#   ?sort=price | -price | name | -name | id | -id
+#   ?limit=50&cursor=<next_cursor>    trang tiếp theo bắt đầu ngay sau bản ghi cuối của trang trước
+# Trang tiếp theo không dùng OFFSET: WHERE (cột sắp xếp, id) > (giá trị cuối, id cuối) đi thẳng vào index,
+# nên chi phí mỗi trang không tăng theo kích thước bảng hay số trang đã đọc.
+
+import base64
+import json
+import re
+
+from sqlalchemy import func, inspect, literal_column, tuple_
+from sqlalchemy.schema import CreateIndex
+
+from database import CarModel
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SORT_COLUMNS = {
+    'id': CarModel.id,
+    'price': CarModel.base_price,
+    'name': CarModel.model_name,
+}
+
+# Tham số của truy vấn phân trang (request không có tham số nào trong số này trả toàn bộ danh mục)
+QUERY_PARAMS = ('min_price', 'max_price', 'motor_type', 'sort', 'limit', 'cursor')
+SPEC_PREFIX = 'spec.'
+SPEC_FIELD = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def ensure_schema(connection):
+    """DB tạo trước khi có phân trang theo con trỏ: tạo các chỉ mục (giá, id) và (loại động cơ, giá, id)."""
+    if not inspect(connection).has_table(CarModel.__tablename__):
+        return  # Chưa có bảng: db.create_all() sẽ tạo cả chỉ mục
+    # IF NOT EXISTS thay cho checkfirst: SQLAlchemy không đọc lại được chỉ mục biểu thức (json_extract) của SQLite
+    for index in CarModel.__table__.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+class QueryError(ValueError):
+    """Tham số truy vấn không hợp lệ (trả 400)."""
+
+
+def spec_field(name):
+    """
+    json_extract(specs, '$.<name>'). Đường dẫn được viết thẳng vào SQL (tên trường đã kiểm tra bằng regex)
+    vì SQLite chỉ dùng index biểu thức khi biểu thức trong truy vấn giống hệt biểu thức của index.
+    """
+    if not SPEC_FIELD.match(name):
+        raise QueryError(f"Tên trường specs không hợp lệ: {name}")
+    return func.json_extract(CarModel.specs, literal_column(f"'$.{name}'"))
+
+
+def is_paginated(args):
+    return any(key in args for key in QUERY_PARAMS) or any(key.startswith(SPEC_PREFIX) for key in args)
+
+
+def encode_cursor(sort, value, last_id):
+    raw = json.dumps([sort, value, last_id], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise QueryError("cursor không hợp lệ")
+    if cursor_sort != sort or not isinstance(last_id, int):
+        raise QueryError("cursor không thuộc thứ tự sắp xếp này")
+    return value, last_id
+
+
+def parse_int(args, name, minimum=None):
+    raw = args.get(name)
+    if raw is None:
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise QueryError(f"{name} phải là số nguyên")
+    if minimum is not None and value < minimum:
+        raise QueryError(f"{name} phải >= {minimum}")
+    return value
+
+
+def build_query(query, args):
+    """
+    Áp dụng bộ lọc, thứ tự và con trỏ lên query.
+    Trả về (query đã giới hạn limit + 1 bản ghi, limit, tên cột sắp xếp); ném QueryError nếu tham số sai.
+    """
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    column = SORT_COLUMNS.get(sort.lstrip('-'))
+    if column is None:
+        raise QueryError(f"sort phải là một trong: {', '.join(SORT_COLUMNS)} (thêm '-' để giảm dần)")
+
+    limit = parse_int(args, 'limit', 1)
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    cursor = args.get('cursor')
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    min_price = parse_int(args, 'min_price', 0)
+    max_price = parse_int(args, 'max_price', 0)
+    # Khi sắp xếp theo giá, con trỏ đã là cận chặt hơn cận giá cùng phía; bỏ cận giá đó để SQLite
+    # dùng con trỏ làm điểm bắt đầu quét index thay vì quét lại từ min_price
+    if min_price is not None and not (after and column is CarModel.base_price and not descending):
+        query = query.filter(CarModel.base_price >= min_price)
+    if max_price is not None and not (after and column is CarModel.base_price and descending):
+        query = query.filter(CarModel.base_price <= max_price)
+
+    if 'motor_type' in args:
+        query = query.filter(spec_field('motor_type') == args['motor_type'])
+    for key, value in args.items():
+        if key.startswith(SPEC_PREFIX):
+            query = query.filter(spec_field(key[len(SPEC_PREFIX):]) == value)
+
+    # Khóa sắp xếp luôn kèm id để thứ tự là duy nhất, con trỏ không bỏ sót hay lặp bản ghi
+    if after:
+        value, last_id = after
+        if column is CarModel.id:
+            key, bound = CarModel.id, last_id
+        else:
+            key, bound = tuple_(column, CarModel.id), tuple_(value, last_id)
+        query = query.filter(key < bound if descending else key > bound)
+
+    if descending:
+        query = query.order_by(column.desc(), CarModel.id.desc())
+    else:
+        query = query.order_by(column, CarModel.id)
+    return query.limit(limit + 1), limit, sort
+
+
+def page(query, args):
+    """Một trang kết quả: {"items", "limit", "next_cursor"} (next_cursor là None ở trang cuối)."""
+    query, limit, sort = build_query(query, args)
+    cars = query.all()
+    next_cursor = None
+    if len(cars) > limit:
+        cars = cars[:limit]
+        last = cars[-1]
+        column = SORT_COLUMNS[sort.lstrip('-')]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+    return {"items": [car.to_dict() for car in cars], "limit": limit, "next_cursor": next_cursor}
@@ -0,0 +1,216 @@
+# catalog-service/change_feed.py
+# Luồng thay đổi của danh mục: thay cho việc poll /catalog/cars và /inventory/check
+#   - trigger SQLite ghi mỗi thay đổi của car_models/inventory vào change_log (seq tăng dần) trong cùng transaction,
+#     nên mọi cách ghi (ORM, giữ chỗ, nạp hàng loạt, SQL thuần) đều có trong nhật ký, đúng thứ tự commit
+#   - UPDATE không đổi giá trị (ví dụ nạp lại cùng file tồn kho) và cột total_stock không được ghi nhật ký;
+#     dòng tồn kho đổi mẫu xe/đại lý được ghi thành delete (cặp cũ) + insert (cặp mới)
+#   - client đọc theo con trỏ (seq của thay đổi cuối đã nhận): chỉ trả tiền cho phần đã thay đổi
+#   - sau mỗi commit, request đang chờ (long-poll/SSE) được đánh thức ngay; thay đổi từ tiến trình khác
+#     (ví dụ lệnh import-catalog) được phát hiện bằng cách đọc lại sau tối đa POLL_INTERVAL_SECONDS
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import DDL, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database import ChangeLog, db
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Long-poll chờ tối đa MAX_WAIT_SECONDS, dưới UPSTREAM_TIMEOUT (10s) của Gateway
+MAX_WAIT_SECONDS = 8
+# SSE gửi dòng chú thích giữ kết nối khi không có thay đổi (cũng dưới timeout đọc của Gateway)
+HEARTBEAT_SECONDS = 5
+POLL_INTERVAL_SECONDS = 1
+ENTITIES = ('car_model', 'inventory')
+
+changes = ChangeLog.__table__
+
+_INVENTORY_JSON = "json_object('dealer_location', {row}.dealer_location, 'stock_quantity', {row}.stock_quantity)"
+_CAR_MODEL_JSON = (
+    "json_object('model_name', {row}.model_name, 'base_price', {row}.base_price, "
+    "'description', {row}.description, "
+    "'specs', CASE WHEN json_valid({row}.specs) THEN json({row}.specs) ELSE {row}.specs END, "
+    "'image_url', {row}.image_url)"
+)
+_CAR_MODEL_COLUMNS = ('model_name', 'base_price', 'description', 'specs', 'image_url')
+_INVENTORY_KEY = ('car_model_id', 'dealer_location')
+
+
+def _log(entity, op, row, data, car_id):
+    return (f"INSERT INTO change_log (entity, entity_id, car_model_id, op, data, changed_at) "
+            f"VALUES ('{entity}', {row}.id, {car_id}, '{op}', {data.format(row=row)}, CURRENT_TIMESTAMP);")
+
+
+def _changed(columns):
+    return ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+
+
+CHANGE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_inventory_insert AFTER INSERT ON inventory
+    BEGIN {_log('inventory', 'insert', 'NEW', _INVENTORY_JSON, 'NEW.car_model_id')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_inventory_update AFTER UPDATE ON inventory
+    WHEN NOT ({_changed(_INVENTORY_KEY)}) AND {_changed(('stock_quantity',))}
+    BEGIN {_log('inventory', 'update', 'NEW', _INVENTORY_JSON, 'NEW.car_model_id')} END
+    """,
+    # Đổi mẫu xe/đại lý: người đọc giữ tồn kho theo cặp (mẫu xe, đại lý) cần biết cả cặp cũ
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_inventory_move AFTER UPDATE ON inventory
+    WHEN {_changed(_INVENTORY_KEY)}
+    BEGIN
+        {_log('inventory', 'delete', 'OLD', _INVENTORY_JSON, 'OLD.car_model_id')}
+        {_log('inventory', 'insert', 'NEW', _INVENTORY_JSON, 'NEW.car_model_id')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_inventory_delete AFTER DELETE ON inventory
+    BEGIN {_log('inventory', 'delete', 'OLD', _INVENTORY_JSON, 'OLD.car_model_id')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_car_model_insert AFTER INSERT ON car_models
+    BEGIN {_log('car_model', 'insert', 'NEW', _CAR_MODEL_JSON, 'NEW.id')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_car_model_update AFTER UPDATE ON car_models
+    WHEN {_changed(_CAR_MODEL_COLUMNS)}
+    BEGIN {_log('car_model', 'update', 'NEW', _CAR_MODEL_JSON, 'NEW.id')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS change_log_car_model_delete AFTER DELETE ON car_models
+    BEGIN {_log('car_model', 'delete', 'OLD', _CAR_MODEL_JSON, 'OLD.id')} END
+    """,
+]
+
+_TRIGGER_NAME = re.compile(r'IF NOT EXISTS (\w+)')
+
+# DB mới: tạo trigger sau khi db.create_all() đã tạo đủ car_models, inventory và change_log
+for statement in CHANGE_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(statement))
+
+
+def ensure_schema(connection):
+    """DB tạo trước khi có nhật ký thay đổi: tạo bảng change_log; tạo lại trigger theo định nghĩa hiện tại."""
+    if not inspect(connection).has_table('inventory'):
+        return  # Chưa có bảng: db.create_all() sẽ tạo cả change_log và trigger
+    changes.create(connection, checkfirst=True)
+    for statement in CHANGE_TRIGGERS:
+        name = _TRIGGER_NAME.search(statement).group(1)
+        connection.execute(DDL(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(DDL(statement))
+
+
+class ChangeNotifier:
+    """Đánh thức các request đang chờ thay đổi sau mỗi commit trong tiến trình này."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    def notify(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def wait(self, generation, timeout):
+        """Chờ đến khi có commit sau thời điểm đọc được generation, hoặc hết timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._generation != generation, timeout)
+
+
+NOTIFIER = ChangeNotifier()
+
+
+def watch_commits(notifier=NOTIFIER):
+    """Mọi commit của session có thể đã ghi change_log (qua trigger): đánh thức người chờ để đọc lại."""
+
+    @event.listens_for(Session, 'after_commit')
+    def wake_waiters(session):
+        notifier.notify()
+
+
+def latest_cursor(session):
+    return session.execute(select(func.max(changes.c.seq))).scalar() or 0
+
+
+def oldest_cursor(session):
+    return session.execute(select(func.min(changes.c.seq))).scalar()
+
+
+def fetch(session, cursor, limit=DEFAULT_LIMIT, entity=None, car_id=None):
+    """
+    ([thay đổi (dict) có seq > cursor theo thứ tự, tối đa limit], con trỏ tiếp theo).
+    Con trỏ tiếp theo vượt qua cả các thay đổi bị bộ lọc bỏ qua, để lần đọc sau không quét lại chúng.
+    """
+    # Chỉ đọc đến seq lớn nhất đã commit tại thời điểm này (SQLite ghi tuần tự nên seq tăng theo thứ tự commit)
+    upper = latest_cursor(session)
+    query = select(ChangeLog).where(ChangeLog.seq > cursor, ChangeLog.seq <= upper)
+    if entity:
+        query = query.where(ChangeLog.entity == entity)
+    if car_id is not None:
+        query = query.where(ChangeLog.car_model_id == car_id)
+    # Chuyển sang dict ngay: rollback/commit sau đó làm hết hạn các đối tượng ORM
+    rows = [change.to_dict() for change in session.execute(query.order_by(ChangeLog.seq).limit(limit)).scalars()]
+    return rows, rows[-1]['cursor'] if len(rows) == limit else max(upper, cursor)
+
+
+def is_expired(session, cursor):
+    """Con trỏ trỏ vào phần nhật ký đã bị xóa: client phải tải lại toàn bộ danh mục rồi đọc tiếp từ latest."""
+    oldest = oldest_cursor(session)
+    return oldest is not None and cursor < oldest - 1
+
+
+def wait_for_changes(session, cursor, wait_seconds, notifier=NOTIFIER, **filters):
+    """
+    Long-poll: (các thay đổi sau cursor, con trỏ tiếp theo), chờ tối đa wait_seconds nếu chưa có.
+    Trả kết nối DB về pool trong lúc chờ để request chờ không giữ kết nối.
+    """
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        generation = notifier.generation
+        rows, cursor = fetch(session, cursor, **filters)
+        session.rollback()
+        remaining = deadline - time.monotonic()
+        if rows or remaining <= 0:
+            return rows, cursor
+        notifier.wait(generation, min(remaining, POLL_INTERVAL_SECONDS))
+
+
+def prune(session, keep_days):
+    """Xóa nhật ký cũ hơn keep_days (luôn giữ dòng mới nhất để biết con trỏ nào đã hết hạn)."""
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    result = session.execute(changes.delete().where(
+        changes.c.changed_at < cutoff, changes.c.seq < select(func.max(changes.c.seq)).scalar_subquery()))
+    return result.rowcount
+
+
+def sse_event(change):
+    """Một thay đổi -> sự kiện SSE; id là con trỏ để EventSource gửi lại trong Last-Event-ID khi kết nối lại."""
+    return (f"id: {change['cursor']}\nevent: {change['entity']}\n"
+            f"data: {json.dumps(change, ensure_ascii=False, separators=(',', ':'))}\n\n")
+
+
+def stream(session, cursor, **filters):
+    """Sinh các sự kiện SSE từ cursor trở đi; không có thay đổi thì gửi dòng chú thích giữ kết nối."""
+    yield f"retry: {POLL_INTERVAL_SECONDS * 1000}\n\n"
+    if is_expired(session, cursor):
+        # Nhật ký đã bị xóa bớt: client tải lại danh mục rồi nhận tiếp từ thay đổi mới nhất
+        cursor = latest_cursor(session)
+        yield f"event: reset\ndata: {json.dumps({'cursor': cursor})}\n\n"
+    while True:
+        rows, cursor = wait_for_changes(session, cursor, HEARTBEAT_SECONDS, **filters)
+        if not rows:
+            yield ": keepalive\n\n"
+        for change in rows:
+            yield sse_event(change)
+
@@ -1,13 +1,21 @@
 # catalog-service/database.py
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, literal_column
 import json
+from datetime import datetime
 
 db = SQLAlchemy()
 
 class CarModel(db.Model):
     """Mô hình chi tiết các mẫu xe VinFast."""
     __tablename__ = 'car_models'
+    __table_args__ = (
+        # Phân trang theo con trỏ (catalog_query.py): lọc/sắp xếp theo giá, và theo loại động cơ + giá
+        db.Index('ix_car_models_price_id', 'base_price', 'id'),
+        db.Index('ix_car_models_motor_type_price_id',
+                 func.json_extract(literal_column('specs'), literal_column("'$.motor_type'")), 'base_price', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True) 
     model_name = db.Column(db.String(100), unique=True, nullable=False)
@@ -15,6 +23,8 @@ class CarModel(db.Model):
     description = db.Column(db.Text)
     specs = db.Column(db.Text) 
     image_url = db.Column(db.String(255), nullable=True) # <-- Trường ảnh mới
+    # Tổng tồn kho của mẫu xe ở mọi đại lý, do trigger trên bảng inventory duy trì (xem stock_totals.py)
+    total_stock = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     inventory_items = db.relationship('Inventory', backref='car', lazy=True)
 
@@ -33,8 +43,75 @@ class CarModel(db.Model):
 class Inventory(db.Model):
     """Mô hình theo dõi tồn kho tại các đại lý/khu vực."""
     __tablename__ = 'inventory'
+    __table_args__ = (
+        # Mỗi mẫu xe một dòng tồn kho ở mỗi đại lý; nạp hàng loạt upsert theo cặp này (bulk_import.py)
+        db.Index('uq_inventory_model_location', 'car_model_id', 'dealer_location', unique=True),
+        # Tồn kho theo đại lý: nạp một phần của ảnh chụp tồn kho chỉ bằng quét chỉ mục (location_stock.py)
+        db.Index('ix_inventory_location_model', 'dealer_location', 'car_model_id', 'stock_quantity'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    car_model_id = db.Column(db.Integer, db.ForeignKey('car_models.id'), nullable=False) 
+    car_model_id = db.Column(db.Integer, db.ForeignKey('car_models.id'), nullable=False, index=True) 
     dealer_location = db.Column(db.String(100), default='Hà Nội')
-    stock_quantity = db.Column(db.Integer, default=0)
\ No newline at end of file
+    stock_quantity = db.Column(db.Integer, default=0)
+
+class DealerLocation(db.Model):
+    """Tọa độ của đại lý (trùng tên với Inventory.dealer_location), dùng để tìm đại lý gần nhất còn xe."""
+    __tablename__ = 'dealer_locations'
+
+    name = db.Column(db.String(100), primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+class Reservation(db.Model):
+    """Giữ chỗ tồn kho tại một đại lý: pending -> committed | released | expired (xem reservations.py)."""
+    __tablename__ = 'reservations'
+    __table_args__ = (
+        # Quét giữ chỗ hết hạn: status = 'pending' AND expires_at <= now
+        db.Index('ix_reservations_status_expires', 'status', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    car_model_id = db.Column(db.Integer, db.ForeignKey('car_models.id'), nullable=False)
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventory.id'), nullable=False)
+    dealer_location = db.Column(db.String(100))
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'reservation_id': self.id,
+            'car_id': self.car_model_id,
+            'dealer_location': self.dealer_location,
+            'quantity': self.quantity,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat(),
+        }
+
+class ChangeLog(db.Model):
+    """Nhật ký thay đổi CarModel/Inventory theo thứ tự seq, do trigger SQLite ghi (xem change_feed.py)."""
+    __tablename__ = 'change_log'
+    # AUTOINCREMENT: seq không bao giờ bị dùng lại kể cả sau khi xóa bớt nhật ký cũ
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # car_model | inventory
+    entity_id = db.Column(db.Integer, nullable=False)
+    car_model_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # insert | update | delete
+    data = db.Column(db.Text)  # JSON giá trị mới của dòng (giá trị cũ khi delete)
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def to_dict(self):
+        return {
+            'cursor': self.seq,
+            'entity': self.entity,
+            'id': self.entity_id,
+            'car_id': self.car_model_id,
+            'op': self.op,
+            'data': json.loads(self.data) if self.data else None,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None,
+        }
@@ -0,0 +1,262 @@
+# catalog-service/location_stock.py
+# Tồn kho theo đại lý: "còn bao nhiêu VF 8 ở TP. HCM" và "đại lý gần nhất còn xe" mà không đọc cả bảng inventory
+#   - ảnh chụp trong bộ nhớ chia theo đại lý: mỗi đại lý một array số nguyên (tồn kho theo car_id), nạp khi
+#     đại lý đó được hỏi lần đầu bằng một lần quét chỉ mục ix_inventory_location_model
+#   - tra cứu mẫu xe x đại lý là một phép đọc phần tử mảng, không truy vấn DB
+#   - làm mới theo nhật ký thay đổi (change_feed.py): sau mỗi commit trong tiến trình (và tối đa mỗi
+#     POLL_INTERVAL_SECONDS cho thay đổi từ tiến trình khác) áp dụng các thay đổi kể từ con trỏ đã đọc;
+#     thay đổi mang giá trị tuyệt đối nên áp dụng lại trên phần vừa nạp cũng không sai
+#   - nhật ký đã bị xóa bớt hoặc còn quá REBUILD_AFTER_CHANGES thay đổi chưa đọc (ví dụ sau import-catalog):
+#     bỏ ảnh chụp, các đại lý được nạp lại khi được hỏi
+#   - tọa độ đại lý (bảng dealer_locations) được đọc lại mỗi DEALER_REFRESH_SECONDS; thứ tự đại lý theo
+#     khoảng cách được nhớ theo điểm xuất phát
+
+import math
+import threading
+import time
+from array import array
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+import change_feed
+from database import CarModel, DealerLocation, Inventory
+
+DEFAULT_NEAREST_LIMIT = 5
+MAX_NEAREST_LIMIT = 50
+REBUILD_AFTER_CHANGES = 10000
+DEALER_REFRESH_SECONDS = 60
+MAX_CACHED_ORIGINS = 1024
+EARTH_RADIUS_KM = 6371.0
+
+# Tọa độ các thành phố được dùng làm tên đại lý trong dữ liệu demo;
+# đại lý khác: flask --app app import-catalog FILE --kind dealers
+KNOWN_DEALERS = {
+    "Hà Nội": (21.0285, 105.8542),
+    "TP. HCM": (10.7769, 106.7009),
+    "Đà Nẵng": (16.0544, 108.2022),
+    "Hải Phòng": (20.8449, 106.6881),
+    "Cần Thơ": (10.0452, 105.7469),
+}
+
+inventory = Inventory.__table__
+dealers = DealerLocation.__table__
+LOCATION_INDEX = next(index for index in inventory.indexes if index.name == 'ix_inventory_location_model')
+
+# Tên các đại lý có dòng tồn kho: nhảy theo chỉ mục (mỗi đại lý một lần tìm) thay vì quét mọi dòng
+_DISTINCT_LOCATIONS = text("""
+    WITH RECURSIVE locations(name) AS (
+        SELECT MIN(dealer_location) FROM inventory
+        UNION ALL
+        SELECT (SELECT MIN(dealer_location) FROM inventory WHERE dealer_location > name)
+        FROM locations WHERE name IS NOT NULL
+    )
+    SELECT name FROM locations WHERE name IS NOT NULL
+""")
+
+
+def ensure_schema(connection):
+    """DB tạo trước khi có tồn kho theo đại lý: tạo chỉ mục, bảng dealer_locations và tọa độ các thành phố demo."""
+    if not inspect(connection).has_table(inventory.name):
+        return  # Chưa có bảng: db.create_all() sẽ tạo cả chỉ mục và bảng dealer_locations
+    LOCATION_INDEX.create(connection, checkfirst=True)
+    dealers.create(connection, checkfirst=True)
+    connection.execute(insert(dealers).on_conflict_do_nothing(), [
+        {"name": name, "latitude": latitude, "longitude": longitude}
+        for name, (latitude, longitude) in KNOWN_DEALERS.items()
+    ])
+
+
+def distance_km(origin, destination):
+    """Khoảng cách đường tròn lớn (haversine) giữa hai điểm (vĩ độ, kinh độ)."""
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _store(partition, car_id, quantity):
+    if car_id >= len(partition):
+        partition.extend(array('i', [0]) * (car_id + 1 - len(partition)))
+    partition[car_id] = quantity
+
+
+class LocationSnapshot:
+    """Tồn kho theo (đại lý, mẫu xe) trong bộ nhớ, mỗi đại lý một phần nạp riêng, làm mới theo nhật ký thay đổi."""
+
+    def __init__(self, notifier=change_feed.NOTIFIER):
+        self._notifier = notifier
+        # Giữ khi làm mới và khi nạp một đại lý: phần vừa nạp không bỏ lỡ thay đổi đang được áp dụng
+        self._lock = threading.RLock()
+        self._clear()
+        self._coordinates = {}
+        self._coordinates_loaded_at = None
+        self._origins = {}
+
+        self.rebuilds = 0
+        self.partition_loads = 0
+        self.applied_changes = 0
+
+    def _clear(self):
+        self.cursor = None  # seq của thay đổi cuối cùng đã áp dụng
+        self._generation = None
+        self._checked_at = 0.0
+        self._partitions = {}  # đại lý -> array('i') tồn kho theo car_id
+        self._locations = set()
+        self._location_order = None  # self._locations theo tên, dựng lại khi có đại lý mới
+        self._models = set()
+
+    def _fresh(self):
+        return (self.cursor is not None and self._generation == self._notifier.generation
+                and time.monotonic() - self._checked_at < change_feed.POLL_INTERVAL_SECONDS)
+
+    def refresh(self, session):
+        """Áp dụng các thay đổi chưa đọc; chỉ truy vấn DB sau một commit trong tiến trình hoặc mỗi POLL_INTERVAL."""
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            # Đọc generation trước DB: commit xảy ra trong lúc đọc sẽ làm lần sau đọc lại
+            generation = self._notifier.generation
+            if self.cursor is not None:
+                latest = change_feed.latest_cursor(session)
+                if latest - self.cursor > REBUILD_AFTER_CHANGES or change_feed.is_expired(session, self.cursor):
+                    self._clear()
+                else:
+                    self._catch_up(session, latest)
+            if self.cursor is None:
+                self._rebuild(session)
+            self._generation, self._checked_at = generation, time.monotonic()
+
+    def _rebuild(self, session):
+        # Con trỏ đọc trước dữ liệu: thay đổi sau con trỏ được áp dụng lại ở lần làm mới sau
+        self.cursor = change_feed.latest_cursor(session)
+        self._locations = set(session.execute(_DISTINCT_LOCATIONS).scalars())
+        self._location_order = None
+        self._models = set(session.execute(select(CarModel.__table__.c.id)).scalars())
+        self.rebuilds += 1
+
+    def _catch_up(self, session, latest):
+        cursor = self.cursor
+        while cursor < latest:
+            rows, cursor = change_feed.fetch(session, cursor, change_feed.MAX_LIMIT)
+            for change in rows:
+                self._apply(change)
+            self.applied_changes += len(rows)
+        self.cursor = cursor
+
+    def _apply(self, change):
+        car_id = change['car_id']
+        if change['entity'] == 'car_model':
+            if change['op'] == 'delete':
+                self._models.discard(car_id)
+            else:
+                self._models.add(car_id)
+            return
+        location = change['data']['dealer_location']
+        quantity = 0 if change['op'] == 'delete' else change['data']['stock_quantity'] or 0
+        if location not in self._locations:
+            self._locations.add(location)
+            self._location_order = None
+        partition = self._partitions.get(location)
+        if partition is not None:
+            _store(partition, car_id, quantity)
+        # Đại lý chưa nạp: sẽ đọc trạng thái mới nhất từ DB khi được hỏi
+
+    def _partition(self, session, location):
+        partition = self._partitions.get(location)
+        if partition is not None:
+            return partition
+        with self._lock:
+            partition = self._partitions.get(location)
+            if partition is None:
+                rows = session.execute(select(inventory.c.car_model_id, inventory.c.stock_quantity)
+                                       .where(inventory.c.dealer_location == location)).all()
+                partition = array('i', [0]) * (max((car_id for car_id, _ in rows), default=0) + 1)
+                for car_id, quantity in rows:
+                    partition[car_id] = quantity or 0
+                self._partitions[location] = partition
+                self.partition_loads += 1
+        return partition
+
+    def _quantity(self, session, location, car_id):
+        partition = self._partition(session, location)
+        return partition[car_id] if car_id < len(partition) else 0
+
+    def _ordered_locations(self):
+        # Đọc dưới khóa: _apply thêm đại lý mới vào self._locations trong lúc làm mới
+        with self._lock:
+            if self._location_order is None:
+                self._location_order = tuple(sorted(self._locations))
+            return self._location_order
+
+    def has_model(self, session, car_id):
+        self.refresh(session)
+        return car_id in self._models
+
+    def stock(self, session, car_id, locations=None):
+        """
+        [(đại lý, tồn kho)] của một mẫu xe tại các đại lý chỉ định, hoặc mọi đại lý còn xe (theo tên);
+        None nếu mẫu xe không tồn tại.
+        """
+        if not self.has_model(session, car_id):
+            return None
+        if locations is not None:
+            return [(location, self._quantity(session, location, car_id)) for location in locations]
+        found = ((location, self._quantity(session, location, car_id)) for location in self._ordered_locations())
+        return [(location, quantity) for location, quantity in found if quantity > 0]
+
+    def coordinates(self, session):
+        """Tên đại lý -> (vĩ độ, kinh độ), đọc lại từ dealer_locations mỗi DEALER_REFRESH_SECONDS."""
+        loaded_at = self._coordinates_loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= DEALER_REFRESH_SECONDS:
+            rows = session.execute(select(dealers.c.name, dealers.c.latitude, dealers.c.longitude)).all()
+            coordinates = {name: (latitude, longitude) for name, latitude, longitude in rows}
+            if coordinates != self._coordinates:
+                self._origins = {}
+            self._coordinates = coordinates
+            self._coordinates_loaded_at = time.monotonic()
+        return self._coordinates
+
+    def _by_distance(self, session, origin):
+        """[(khoảng cách km, đại lý)] tăng dần từ origin; nhớ theo origin (làm tròn ~10 m)."""
+        coordinates = self.coordinates(session)
+        key = (round(origin[0], 4), round(origin[1], 4))
+        ordered = self._origins.get(key)
+        if ordered is None:
+            ordered = sorted((distance_km(key, point), name) for name, point in coordinates.items())
+            if len(self._origins) >= MAX_CACHED_ORIGINS:
+                self._origins = {}
+            self._origins[key] = ordered
+        return ordered
+
+    def nearest(self, session, car_id, origin, quantity=1, limit=DEFAULT_NEAREST_LIMIT):
+        """
+        [(đại lý, khoảng cách km, tồn kho)] của tối đa limit đại lý gần origin nhất còn >= quantity xe;
+        đại lý chưa có tọa độ bị bỏ qua. None nếu mẫu xe không tồn tại.
+        """
+        if not self.has_model(session, car_id):
+            return None
+        found = []
+        for distance, location in self._by_distance(session, origin):
+            available = self._quantity(session, location, car_id)
+            if available >= quantity:
+                found.append((location, distance, available))
+                if len(found) == limit:
+                    break
+        return found
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cursor": self.cursor,
+                "locations": len(self._locations),
+                "loaded_locations": len(self._partitions),
+                "models": len(self._models),
+                "rebuilds": self.rebuilds,
+                "partition_loads": self.partition_loads,
+                "partition_bytes": sum(partition.itemsize * len(partition)
+                                       for partition in self._partitions.values()),
+                "applied_changes": self.applied_changes,
+            }
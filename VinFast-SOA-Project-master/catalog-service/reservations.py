@@ -0,0 +1,176 @@
+# catalog-service/reservations.py
+# Giữ chỗ tồn kho: reserve -> commit | release, giữ chỗ chưa xác nhận tự hết hạn sau TTL
+#   - reserve trừ kho bằng một câu UPDATE có điều kiện (stock_quantity >= quantity) chọn đại lý ngay trong câu lệnh,
+#     nên không có bước đọc-rồi-ghi: nhiều request cùng lúc trên một mẫu xe không thể bán vượt tồn kho
+#   - commit/release/hết hạn đổi trạng thái bằng UPDATE ... WHERE status = 'pending': mỗi giữ chỗ chỉ được
+#     xác nhận hoặc trả kho đúng một lần dù các thao tác chạy đồng thời
+#   - ghi thẳng trên connection (không qua sự kiện ORM của session): tồn kho không có trong JSON được cache
+#     (catalog_cache.py), car_models.total_stock vẫn được trigger cập nhật (stock_totals.py)
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, select, update
+
+from database import Inventory, Reservation
+
+PENDING, COMMITTED, RELEASED, EXPIRED = 'pending', 'committed', 'released', 'expired'
+
+inventory = Inventory.__table__
+reservations = Reservation.__table__
+
+# Thứ tự chọn đại lý; location (nếu có) luôn được ưu tiên trước
+POLICIES = {
+    'most_stock': (inventory.c.stock_quantity.desc(), inventory.c.id),   # dàn đều tồn kho giữa các đại lý
+    'least_stock': (inventory.c.stock_quantity.asc(), inventory.c.id),   # dùng hết lô nhỏ trước
+    'location_only': (inventory.c.id,),                                  # chỉ lấy ở đúng location
+}
+DEFAULT_POLICY = 'most_stock'
+DEFAULT_TTL_SECONDS = int(os.environ.get('RESERVATION_TTL_SECONDS', 900))
+MAX_TTL_SECONDS = 24 * 3600
+# Quét giữ chỗ hết hạn của mọi mẫu xe tối đa một lần mỗi khoảng này (mỗi tiến trình)
+SWEEP_INTERVAL_SECONDS = 30
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+class ReservationError(Exception):
+    """Không thể giữ chỗ/xác nhận/trả kho; status_code là mã HTTP tương ứng."""
+
+    def __init__(self, message, status_code=409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def as_dict(row):
+    return Reservation(**row._mapping).to_dict()
+
+
+def reserve(connection, car_id, quantity, location=None, policy=DEFAULT_POLICY,
+            ttl_seconds=DEFAULT_TTL_SECONDS, now=None):
+    """
+    Trừ quantity xe tại một đại lý (chọn theo policy) và tạo giữ chỗ pending hết hạn sau ttl_seconds.
+    Hết hàng: quét giữ chỗ đã hết hạn của mẫu xe rồi thử lại một lần. Caller commit transaction.
+    """
+    if policy not in POLICIES:
+        raise ReservationError(f"policy phải là một trong {sorted(POLICIES)}", 400)
+    if policy == 'location_only' and not location:
+        raise ReservationError("policy location_only cần location", 400)
+    now = now or datetime.utcnow()
+
+    taken = _take_stock(connection, car_id, quantity, location, policy)
+    if taken is None and expire(connection, now, car_id=car_id):
+        taken = _take_stock(connection, car_id, quantity, location, policy)
+    if taken is None:
+        raise ReservationError("Không đủ tồn kho để giữ chỗ")
+
+    inventory_id, dealer_location = taken
+    row = connection.execute(reservations.insert().values(
+        car_model_id=car_id, inventory_id=inventory_id, dealer_location=dealer_location,
+        quantity=quantity, status=PENDING, created_at=now, expires_at=now + timedelta(seconds=ttl_seconds),
+    ).returning(*reservations.c)).one()
+    return as_dict(row)
+
+
+def _take_stock(connection, car_id, quantity, location, policy):
+    """(inventory_id, dealer_location) của dòng tồn kho vừa bị trừ, hoặc None nếu không đại lý nào đủ hàng."""
+    order = POLICIES[policy]
+    candidates = select(inventory.c.id).where(
+        inventory.c.car_model_id == car_id, inventory.c.stock_quantity >= quantity)
+    if location and policy == 'location_only':
+        candidates = candidates.where(inventory.c.dealer_location == location)
+    elif location:
+        order = ((inventory.c.dealer_location == location).desc(), *order)
+    candidate = candidates.order_by(*order).limit(1).scalar_subquery()
+    return connection.execute(
+        update(inventory)
+        .where(inventory.c.id == candidate, inventory.c.stock_quantity >= quantity)
+        .values(stock_quantity=inventory.c.stock_quantity - quantity)
+        .returning(inventory.c.id, inventory.c.dealer_location)
+    ).first()
+
+
+def _return_stock(connection, rows):
+    """Cộng lại tồn kho cho các giữ chỗ [(inventory_id, quantity)] vừa bị trả/hết hạn."""
+    totals = {}
+    for inventory_id, quantity in rows:
+        totals[inventory_id] = totals.get(inventory_id, 0) + quantity
+    if totals:
+        connection.execute(
+            update(inventory).where(inventory.c.id == bindparam('inv_id'))
+            .values(stock_quantity=inventory.c.stock_quantity + bindparam('qty')),
+            [{"inv_id": inventory_id, "qty": quantity} for inventory_id, quantity in totals.items()],
+        )
+
+
+def expire(connection, now=None, car_id=None):
+    """Chuyển giữ chỗ pending đã quá hạn sang expired và trả lại kho; trả về số giữ chỗ đã hết hạn."""
+    now = now or datetime.utcnow()
+    condition = and_(reservations.c.status == PENDING, reservations.c.expires_at <= now)
+    if car_id is not None:
+        condition = and_(condition, reservations.c.car_model_id == car_id)
+    rows = connection.execute(
+        update(reservations).where(condition).values(status=EXPIRED)
+        .returning(reservations.c.inventory_id, reservations.c.quantity)
+    ).all()
+    _return_stock(connection, rows)
+    return len(rows)
+
+
+def maybe_expire(connection, now=None):
+    """expire() cho mọi mẫu xe, tối đa một lần mỗi SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+            return 0
+        _last_sweep = time.monotonic()
+    return expire(connection, now)
+
+
+def get(connection, reservation_id):
+    row = connection.execute(select(reservations).where(reservations.c.id == reservation_id)).first()
+    if row is None:
+        raise ReservationError("Không tìm thấy giữ chỗ", 404)
+    return row
+
+
+def commit(connection, reservation_id, now=None):
+    """Xác nhận giữ chỗ còn hạn (kho đã trừ lúc reserve được giữ nguyên). Gọi lại lần nữa vẫn thành công."""
+    now = now or datetime.utcnow()
+    row = connection.execute(
+        update(reservations)
+        .where(reservations.c.id == reservation_id, reservations.c.status == PENDING,
+               reservations.c.expires_at > now)
+        .values(status=COMMITTED).returning(*reservations.c)
+    ).first()
+    if row is not None:
+        return as_dict(row)
+
+    row = get(connection, reservation_id)
+    if row.status == COMMITTED:
+        return as_dict(row)
+    if row.status == PENDING:
+        # Quá hạn nhưng chưa được quét: trả kho ngay
+        expire(connection, now, car_id=row.car_model_id)
+        raise ReservationError("Giữ chỗ đã hết hạn")
+    raise ReservationError(f"Giữ chỗ đã ở trạng thái {row.status}")
+
+
+def release(connection, reservation_id, now=None):
+    """Hủy giữ chỗ pending và trả lại kho. Giữ chỗ đã released/expired: không làm gì, trả về trạng thái hiện tại."""
+    row = connection.execute(
+        update(reservations)
+        .where(reservations.c.id == reservation_id, reservations.c.status == PENDING)
+        .values(status=RELEASED).returning(*reservations.c)
+    ).first()
+    if row is not None:
+        _return_stock(connection, [(row.inventory_id, row.quantity)])
+        return as_dict(row)
+
+    row = get(connection, reservation_id)
+    if row.status == COMMITTED:
+        raise ReservationError("Giữ chỗ đã được xác nhận, không thể hủy")
+    return as_dict(row)
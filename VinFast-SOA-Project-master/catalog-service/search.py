@@ -0,0 +1,159 @@
+# catalog-service/search.py
+# Tìm kiếm toàn văn mẫu xe bằng SQLite FTS5 (bảng ảo car_models_fts, rowid = car_models.id)
+#   - chỉ mục gồm model_name, description và các giá trị trong specs (đã làm phẳng)
+#   - văn bản và từ khóa đều được bỏ dấu tiếng Việt (kể cả đ -> d) và chuyển chữ thường,
+#     nên "SUV điện 7 chỗ" và "suv dien 7 cho" cho cùng kết quả
+#   - xếp hạng bằng bm25, tên mẫu xe có trọng số cao nhất
+#   - chỉ mục được cập nhật trong cùng transaction khi thêm/sửa/xóa CarModel (sự kiện SQLAlchemy),
+#     hoặc dựng lại toàn bộ một lần (rebuild_index / bulk_indexing)
+
+import json
+import re
+import unicodedata
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import CarModel
+
+FTS_TABLE = 'car_models_fts'
+# Trọng số bm25 theo thứ tự cột: model_name, description, specs
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+_BULK_KEY = 'search_bulk_indexing'
+_WORD = re.compile(r'\w+')
+
+
+def fold(value):
+    """Bỏ dấu tiếng Việt và chuyển chữ thường: 'Điện' -> 'dien', 'chỗ' -> 'cho'."""
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def flatten_specs(specs):
+    """'{"motor_type": "Điện", "range": "438 km"}' -> 'Điện 438 km' (chỉ lấy giá trị)."""
+    try:
+        data = json.loads(specs) if specs else {}
+    except ValueError:
+        return specs or ''
+    if not isinstance(data, dict):
+        return str(data)
+    return ' '.join(str(value) for value in data.values())
+
+
+def document(car):
+    """Các cột của chỉ mục cho một mẫu xe (đã bỏ dấu)."""
+    return {
+        "id": car.id,
+        "model_name": fold(car.model_name),
+        "description": fold(car.description),
+        "specs": fold(flatten_specs(car.specs)),
+    }
+
+
+def match_expression(query, match_all=True):
+    """
+    Từ khóa -> biểu thức MATCH của FTS5. Mỗi từ được đặt trong ngoặc kép (không bị hiểu là toán tử),
+    từ cuối khớp cả theo tiền tố để tìm được khi người dùng đang gõ dở ("vinf" -> "vinfast");
+    bản ghi khớp đúng từ đó vẫn được xếp trên bản ghi chỉ khớp tiền tố.
+    """
+    terms = _WORD.findall(fold(query))
+    if not terms:
+        return None
+    last = terms[-1]
+    quoted = [f'"{term}"' for term in terms[:-1]] + [f'("{last}" OR "{last}"*)']
+    return (' AND ' if match_all else ' OR ').join(quoted)
+
+
+def create_index(connection):
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(model_name, description, specs, tokenize='unicode61')"
+    ))
+
+
+def index_exists(connection):
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first() is not None
+
+
+def rebuild_index(session, batch_size=5000):
+    """Dựng lại toàn bộ chỉ mục từ car_models (xóa rồi chèn theo lô). Caller commit transaction."""
+    connection = session.connection()
+    create_index(connection)
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    insert = text(f"INSERT INTO {FTS_TABLE} (rowid, model_name, description, specs) "
+                  f"VALUES (:id, :model_name, :description, :specs)")
+    rows = session.query(CarModel.id, CarModel.model_name, CarModel.description, CarModel.specs)
+    batch = []
+    for car in rows.yield_per(batch_size):
+        batch.append(document(car))
+        if len(batch) >= batch_size:
+            connection.execute(insert, batch)
+            batch = []
+    if batch:
+        connection.execute(insert, batch)
+
+
+@contextmanager
+def bulk_indexing(session):
+    """Tạm dừng cập nhật từng bản ghi khi nạp dữ liệu hàng loạt, dựng lại chỉ mục một lần ở cuối."""
+    session.info[_BULK_KEY] = True
+    try:
+        yield
+    finally:
+        session.info.pop(_BULK_KEY, None)
+    # Chỉ dựng lại khi nạp dữ liệu thành công
+    rebuild_index(session)
+    session.commit()
+
+
+def ensure_index(session):
+    """Tạo và nạp chỉ mục nếu DB chưa có (ví dụ DB tạo trước khi có tìm kiếm). Caller commit transaction."""
+    if not index_exists(session.connection()):
+        rebuild_index(session)
+
+
+def watch_changes():
+    """Cập nhật chỉ mục trong cùng transaction mỗi khi flush có thêm/sửa/xóa CarModel."""
+
+    @event.listens_for(Session, 'after_flush')
+    def update_index(session, flush_context):
+        if session.info.get(_BULK_KEY):
+            return
+        changed = [obj for obj in (*session.new, *session.dirty) if isinstance(obj, CarModel)]
+        deleted = [obj for obj in session.deleted if isinstance(obj, CarModel)]
+        if not changed and not deleted:
+            return
+        connection = session.connection()
+        if not index_exists(connection):
+            return  # Chỉ mục sẽ được dựng đầy đủ ở lần ensure_index/rebuild_index tiếp theo
+        ids = [{"id": car.id} for car in changed + deleted]
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), ids)
+        if changed:
+            connection.execute(text(
+                f"INSERT INTO {FTS_TABLE} (rowid, model_name, description, specs) "
+                f"VALUES (:id, :model_name, :description, :specs)"
+            ), [document(car) for car in changed])
+
+
+def search(session, query, limit=DEFAULT_LIMIT):
+    """
+    [(car_id, score)] xếp theo độ liên quan (score bm25 càng nhỏ càng liên quan).
+    Ưu tiên kết quả chứa mọi từ khóa; nếu không có thì trả kết quả chứa ít nhất một từ.
+    """
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    sql = text(f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+               f"WHERE {FTS_TABLE} MATCH :match ORDER BY score LIMIT :limit")
+    expressions = [match_expression(query, True), match_expression(query, False)]
+    if expressions[0] is None:
+        return []
+    for expression in dict.fromkeys(expressions):  # Truy vấn một từ: AND và OR giống nhau
+        rows = session.execute(sql, {"match": expression, "limit": limit}).fetchall()
+        if rows:
+            return [(row[0], row[1]) for row in rows]
+    return []
@@ -0,0 +1,84 @@
+# catalog-service/stock_totals.py
+# Tổng tồn kho duy trì sẵn cho mỗi mẫu xe (car_models.total_stock) thay vì SUM(inventory) ở mỗi lần kiểm tra
+#   - trigger SQLite trên bảng inventory cộng/trừ chênh lệch vào car_models.total_stock trong cùng transaction,
+#     nên mọi cách ghi (ORM, update/insert theo lô, SQL thuần) đều giữ tổng nhất quán
+#   - kiểm tra tồn kho chỉ còn đọc một dòng theo khóa chính
+#   - verify() so sánh tổng duy trì với SUM thực tế (lệnh: flask --app app verify-stock [--fix])
+
+from sqlalchemy import DDL, event, func, text
+
+from database import CarModel, Inventory, db
+
+STOCK_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_stock_insert AFTER INSERT ON inventory
+    BEGIN
+        UPDATE car_models SET total_stock = total_stock + COALESCE(NEW.stock_quantity, 0)
+        WHERE id = NEW.car_model_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_stock_delete AFTER DELETE ON inventory
+    BEGIN
+        UPDATE car_models SET total_stock = total_stock - COALESCE(OLD.stock_quantity, 0)
+        WHERE id = OLD.car_model_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_stock_update AFTER UPDATE OF stock_quantity, car_model_id ON inventory
+    BEGIN
+        UPDATE car_models SET total_stock = total_stock - COALESCE(OLD.stock_quantity, 0)
+        WHERE id = OLD.car_model_id;
+        UPDATE car_models SET total_stock = total_stock + COALESCE(NEW.stock_quantity, 0)
+        WHERE id = NEW.car_model_id;
+    END
+    """,
+]
+
+# DB mới (db.create_all): tạo trigger ngay sau bảng inventory
+for statement in STOCK_TRIGGERS:
+    event.listen(Inventory.__table__, 'after_create', DDL(statement))
+
+
+def recompute(connection):
+    """Tính lại total_stock của mọi mẫu xe từ bảng inventory."""
+    connection.execute(text(
+        "UPDATE car_models SET total_stock = COALESCE("
+        "(SELECT SUM(stock_quantity) FROM inventory WHERE inventory.car_model_id = car_models.id), 0)"
+    ))
+
+
+def ensure_schema(connection):
+    """DB tạo trước khi có total_stock: thêm cột, tạo trigger và tính tổng ban đầu."""
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(car_models)"))}
+    if not columns:
+        return  # Chưa có bảng: db.create_all() sẽ tạo cả cột và trigger
+    if 'total_stock' not in columns:
+        connection.execute(text("ALTER TABLE car_models ADD COLUMN total_stock INTEGER NOT NULL DEFAULT 0"))
+        recompute(connection)
+    for statement in STOCK_TRIGGERS:
+        connection.execute(text(statement))
+
+
+def total_stock(car_id):
+    """Tổng tồn kho của một mẫu xe (0 nếu không tồn tại), đọc theo khóa chính."""
+    return db.session.query(CarModel.total_stock).filter(CarModel.id == car_id).scalar() or 0
+
+
+def verify(fix=False):
+    """
+    [(car_id, total_stock đang lưu, SUM thực tế)] của các mẫu xe bị lệch.
+    fix=True: tính lại toàn bộ và commit.
+    """
+    actual = db.session.query(
+        Inventory.car_model_id, func.sum(Inventory.stock_quantity)
+    ).group_by(Inventory.car_model_id).subquery()
+    mismatches = db.session.query(
+        CarModel.id, CarModel.total_stock, func.coalesce(actual.c[1], 0)
+    ).outerjoin(actual, actual.c.car_model_id == CarModel.id).filter(
+        CarModel.total_stock != func.coalesce(actual.c[1], 0)
+    ).order_by(CarModel.id).all()
+    if fix and mismatches:
+        recompute(db.session.connection())
+        db.session.commit()
+    return [tuple(row) for row in mismatches]
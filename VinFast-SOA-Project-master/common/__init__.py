@@ -0,0 +1,2 @@
+# common/__init__.py
+# Mã dùng chung giữa Gateway và các dịch vụ Back-end
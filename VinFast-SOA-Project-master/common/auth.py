@@ -0,0 +1,12 @@
+# common/auth.py
+# Cấu hình JWT dùng chung: User Service ký token khi đăng nhập, Gateway xác thực token ở biên
+
+import os
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your_super_secret_key_for_jwt')
+JWT_ALGORITHM = 'HS256'
+
+# Header định danh do Gateway thêm sau khi đã xác thực token. Back-end chỉ lắng nghe trên 127.0.0.1
+# và nhận request qua Gateway, nên tin các header này thay vì tự giải mã token hay tra cứu lại người dùng.
+USER_ID_HEADER = 'X-User-Id'
+USER_ROLE_HEADER = 'X-User-Role'
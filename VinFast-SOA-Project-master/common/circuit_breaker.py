@@ -0,0 +1,151 @@
+# common/circuit_breaker.py
+# Circuit breaker cho các lời gọi giữa các dịch vụ: khi dịch vụ đích lỗi/chậm liên tục,
+# từ chối ngay thay vì để mỗi request chờ hết timeout.
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Mạch đang mở: lời gọi bị từ chối ngay, không gửi tới dịch vụ đích."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Theo dõi window_size lời gọi gần nhất. Mạch mở khi có ít nhất min_calls lời gọi và
+    tỉ lệ lỗi >= failure_rate_threshold hoặc tỉ lệ chậm (>= slow_call_seconds) >= slow_call_rate_threshold.
+    Sau open_seconds, mạch chuyển sang half-open và cho half_open_max_calls lời gọi thử đi qua:
+    tất cả thành công thì đóng mạch, một lời gọi lỗi thì mở lại.
+    """
+
+    def __init__(self, name, window_size=20, min_calls=5, failure_rate_threshold=0.5,
+                 slow_call_seconds=3.0, slow_call_rate_threshold=0.8, open_seconds=15,
+                 half_open_max_calls=1):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._window = deque(maxlen=window_size)  # (lỗi?, chậm?) của từng lời gọi
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self.times_opened += 1
+        print(f"Circuit breaker '{self.name}' MỞ: tạm ngừng gọi dịch vụ trong {self.open_seconds}s")
+
+    def retry_after(self):
+        """Số giây còn lại trước khi mạch cho phép lời gọi thử."""
+        with self._lock:
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def before_call(self):
+        """Gọi trước mỗi lời gọi; ném CircuitOpenError nếu mạch không cho phép."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record(self, failed, elapsed):
+        """Ghi nhận kết quả của một lời gọi đã được before_call() cho phép."""
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_max_calls:
+                        self._state = CLOSED
+                        self._window.clear()
+                        print(f"Circuit breaker '{self.name}' ĐÓNG: dịch vụ đã hoạt động lại")
+                return
+
+            if self._state != CLOSED:
+                return
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            failure_rate = sum(1 for f, _ in self._window if f) / calls
+            slow_rate = sum(1 for _, s in self._window if s) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+
+    def cancel(self):
+        """Lời gọi đã được cho phép nhưng bị hủy giữa chừng: trả lại lượt thử half-open, không tính kết quả."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def call(self, fn, *args, is_failure=None, **kwargs):
+        """
+        Gọi fn qua circuit breaker. Ngoại lệ từ fn được tính là lỗi;
+        is_failure(result) cho phép coi một kết quả (ví dụ HTTP 5xx) là lỗi.
+        """
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(True, time.monotonic() - started)
+            raise
+        self.record(bool(is_failure and is_failure(result)), time.monotonic() - started)
+        return result
+
+    def stats(self):
+        with self._lock:
+            self._maybe_half_open()
+            calls = len(self._window)
+            return {
+                "state": self._state,
+                "window_calls": calls,
+                "failure_rate": round(sum(1 for f, _ in self._window if f) / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(sum(1 for _, s in self._window if s) / calls, 3) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_after": round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+                if self._state == OPEN else 0,
+            }
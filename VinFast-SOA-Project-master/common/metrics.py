@@ -0,0 +1,206 @@
+# common/metrics.py
+# Số liệu vận hành (Prometheus text format) dùng chung cho Gateway và các dịch vụ Back-end:
+#   - số request, số request đang xử lý và histogram độ trễ theo route + mã trạng thái
+#   - endpoint /metrics để Prometheus thu thập
+# Không phụ thuộc prometheus_client; mỗi lần ghi chỉ tốn một lần lấy lock và một phép tìm bucket
+
+import bisect
+import threading
+import time
+
+from flask import Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket (giây) cho độ trễ HTTP: từ 1 ms tới 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Một metric có nhãn; mỗi bộ giá trị nhãn giữ một giá trị riêng."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Histogram tích lũy theo bucket cố định (giá trị = [số mẫu mỗi bucket..., tổng, số mẫu])."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_samples(self, items):
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """Tập metric của một tiến trình; render() trả về nội dung cho /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Registry mặc định của tiến trình (mỗi dịch vụ chạy trong một tiến trình riêng)
+REGISTRY = Registry()
+
+
+def url_rule_label():
+    """Nhãn route mặc định: mẫu URL thay vì đường dẫn thật để số chuỗi metric không tăng theo id."""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def instrument(app, registry=REGISTRY, endpoint='/metrics', route_label=url_rule_label):
+    """
+    Ghi số request, số request đang xử lý và độ trễ theo route (mẫu URL, ví dụ /api/v1/catalog/cars/<int:car_id>)
+    và mã trạng thái cho một ứng dụng Flask, rồi mở endpoint /metrics.
+    Với phản hồi streaming, độ trễ được tính tới khi trả header.
+    """
+    requests_total = registry.counter(
+        'http_requests_total', 'HTTP requests handled.', ('method', 'route', 'status'))
+    duration = registry.histogram(
+        'http_request_duration_seconds', 'HTTP request latency in seconds.', ('method', 'route', 'status'))
+    in_flight = registry.gauge('http_requests_in_flight', 'HTTP requests currently being handled.')
+    in_flight.set(value=0)
+
+    @app.before_request
+    def start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_in_flight = True
+        in_flight.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = route_label()
+            status = str(response.status_code)
+            duration.observe(request.method, route, status, value=time.perf_counter() - started)
+            requests_total.inc(request.method, route, status)
+        return response
+
+    @app.teardown_request
+    def finish_request(error=None):
+        if g.pop('_metrics_in_flight', False):
+            in_flight.dec()
+
+    @app.route(endpoint, methods=['GET'])
+    def metrics():
+        """Số liệu vận hành theo định dạng Prometheus."""
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return app
@@ -0,0 +1,99 @@
+# common/trace_waterfall.py
+# In waterfall (thời điểm bắt đầu, thời gian của từng span, lồng theo span cha) cho một request đã truy vết
+#
+# Chạy từ thư mục gốc dự án, với TRACE_FILE như khi chạy các dịch vụ (kèm file đã xoay vòng TRACE_FILE.1):
+#   python -m common.trace_waterfall <trace id>      (trace id lấy từ header X-Trace-Id của Gateway)
+#   python -m common.trace_waterfall --last          (trace mới nhất trong file)
+#   python -m common.trace_waterfall --file traces.jsonl <trace id>
+
+import argparse
+import json
+import os
+import sys
+
+from common.tracing import TRACE_FILE
+
+BAR_WIDTH = 40
+
+
+def load_spans(path, trace_id=None):
+    """Đọc các span trong file JSONL; trace_id=None lấy trace của span gốc ghi sau cùng."""
+    spans = []
+    # Phần cũ hơn đã được xoay vòng sang path + '.1'
+    paths = [rotated for rotated in (path + '.1',) if os.path.exists(rotated)] + [path]
+    for name in paths:
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # Dòng đang được ghi dở
+    if trace_id is None:
+        roots = [span for span in spans if span['parent_id'] is None]
+        if not roots:
+            return []
+        trace_id = max(roots, key=lambda span: span['start'])['trace_id']
+    return [span for span in spans if span['trace_id'] == trace_id]
+
+
+def ordered(spans):
+    """Duyệt cây span theo thứ tự thời gian: (độ sâu, span). Span có cha không nằm trong file được coi là gốc."""
+    ids = {span['span_id'] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span['parent_id'] if span['parent_id'] in ids else None
+        children.setdefault(parent, []).append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span['start'])
+
+    stack = [(0, span) for span in reversed(children.get(None, []))]
+    while stack:
+        depth, span = stack.pop()
+        yield depth, span
+        stack.extend((depth + 1, child) for child in reversed(children.get(span['span_id'], [])))
+
+
+def render(spans):
+    origin = min(span['start'] for span in spans)
+    end = max(span['start'] + span['duration_ms'] / 1000 for span in spans)
+    total_ms = max((end - origin) * 1000, 1e-3)
+
+    lines = [f"trace {spans[0]['trace_id']}  {total_ms:.1f} ms  {len(spans)} span",
+             f"{'start ms':>9} {'dur ms':>9}  {'service':<10} {'span':<48} timeline"]
+    for depth, span in ordered(spans):
+        offset_ms = (span['start'] - origin) * 1000
+        left = int(offset_ms / total_ms * BAR_WIDTH)
+        width = max(1, round(span['duration_ms'] / total_ms * BAR_WIDTH))
+        bar = ' ' * left + ('!' if span['status'] == 'error' else '#') * min(width, BAR_WIDTH - left)
+        name = '  ' * depth + span['name']
+        details = ', '.join(f"{key}={value}" for key, value in span['attributes'].items())
+        lines.append(f"{offset_ms:>9.1f} {span['duration_ms']:>9.1f}  {span['service']:<10} {name:<48} "
+                     f"|{bar:<{BAR_WIDTH}}| {details}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Waterfall của một request đã truy vết")
+    parser.add_argument('trace_id', nargs='?')
+    parser.add_argument('--last', action='store_true', help="trace mới nhất trong file")
+    parser.add_argument('--file', default=TRACE_FILE)
+    args = parser.parse_args(argv)
+    if not args.trace_id and not args.last:
+        parser.error("cần trace id hoặc --last")
+    if not args.file:
+        parser.error("cần --file hoặc biến môi trường TRACE_FILE (các dịch vụ chỉ ghi span ra file khi có TRACE_FILE)")
+
+    try:
+        spans = load_spans(args.file, None if args.last else args.trace_id)
+    except FileNotFoundError:
+        print(f"Không tìm thấy file trace {args.file}", file=sys.stderr)
+        return 1
+    if not spans:
+        print("Không tìm thấy trace", file=sys.stderr)
+        return 1
+    print(render(spans))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
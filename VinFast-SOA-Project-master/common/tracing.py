@@ -0,0 +1,254 @@
+# common/tracing.py
+# Truy vết request xuyên dịch vụ (distributed tracing):
+#   - Gateway sinh trace id, mỗi bước (nhận request, gọi dịch vụ khác, flush/commit DB) là một span có thời gian
+#   - trace/span id đi qua header W3C traceparent ("00-<trace id>-<span id>-<flags>") tới Back-end
+#   - span đã kết thúc được giữ trong bộ nhớ (MemoryExporter, giới hạn số span); đặt biến môi trường TRACE_FILE
+#     để mọi dịch vụ ghi ra một file JSONL dùng chung (xoay vòng khi vượt TRACE_FILE_MAX_BYTES)
+# Xem waterfall của một request: TRACE_FILE=... python -m common.trace_waterfall <trace id>
+
+import contextvars
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, request
+
+TRACEPARENT_HEADER = 'traceparent'
+# Gateway trả trace id cho Frontend để tra cứu waterfall của request
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+# File JSONL mà mọi dịch vụ trên máy cùng ghi span vào; không đặt thì không ghi file
+TRACE_FILE = os.environ.get('TRACE_FILE') or None
+# Vượt quá kích thước này (byte), file được đổi tên thành TRACE_FILE.1 (bản cũ hơn bị xóa) và ghi file mới
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', 64 * 1024 * 1024))
+# Tỉ lệ trace được ghi lại (quyết định một lần ở Gateway, các dịch vụ sau làm theo cờ trong traceparent)
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '1.0'))
+
+# Span đang chạy của request/thread hiện tại
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def parse_traceparent(value):
+    """'00-<32 hex>-<16 hex>-<2 hex>' -> (trace_id, parent span id, sampled); None nếu sai định dạng."""
+    parts = (value or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Span:
+    """Một bước có thời gian trong trace."""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'service', 'sampled',
+                 'start', 'duration', 'attributes', 'status', '_started')
+
+    def __init__(self, tracer, name, trace_id, parent_id, sampled, attributes):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.service = tracer.service
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            if self.sampled:
+                self.tracer.exporter.export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class FileExporter:
+    """
+    Ghi mỗi span thành một dòng JSON; nhiều tiến trình cùng ghi một file nhờ O_APPEND.
+    File vượt max_bytes được đổi tên thành path + '.1': dung lượng tối đa khoảng 2 x max_bytes.
+    """
+
+    # Kiểm tra kích thước file sau mỗi lượng byte này do tiến trình ghi
+    CHECK_EVERY_BYTES = 64 * 1024
+
+    def __init__(self, path, max_bytes=TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._fd = None
+        self._unchecked = 0
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = (json.dumps(span.to_dict(), ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            # Một lần write cho cả dòng để các tiến trình không ghi xen vào nhau
+            os.write(self._fd, line)
+            self._unchecked += len(line)
+            if self._unchecked >= self.CHECK_EVERY_BYTES:
+                self._unchecked = 0
+                self._rotate_if_full()
+
+    def _rotate_if_full(self):
+        written = os.fstat(self._fd)
+        if written.st_size < self.max_bytes:
+            return
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        # Tiến trình khác đã xoay vòng (path là file khác): chỉ cần mở lại path
+        if current is not None and current.st_ino == written.st_ino:
+            os.replace(self.path, self.path + '.1')
+        os.close(self._fd)
+        self._fd = None
+
+
+class MemoryExporter:
+    """Giữ tối đa max_spans span gần nhất trong bộ nhớ của tiến trình."""
+
+    def __init__(self, max_spans=10000):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self._spans.append(span.to_dict())
+
+    def spans(self, trace_id=None):
+        with self._lock:
+            return [span for span in self._spans if trace_id is None or span['trace_id'] == trace_id]
+
+
+class Tracer:
+    """Tạo span (con của span đang chạy nếu có) và chèn header traceparent cho lời gọi ra ngoài."""
+
+    def __init__(self, service='unknown', exporter=None, sample_rate=TRACE_SAMPLE_RATE):
+        self.service = service
+        if exporter is None:
+            exporter = FileExporter(TRACE_FILE) if TRACE_FILE else MemoryExporter()
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_span(self, name, traceparent=None, **attributes):
+        """
+        Bắt đầu span mới. Cha là span trong header traceparent (nếu hợp lệ), ngược lại là span đang chạy;
+        không có cha thì bắt đầu trace mới. Span phải được kết thúc bằng end().
+        """
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            current = _current_span.get()
+            if current is not None:
+                trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+            else:
+                trace_id, parent_id = secrets.token_hex(16), None
+                sampled = random.random() < self.sample_rate
+        return Span(self, name, trace_id, parent_id, sampled, attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """with TRACER.span('db.commit'): ... — span là span đang chạy trong khối with."""
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def inject(self, headers=None):
+        """Thêm traceparent của span đang chạy vào headers (dict mới) cho lời gọi tới dịch vụ khác."""
+        headers = dict(headers or {})
+        current = _current_span.get()
+        if current is not None:
+            headers[TRACEPARENT_HEADER] = current.traceparent
+        return headers
+
+
+def current_span():
+    return _current_span.get()
+
+
+# Tracer mặc định của tiến trình; trace_requests() đặt tên dịch vụ
+TRACER = Tracer()
+
+
+def trace_requests(app, service, tracer=TRACER, expose_trace_id=False):
+    """
+    Mở một span cho mỗi request tới ứng dụng Flask, nối vào trace của bên gọi nếu có header traceparent.
+    expose_trace_id: trả trace id cho client qua header X-Trace-Id (dùng ở Gateway).
+    """
+    tracer.service = service
+
+    @app.before_request
+    def start_request_span():
+        span = tracer.start_span(request.method, request.headers.get(TRACEPARENT_HEADER), path=request.path)
+        g._trace_span = span
+        g._trace_token = _current_span.set(span)
+
+    @app.after_request
+    def finish_request_span(response):
+        span = g.get('_trace_span')
+        if span is not None:
+            # Đặt tên theo mẫu URL để dễ đọc waterfall (POST /api/v1/orders)
+            rule = request.url_rule.rule if request.url_rule is not None else request.path
+            span.name = f"{request.method} {rule}"
+            span.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                span.status = 'error'
+            if expose_trace_id:
+                response.headers[TRACE_ID_HEADER] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_span(error=None):
+        span = g.pop('_trace_span', None)
+        if span is None:
+            return
+        if error is not None:
+            span.status = 'error'
+            span.set(error=type(error).__name__)
+        _current_span.reset(g.pop('_trace_token'))
+        span.end()
+
+    return app
@@ -30,34 +30,6 @@ function getUserIdFromToken(token) {
 
 // --- CÁC HÀM TÍCH HỢP SOA (GỌI CÁC DỊCH VỤ) ---
 
-async function fetchUserName(userId) {
-    try {
-        // GỌI T1 QUA GATEWAY
-        const response = await fetch(`${BASE_GATEWAY_URL}/users/users/${userId}`); 
-        if (response.ok) {
-            const user = await response.json();
-            return user.name || `User ID ${userId}`;
-        }
-        return `User ID ${userId} (Lỗi truy cập T1)`; 
-    } catch (error) {
-        return `Lỗi Kết nối T1`;
-    }
-}
-
-async function fetchCarModelName(carId) {
-    try {
-        // GỌI T2 QUA GATEWAY
-        const response = await fetch(`${BASE_GATEWAY_URL}/catalog/catalog/cars/${carId}`); 
-        if (response.ok) {
-            const car = await response.json();
-            return car.model_name || `Car ID ${carId}`;
-        }
-        return `Car ID ${carId} (Lỗi truy cập T2)`;
-    } catch (error) {
-        return `Lỗi Kết nối T2`;
-    }
-}
-
 async function loadDashboard() {
     const dashboardBody = document.getElementById('orders-table-body');
     const statusMessage = document.getElementById('status-message');
@@ -67,8 +39,8 @@ async function loadDashboard() {
     let orders = [];
 
     try {
-        // GỌI T3 QUA GATEWAY
-        const orderResponse = await fetch(`${BASE_GATEWAY_URL}/orders/orders`); 
+        // GỌI GATEWAY: đơn hàng (T3) đã được ghép sẵn tên người dùng (T1) và tên mẫu xe (T2)
+        const orderResponse = await fetch(`${BASE_GATEWAY_URL}/dashboard/orders`); 
         
         if (!orderResponse.ok) {
             statusMessage.innerHTML = `Lỗi Tải Đơn Hàng (T3): Server trả về ${orderResponse.status}.`;
@@ -88,13 +60,13 @@ async function loadDashboard() {
          return;
     }
 
-    // Tích hợp và hiển thị
+    // Hiển thị (không cần gọi thêm T1/T2 cho từng đơn hàng)
     for (const order of orders) {
-        const userName = await fetchUserName(order.user_id);
+        const userName = order.user_name;
         
         let itemDetails = '';
         for (const item of order.items) {
-            const carName = await fetchCarModelName(item.car_model_id);
+            const carName = item.car_model_name;
             const priceVND = item.unit_price.toLocaleString('vi-VN') + ' VND'; 
 
             itemDetails += `${carName} (${item.quantity} chiếc, ${priceVND}/chiếc)<br>`;
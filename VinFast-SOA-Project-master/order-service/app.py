@@ -3,21 +3,62 @@
 from flask import Flask, request, jsonify, Response
 from database import db, Order, OrderItem
 from datetime import datetime
+import math
 import os
+import threading
+import time
+import sys
 import requests 
 from flask_cors import CORS # ĐÃ THÊM
+import fanout
+from lookup_cache import MISSING, CatalogPriceWatcher, LookupCache
+
+# Thư mục gốc của dự án (chứa package common/ dùng chung giữa các dịch vụ)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.auth import USER_ID_HEADER
+from common.circuit_breaker import CircuitBreaker, CircuitOpenError
+from common.metrics import instrument
+from common.tracing import TRACER, trace_requests
 
 app = Flask(__name__)
 CORS(app) # KÍCH HOẠT CORS CHO PHÉP FRONTEND TRUY CẬP
+# Số request, độ trễ theo route và endpoint /metrics cho Prometheus
+instrument(app)
+# Nối tiếp trace từ Gateway (header traceparent); lời gọi T1/T2 và flush/commit DB là các span con
+trace_requests(app, 'orders')
 
 # Cấu hình Flask và DB (sử dụng cổng 5003)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///order_service.db' 
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('ORDER_DATABASE_URI', 'sqlite:///order_service.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
 # --- KHAI BÁO ENDPOINT CÁC DỊCH VỤ KHÁC ---
 USER_SERVICE_URL = "http://127.0.0.1:5001"
 CATALOG_SERVICE_URL = "http://127.0.0.1:5002"
+# Thời gian chờ tối đa (giây) cho mỗi lời gọi đến dịch vụ khác
+SERVICE_TIMEOUT = 5
+# Hạn chót chung (giây) cho mọi lời gọi T1/T2 khi tạo một đơn hàng, dưới UPSTREAM_TIMEOUT (10s) của Gateway
+ORDER_DEADLINE_SECONDS = 8
+# Số lời gọi T1/T2 của một đơn hàng chạy cùng lúc (1: lần lượt như trước)
+ORDER_FANOUT_CONCURRENCY = 8
+
+# Người dùng tồn tại và giá xe ít thay đổi: cache kết quả T1/T2 (giây); "không tồn tại" chỉ cache ngắn
+USER_CACHE_TTL = 300
+PRICE_CACHE_TTL = 300
+NEGATIVE_CACHE_TTL = 10
+LOOKUP_CACHE_SIZE = 10000
+USER_CACHE = LookupCache('users', USER_CACHE_TTL, NEGATIVE_CACHE_TTL, LOOKUP_CACHE_SIZE)
+PRICE_CACHE = LookupCache('prices', PRICE_CACHE_TTL, NEGATIVE_CACHE_TTL, LOOKUP_CACHE_SIZE)
+# Xóa giá đã cache ngay khi mẫu xe đổi trong Catalog Service (luồng thay đổi), không chờ hết TTL
+PRICE_WATCHER = CatalogPriceWatcher(lambda: CATALOG_SERVICE_URL, PRICE_CACHE)
+
+# Khi T1/T2 lỗi hoặc chậm liên tục, từ chối tạo đơn ngay (503) thay vì giữ request chờ timeout
+USER_BREAKER = CircuitBreaker('users', slow_call_seconds=2.0, open_seconds=15)
+CATALOG_BREAKER = CircuitBreaker('catalog', slow_call_seconds=2.0, open_seconds=15)
+
+
+def is_server_error(response):
+    return response.status_code >= 500
 
 def initialize_db():
     """Tạo DB khi khởi động."""
@@ -28,56 +69,155 @@ def initialize_db():
         db.create_all()
         print("Đã khởi tạo DB Đơn hàng thành công.")
 
+# Các request đầu tiên có thể đến cùng lúc (server đa luồng): chỉ một request khởi tạo
+SETUP_LOCK = threading.Lock()
+
 @app.before_request
 def setup_data():
-    """Khởi tạo DB chỉ một lần khi server khởi động."""
-    if not hasattr(app, 'db_initialized'):
-        initialize_db()
-        app.db_initialized = True
+    """Khởi tạo DB và bắt đầu theo dõi giá chỉ một lần khi server khởi động."""
+    if getattr(app, 'setup_done', False):
+        return
+    with SETUP_LOCK:
+        if not hasattr(app, 'db_initialized'):
+            initialize_db()
+            app.db_initialized = True
+        if PRICE_WATCHER.ident is None:
+            PRICE_WATCHER.start()
+        app.setup_done = True
 
 # --- HÀM HỖ TRỢ TÍCH HỢP DỊCH VỤ ---
 
-def check_user_exists(user_id):
-    """Gọi User Service (T1) để kiểm tra người dùng."""
+def check_user_exists(user_id, timeout=SERVICE_TIMEOUT):
+    """
+    Gọi User Service (T1) để kiểm tra người dùng, qua USER_CACHE (ném CircuitOpenError nếu mạch T1 đang mở).
+    """
+    cached = USER_CACHE.get(user_id)
+    if cached is not MISSING:
+        return cached is not None
+    version = USER_CACHE.version(user_id)
     try:
-        response = requests.get(f"{USER_SERVICE_URL}/api/v1/users/{user_id}")
-        return response.status_code == 200
-    except requests.exceptions.ConnectionError:
+        started = time.perf_counter()
+        with TRACER.span('check_user_exists', user_id=user_id) as span:
+            response = USER_BREAKER.call(
+                requests.get, f"{USER_SERVICE_URL}/api/v1/users/{user_id}", headers=TRACER.inject(),
+                timeout=timeout, is_failure=is_server_error
+            )
+            span.set(status_code=response.status_code)
+        USER_CACHE.record_load(time.perf_counter() - started)
+    except requests.exceptions.RequestException:
         print("Lỗi kết nối T1: Đảm bảo User Service đang chạy!")
         return False
+    # Chỉ cache câu trả lời chắc chắn (200 / 404), không cache lỗi của User Service
+    if response.status_code in (200, 404):
+        USER_CACHE.put(user_id, True if response.status_code == 200 else None, version)
+    return response.status_code == 200
 
-def get_car_info_and_check_inventory(car_id, quantity):
+def check_inventory(car_id, quantity, timeout=SERVICE_TIMEOUT):
+    """Gọi Catalog Service (T2) để kiểm tra tồn kho (ném CircuitOpenError nếu mạch T2 đang mở)."""
+    try:
+        with TRACER.span('inventory_check', car_id=car_id, quantity=quantity) as span:
+            inventory_check = CATALOG_BREAKER.call(
+                requests.post, f"{CATALOG_SERVICE_URL}/api/v1/inventory/check",
+                json={"car_id": car_id, "quantity": quantity}, headers=TRACER.inject(),
+                timeout=timeout, is_failure=is_server_error
+            )
+            span.set(status_code=inventory_check.status_code)
+        if inventory_check.status_code != 200:
+            return False
+        return inventory_check.json().get('is_available', False)
+    except requests.exceptions.RequestException:
+        print("Lỗi kết nối T2: Đảm bảo Catalog Service đang chạy!")
+        return False
+
+def get_car_price(car_id, timeout=SERVICE_TIMEOUT):
     """
-    Gọi Catalog Service (T2) để lấy giá và kiểm tra tồn kho.
+    Gọi Catalog Service (T2) để lấy giá xe, qua PRICE_CACHE; None nếu không lấy được
+    (ném CircuitOpenError nếu mạch T2 đang mở).
     """
+    cached = PRICE_CACHE.get(car_id)
+    if cached is not MISSING:
+        return cached
+    # Giá đổi trong lúc đang gọi (CatalogPriceWatcher xóa car_id): giá vừa đọc có thể đã cũ, không lưu lại
+    version = PRICE_CACHE.version(car_id)
     try:
-        # 1. Kiểm tra tồn kho
-        inventory_check = requests.post(
-            f"{CATALOG_SERVICE_URL}/api/v1/inventory/check",
-            json={"car_id": car_id, "quantity": quantity}
-        )
-        if inventory_check.status_code != 200:
-            return None, False
+        started = time.perf_counter()
+        with TRACER.span('car_details', car_id=car_id) as span:
+            car_details = CATALOG_BREAKER.call(
+                requests.get, f"{CATALOG_SERVICE_URL}/api/v1/catalog/cars/{car_id}", headers=TRACER.inject(),
+                timeout=timeout, is_failure=is_server_error
+            )
+            span.set(status_code=car_details.status_code)
+        PRICE_CACHE.record_load(time.perf_counter() - started)
+        if car_details.status_code == 404:
+            PRICE_CACHE.put(car_id, None, version)
+        if car_details.status_code != 200:
+            return None
+        base_price = car_details.json().get('base_price')
+    except requests.exceptions.RequestException:
+        print("Lỗi kết nối T2: Đảm bảo Catalog Service đang chạy!")
+        return None
+    if base_price is not None:
+        PRICE_CACHE.put(car_id, base_price, version)
+    return base_price
 
-        inventory_data = inventory_check.json()
-        is_available = inventory_data.get('is_available', False)
 
-        if not is_available:
-            return None, False
+class OrderRejected(Exception):
+    """Một bước kiểm tra khi tạo đơn thất bại: trả message và status_code cho client."""
 
-        # 2. Lấy chi tiết xe để lấy giá
-        car_details = requests.get(f"{CATALOG_SERVICE_URL}/api/v1/catalog/cars/{car_id}")
-        
-        if car_details.status_code != 200:
-            return None, False 
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
 
-        base_price = car_details.json().get('base_price')
-        
-        return base_price, is_available
-        
-    except requests.exceptions.ConnectionError:
-        print("Lỗi kết nối T2: Đảm bảo Catalog Service đang chạy!")
-        return None, False
+def unavailable_item(car_id):
+    return OrderRejected(f"Mẫu xe ID {car_id} không đủ tồn kho hoặc không tồn tại.", 409)
+
+def validate_order(user_id, check_user, items):
+    """
+    Kiểm tra người dùng (nếu check_user), tồn kho của từng mặt hàng và giá của từng mẫu xe bằng các lời gọi
+    T1/T2 chạy đồng thời, chung hạn chót ORDER_DEADLINE_SECONDS. Trả về {car_id: giá}.
+    Ném OrderRejected / CircuitOpenError / fanout.DeadlineExceeded ngay khi một lời gọi thất bại.
+    """
+    deadline = time.monotonic() + ORDER_DEADLINE_SECONDS
+
+    def timeout():
+        return min(SERVICE_TIMEOUT, fanout.remaining(deadline))
+
+    def rejected(error):
+        # Lời gọi thất bại vì đã hết hạn chót (timeout = thời gian còn lại): báo 504 thay vì lỗi nghiệp vụ
+        return fanout.DeadlineExceeded() if fanout.remaining(deadline) <= 0 else error
+
+    def user_check():
+        if not check_user_exists(user_id, timeout()):
+            raise rejected(OrderRejected("Người dùng không hợp lệ (ID không tồn tại trong User Service)", 404))
+
+    def inventory_check(car_id, quantity):
+        if not check_inventory(car_id, quantity, timeout()):
+            raise rejected(unavailable_item(car_id))
+
+    def price_lookup(car_id):
+        base_price = get_car_price(car_id, timeout())
+        if base_price is None:
+            raise rejected(unavailable_item(car_id))
+        return base_price
+
+    # Thứ tự gửi giữ như cách gọi tuần tự trước đây: T1, rồi tồn kho + giá của từng mặt hàng
+    calls = [user_check] if check_user else []
+    price_calls = {}  # car_id -> vị trí lời gọi lấy giá (mỗi mẫu xe một lần)
+    for car_id, quantity in items:
+        calls.append(lambda car_id=car_id, quantity=quantity: inventory_check(car_id, quantity))
+        if car_id not in price_calls:
+            price_calls[car_id] = len(calls)
+            calls.append(lambda car_id=car_id: price_lookup(car_id))
+    results = fanout.run_all(calls, deadline, ORDER_FANOUT_CONCURRENCY)
+    return {car_id: results[index] for car_id, index in price_calls.items()}
+
+
+def service_unavailable(error):
+    """Phản hồi 503 khi mạch đến dịch vụ phụ thuộc đang mở."""
+    response = jsonify({"message": f"Dịch vụ {error.name} tạm thời không khả dụng, vui lòng thử lại sau."})
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response, 503
 
 # --- API ENDPOINTS ---
 
@@ -104,32 +244,31 @@ def create_order():
         return jsonify({"message": "Thiếu chi tiết mặt hàng hoặc định dạng không hợp lệ."}), 400
 
 
-    # 1. KIỂM TRA NGƯỜI DÙNG TỒN TẠI (GỌI T1)
-    if not check_user_exists(user_id):
-        return jsonify({"message": "Người dùng không hợp lệ (ID không tồn tại trong User Service)"}), 404
+    # Ép kiểu an toàn cho car_id và quantity của mọi mặt hàng trước khi gọi dịch vụ khác
+    try:
+        parsed_items = [(int(item_data.get('car_id')), int(item_data.get('quantity', 1))) for item_data in items]
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({"message": "ID xe và số lượng phải là số nguyên."}), 400
+
+    # 1 + 2. KIỂM TRA NGƯỜI DÙNG (GỌI T1), TỒN KHO VÀ GIÁ (GỌI T2): đồng thời, dừng ở lỗi đầu tiên
+    # Gateway đã xác thực token của chính người dùng này: không cần hỏi lại User Service
+    authenticated = request.headers.get(USER_ID_HEADER) == str(user_id)
+    try:
+        prices = validate_order(user_id, not authenticated, parsed_items)
+    except OrderRejected as e:
+        return jsonify({"message": e.message}), e.status_code
+    except CircuitOpenError as e:
+        return service_unavailable(e)
+    except fanout.DeadlineExceeded:
+        return jsonify({"message": "Dịch vụ Người dùng/Danh mục phản hồi quá chậm, vui lòng thử lại sau."}), 504
 
+    # Mọi kiểm tra đã qua: đơn hàng và các mặt hàng được ghi trong một transaction
     new_order = Order(user_id=user_id, status='Pending', total_amount=0)
     db.session.add(new_order)
     
     calculated_total = 0
-    
-    # 2. KIỂM TRA TỒN KHO VÀ GIÁ (GỌI T2)
-    for item_data in items:
-        # Ép kiểu an toàn cho car_id và quantity
-        try:
-            car_id = int(item_data.get('car_id'))
-            quantity = int(item_data.get('quantity', 1))
-        except (ValueError, TypeError):
-             db.session.rollback()
-             return jsonify({"message": "ID xe và số lượng phải là số nguyên."}), 400
-
-        base_price, is_available = get_car_info_and_check_inventory(car_id, quantity)
-        
-        if not is_available:
-            # Hủy giao dịch nếu hết hàng
-            db.session.rollback()
-            return jsonify({"message": f"Mẫu xe ID {car_id} không đủ tồn kho hoặc không tồn tại."}), 409 # Conflict
-
+    for car_id, quantity in parsed_items:
+        base_price = prices[car_id]
         # Thêm Item vào đơn hàng
         subtotal = base_price * quantity
         calculated_total += subtotal
@@ -145,7 +284,11 @@ def create_order():
     # 3. HOÀN TẤT VÀ LƯU ĐƠN HÀNG
     new_order.total_amount = calculated_total
     new_order.status = 'Confirmed'
-    db.session.commit()
+    # Flush (INSERT đơn và các mặt hàng) và commit được đo riêng
+    with TRACER.span('db.flush', items=len(items)):
+        db.session.flush()
+    with TRACER.span('db.commit'):
+        db.session.commit()
 
     return jsonify(new_order.to_dict()), 201 # Created
 
@@ -163,6 +306,38 @@ def get_all_orders():
     orders = Order.query.all()
     return jsonify([order.to_dict() for order in orders]), 200
 
+@app.route('/api/v1/orders/cache', methods=['GET'])
+def lookup_cache_stats():
+    """Tỉ lệ trúng và số lời gọi T1/T2 đã tiết kiệm của cache người dùng/giá xe."""
+    return jsonify({"users": USER_CACHE.stats(), "prices": PRICE_CACHE.stats(),
+                    "price_watcher": PRICE_WATCHER.stats()}), 200
+
+@app.route('/api/v1/orders/cache/invalidate', methods=['POST'])
+def invalidate_lookup_cache():
+    """
+    Xóa cache khi người dùng/giá xe vừa đổi: {"car_ids": [...], "user_ids": [...]};
+    body rỗng xóa toàn bộ cả hai cache.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        car_ids = [int(car_id) for car_id in data['car_ids']] if 'car_ids' in data else None
+        user_ids = [int(user_id) for user_id in data['user_ids']] if 'user_ids' in data else None
+    except (ValueError, TypeError):
+        return jsonify({"message": "car_ids và user_ids phải là danh sách số nguyên."}), 400
+    everything = car_ids is None and user_ids is None
+    removed = {
+        "prices": PRICE_CACHE.invalidate(car_ids) if car_ids is not None or everything else 0,
+        "users": USER_CACHE.invalidate(user_ids) if user_ids is not None or everything else 0,
+    }
+    return jsonify({"invalidated": removed}), 200
+
+@app.route('/api/v1/health', methods=['GET'])
+def health():
+    """Trạng thái circuit breaker đến các dịch vụ phụ thuộc."""
+    services = {"users": USER_BREAKER.stats(), "catalog": CATALOG_BREAKER.stats()}
+    healthy = all(stats["state"] == "closed" for stats in services.values())
+    return jsonify({"status": "ok" if healthy else "degraded", "services": services}), 200
+
 if __name__ == '__main__':
     # Khởi tạo DB khi chạy ứng dụng
     with app.app_context():
@@ -0,0 +1,56 @@
+# order-service/fanout.py
+# Chạy đồng thời các lời gọi T1/T2 của một đơn hàng thay vì lần lượt từng lời gọi
+#   - cả nhóm dùng chung một hạn chót; mỗi lời gọi tự lấy timeout = thời gian còn lại (remaining)
+#   - lời gọi đầu tiên ném lỗi kết thúc cả nhóm ngay: lời gọi chưa bắt đầu bị hủy, kết quả của lời gọi
+#     đang chạy bị bỏ qua
+#   - mỗi lời gọi chạy trong bản sao context hiện tại để vẫn thuộc trace của request
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Tổng số thread gọi dịch vụ khác của cả Order Service
+WORKERS = 32
+
+EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='order-fanout')
+
+
+class DeadlineExceeded(Exception):
+    """Nhóm lời gọi chưa xong khi đã hết hạn chót."""
+
+
+def remaining(deadline):
+    """Số giây còn lại đến hạn chót (time.monotonic()), không âm."""
+    return max(0.0, deadline - time.monotonic())
+
+
+def run_all(calls, deadline, max_concurrency):
+    """
+    Chạy các hàm không tham số trong calls, tối đa max_concurrency hàm cùng lúc; kết quả giữ đúng thứ tự.
+    Ném lại lỗi của lời gọi thất bại đầu tiên, hoặc DeadlineExceeded; khi đó không gửi thêm lời gọi nào nữa.
+    """
+    results = [None] * len(calls)
+    waiting = iter(enumerate(calls))
+    pending = {}
+
+    def submit_next():
+        for index, call in waiting:
+            pending[EXECUTOR.submit(contextvars.copy_context().run, call)] = index
+            return
+
+    try:
+        for _ in range(max_concurrency):
+            submit_next()
+        while pending:
+            timeout = deadline - time.monotonic()
+            done = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)[0] if timeout > 0 else ()
+            if not done:
+                raise DeadlineExceeded()
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                submit_next()
+    finally:
+        # Thất bại hoặc hết hạn: lời gọi còn xếp hàng trong EXECUTOR không được chạy
+        for future in pending:
+            future.cancel()
+    return results
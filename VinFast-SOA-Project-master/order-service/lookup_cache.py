@@ -0,0 +1,219 @@
+# order-service/lookup_cache.py
+# Cache đọc-qua cho các lời gọi T1/T2 ít thay đổi khi tạo đơn: người dùng có tồn tại không, giá của mẫu xe
+#   - giới hạn max_entries khóa (LRU); kết quả có được giữ ttl giây, kết quả "không tồn tại" (404) chỉ
+#     negative_ttl giây; lỗi kết nối/5xx không được cache
+#   - có thể xóa theo khóa hoặc toàn bộ (POST /api/v1/orders/cache/invalidate, hoặc CatalogPriceWatcher
+#     theo luồng thay đổi /api/v1/catalog/changes khi giá/mẫu xe đổi); mỗi lần xóa tăng phiên bản của khóa,
+#     kết quả của lời gọi bắt đầu trước lần xóa (version() khác lúc put()) bị bỏ thay vì ghi lại giá cũ
+#   - số lần trúng/trượt, số lời gọi đã tiết kiệm và thời gian ước tính đã tiết kiệm (theo thời gian trung bình
+#     của một lời gọi thật) được ghi vào /metrics
+
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from common.metrics import REGISTRY
+
+# Giá trị trả về của get() khi khóa không có trong cache hoặc đã hết hạn
+MISSING = object()
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    'order_lookup_cache_requests_total', 'Order service lookup cache reads by result (hit/miss).',
+    ('cache', 'result'))
+CACHE_SAVED_SECONDS = REGISTRY.counter(
+    'order_lookup_cache_saved_seconds_total',
+    'Estimated upstream call time saved by lookup cache hits in seconds.', ('cache',))
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    'order_lookup_cache_invalidations_total', 'Lookup cache entries removed by explicit invalidation.',
+    ('cache',))
+CACHE_ENTRIES = REGISTRY.gauge(
+    'order_lookup_cache_entries', 'Entries currently held by the lookup cache.', ('cache',))
+
+
+class LookupCache:
+    """Cache TTL có giới hạn (LRU) cho kết quả tra cứu dịch vụ khác; an toàn khi nhiều thread cùng dùng."""
+
+    def __init__(self, name, ttl, negative_ttl, max_entries):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # khóa -> (giá trị, hết hạn lúc (time.monotonic()))
+        self._lock = threading.Lock()
+        # Phiên bản của khóa = số lần xóa gần nhất chạm tới khóa; giữ tối đa max_entries khóa vừa bị xóa,
+        # các khóa khác có phiên bản _base_version (lần xóa toàn bộ / khóa bị đẩy ra gần nhất)
+        self._invalidations = 0
+        self._versions = OrderedDict()
+        self._base_version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.invalidated = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.saved_seconds = 0.0
+        self.stale_discarded = 0
+        CACHE_ENTRIES.set(name, value=0)
+
+    def _version(self, key):
+        return self._versions.get(key, self._base_version)
+
+    def version(self, key):
+        """Phiên bản hiện tại của key: đọc trước lời gọi thật, truyền lại cho put()."""
+        with self._lock:
+            return self._version(key)
+
+    def get(self, key):
+        """Giá trị còn hạn của key, hoặc MISSING."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                value, expires_at = cached
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if value is None:
+                        self.negative_hits += 1
+                    saved = self.load_seconds / self.loads if self.loads else 0.0
+                    self.saved_seconds += saved
+                    CACHE_LOOKUPS.inc(self.name, 'hit')
+                    CACHE_SAVED_SECONDS.inc(self.name, amount=saved)
+                    return value
+                del self._entries[key]
+            self.misses += 1
+        CACHE_LOOKUPS.inc(self.name, 'miss')
+        return MISSING
+
+    def put(self, key, value, version=None):
+        """
+        Lưu value (None: "không tồn tại", giữ negative_ttl giây). version: kết quả của version(key) lúc bắt đầu
+        lời gọi; key đã bị xóa sau đó thì value có thể đã cũ và không được lưu.
+        """
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            if version is not None and self._version(key) != version:
+                self.stale_discarded += 1
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            size = len(self._entries)
+        CACHE_ENTRIES.set(self.name, value=size)
+
+    def record_load(self, seconds):
+        """Thời gian của một lời gọi thật (kể cả khi kết quả không được cache): dùng để ước tính phần tiết kiệm."""
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += seconds
+
+    def invalidate(self, keys=None):
+        """Xóa các khóa chỉ định, hoặc toàn bộ cache khi keys là None; trả về số mục đã xóa."""
+        with self._lock:
+            self._invalidations += 1
+            if keys is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+                self._base_version = self._invalidations
+            else:
+                removed = 0
+                for key in keys:
+                    removed += self._entries.pop(key, None) is not None
+                    self._versions[key] = self._invalidations
+                    self._versions.move_to_end(key)
+                while len(self._versions) > self.max_entries:
+                    # Khóa bị đẩy ra lấy phiên bản chung: lời gọi đang chạy của các khóa khác chỉ mất một lần lưu
+                    _, evicted = self._versions.popitem(last=False)
+                    self._base_version = max(self._base_version, evicted)
+            self.invalidated += removed
+            size = len(self._entries)
+        CACHE_INVALIDATIONS.inc(self.name, amount=removed)
+        CACHE_ENTRIES.set(self.name, value=size)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_load = self.load_seconds / self.loads if self.loads else 0.0
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidated": self.invalidated,
+                "stale_discarded": self.stale_discarded,
+                "avg_upstream_ms": round(avg_load * 1000, 2),
+                # Mỗi lần trúng là một lời gọi dịch vụ khác không phải gửi
+                "upstream_calls_saved": self.hits,
+                "saved_ms": round(self.saved_seconds * 1000, 2),
+            }
+
+
+class CatalogPriceWatcher(threading.Thread):
+    """
+    Theo dõi luồng thay đổi mẫu xe của Catalog Service (long-poll /api/v1/catalog/changes?entity=car_model)
+    và xóa giá đã cache của mẫu xe vừa đổi. Mất dấu (410, lỗi kết nối): xóa toàn bộ cache giá rồi đọc tiếp
+    từ thay đổi mới nhất.
+    """
+
+    WAIT_SECONDS = 8
+    RETRY_SECONDS = 5
+
+    def __init__(self, catalog_url, cache):
+        super().__init__(name='catalog-price-watcher', daemon=True)
+        self.catalog_url = catalog_url  # hàm trả về URL gốc của Catalog Service
+        self.cache = cache
+        self.cursor = None
+        self._stop_event = threading.Event()
+        self.invalidated = 0
+        self.resets = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def poll(self):
+        """Một lần long-poll; trả về số giá đã xóa khỏi cache."""
+        params = {"entity": "car_model", "limit": 1000, "wait": self.WAIT_SECONDS if self.cursor is not None else 0}
+        if self.cursor is not None:
+            params["cursor"] = self.cursor
+        response = requests.get(f"{self.catalog_url()}/api/v1/catalog/changes", params=params,
+                                timeout=self.WAIT_SECONDS + 2)
+        if response.status_code == 410:
+            self.reset(response.json().get('cursor'))
+            return 0
+        response.raise_for_status()
+        body = response.json()
+        first_poll = self.cursor is None
+        self.cursor = body['cursor']
+        if first_poll:
+            # Chưa có con trỏ: giá đã cache trước đó có thể đã cũ
+            self.reset(self.cursor)
+            return 0
+        removed = self.cache.invalidate({change['car_id'] for change in body['changes']})
+        self.invalidated += removed
+        return removed
+
+    def reset(self, cursor):
+        self.cursor = cursor
+        self.resets += 1
+        self.invalidated += self.cache.invalidate()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                if self._stop_event.is_set():
+                    return
+                print("Không đọc được luồng thay đổi của Catalog Service: xóa cache giá, thử lại sau.")
+                self.reset(None)
+                self._stop_event.wait(self.RETRY_SECONDS)
+
+    def stats(self):
+        return {"running": self.is_alive(), "cursor": self.cursor, "invalidated": self.invalidated,
+                "resets": self.resets}
@@ -5,14 +5,25 @@ from database import db, User
 import jwt 
 import datetime
 import os
+import sys
 from flask_cors import CORS # Thêm CORS
 from passlib.context import CryptContext
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func
 
+# Thư mục gốc của dự án (chứa package common/ dùng chung giữa các dịch vụ)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.auth import JWT_SECRET, JWT_ALGORITHM
+from common.metrics import instrument
+from common.tracing import trace_requests
+
 # --- Cấu hình DB và App (Cần giống database.py) ---
 app = Flask(__name__)
 CORS(app) # Kích hoạt CORS
+# Số request, độ trễ theo route và endpoint /metrics cho Prometheus
+instrument(app)
+# Span cho mỗi request, nối tiếp trace của bên gọi (header traceparent)
+trace_requests(app, 'users')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///user_service.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
@@ -115,7 +126,7 @@ def login():
             'role': user.role,
             'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
         }
-        token = jwt.encode(token_payload, 'your_super_secret_key_for_jwt', algorithm='HS256')
+        token = jwt.encode(token_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         
         return jsonify({
             'message': 'Đăng nhập thành công',
@@ -124,6 +135,17 @@ def login():
     
     return jsonify({"message": "Email hoặc mật khẩu không chính xác"}), 401
 
+@app.route('/api/v1/users', methods=['GET'])
+def get_users_batch():
+    """API lấy thông tin nhiều người dùng trong một lần gọi (?ids=1,2,3)."""
+    try:
+        ids = [int(x) for x in request.args.get('ids', '').split(',') if x.strip()]
+    except ValueError:
+        return jsonify({"message": "Tham số ids không hợp lệ"}), 400
+
+    users = User.query.filter(User.id.in_(ids)).all() if ids else []
+    return jsonify([user.to_dict() for user in users]), 200
+
 @app.route('/api/v1/users/<int:user_id>', methods=['GET'])
 def get_user_info(user_id):
     """API để T3 và T4 lấy thông tin người dùng."""